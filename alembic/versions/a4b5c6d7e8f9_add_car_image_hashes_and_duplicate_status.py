@@ -0,0 +1,44 @@
+"""Add car_image_hashes table and 'duplicate' to statusprocessed enum
+
+Revision ID: a4b5c6d7e8f9
+Revises: f3a4b5c6d7e8
+Create Date: 2026-10-17
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "a4b5c6d7e8f9"
+down_revision: Union[str, Sequence[str], None] = "f3a4b5c6d7e8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TYPE statusprocessed ADD VALUE IF NOT EXISTS 'duplicate'")
+    op.create_table(
+        "car_image_hashes",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column(
+            "car_id",
+            sa.Integer(),
+            sa.ForeignKey("cars.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("image_key", sa.String(64), nullable=False),
+        sa.Column("phash", sa.BigInteger(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index("ix_car_image_hashes_car_id", "car_image_hashes", ["car_id"])
+    op.create_index("ix_car_image_hashes_phash", "car_image_hashes", ["phash"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_car_image_hashes_phash", table_name="car_image_hashes")
+    op.drop_index("ix_car_image_hashes_car_id", table_name="car_image_hashes")
+    op.drop_table("car_image_hashes")
+    # PostgreSQL does not support removing enum values easily
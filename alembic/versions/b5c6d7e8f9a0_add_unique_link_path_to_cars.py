@@ -0,0 +1,49 @@
+"""Add unique constraint on cars.link_path (target of the car upsert)
+
+Revision ID: b5c6d7e8f9a0
+Revises: a4b5c6d7e8f9
+Create Date: 2026-10-17
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "b5c6d7e8f9a0"
+down_revision: Union[str, Sequence[str], None] = "a4b5c6d7e8f9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Дублікати link_path (гонки старого SELECT-then-INSERT). Лишаємо рядок, що
+    # відповідає оголошенню на TruckMarket (truck_car_id), далі — у фінальному статусі,
+    # далі найновіший: інакше опубліковане оголошення лишилося б без рядка в БД і
+    # links_to_delete не змогло б його видалити.
+    op.execute(
+        """
+        DELETE FROM cars
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT
+                    id,
+                    row_number() OVER (
+                        PARTITION BY link_path
+                        ORDER BY
+                            (truck_car_id IS NOT NULL) DESC,
+                            COALESCE(processed_status IN ('active', 'created', 'deleted'), false) DESC,
+                            id DESC
+                    ) AS rank
+                FROM cars
+            ) ranked
+            WHERE rank > 1
+        )
+        """
+    )
+    op.create_unique_constraint("cars_link_path_key", "cars", ["link_path"])
+
+
+def downgrade() -> None:
+    op.drop_constraint("cars_link_path_key", "cars", type_="unique")
@@ -0,0 +1,54 @@
+"""Add indexes for hot-path queries on cars, links_to_create, links_to_delete
+
+Revision ID: c6d7e8f9a0b1
+Revises: b5c6d7e8f9a0
+Create Date: 2026-10-17
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "c6d7e8f9a0b1"
+down_revision: Union[str, Sequence[str], None] = "b5c6d7e8f9a0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# cars.link_path уже має унікальний індекс (cars_link_path_key, b5c6d7e8f9a0)
+INDEXES = (
+    ("ix_cars_link_id_created_at", "cars", ["link_id", "created_at"], None),
+    ("ix_cars_processed_status_created_at", "cars", ["processed_status", "created_at"], None),
+    ("ix_cars_created_at", "cars", ["created_at"], None),
+    ("ix_cars_truck_car_id", "cars", ["truck_car_id"], "truck_car_id IS NOT NULL"),
+    ("ix_links_to_create_parent_link_id", "links_to_create", ["parent_link_id"], None),
+    ("ix_links_to_create_process", "links_to_create", ["id"], "status = 'process'"),
+    ("ix_links_to_delete_parent_link_id", "links_to_delete", ["parent_link_id"], None),
+    ("ix_links_to_delete_process", "links_to_delete", ["id"], "status = 'process'"),
+)
+
+
+def upgrade() -> None:
+    # CONCURRENTLY — без блокування записів парсером; не може йти в транзакції
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_where=sa.text(where) if where else None,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+    for table in ("cars", "links_to_create", "links_to_delete"):
+        op.execute(f"ANALYZE {table}")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table, postgresql_concurrently=True, if_exists=True
+            )
@@ -0,0 +1,37 @@
+"""Add cars.duplicate_of (published car a DUPLICATE car was matched to)
+
+Revision ID: d7e8f9a0b1c2
+Revises: c6d7e8f9a0b1
+Create Date: 2026-10-17
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "d7e8f9a0b1c2"
+down_revision: Union[str, Sequence[str], None] = "c6d7e8f9a0b1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("cars", sa.Column("duplicate_of", sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        "cars_duplicate_of_fkey", "cars", "cars", ["duplicate_of"], ["id"], ondelete="SET NULL"
+    )
+    op.create_index(
+        "ix_cars_duplicate_of",
+        "cars",
+        ["duplicate_of"],
+        postgresql_where=sa.text("duplicate_of IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_cars_duplicate_of", table_name="cars")
+    op.drop_constraint("cars_duplicate_of_fkey", "cars", type_="foreignkey")
+    op.drop_column("cars", "duplicate_of")
@@ -0,0 +1,347 @@
+"""
+Довгоживучий браузер для Celery-задач.
+
+Замість sync_playwright().start() + chromium.launch() у кожній задачі воркер
+тримає «теплий» браузер і орендує (lease) у нього контексти:
+
+- BROWSER_SERVICE_URL не задано — браузер запускається локально один раз на потік
+  і живе між задачами (solo-воркер виконує всі задачі в одному потоці);
+- BROWSER_SERVICE_URL=http://host:9222 — підключення по CDP до сервісу
+  `python -m app.scraper.browser_service`; ws://… — browser_type.connect
+  до Playwright-сервера (`playwright run-server`).
+
+Кожен контекст створюється з уже погодженим storage_state (cookies-банер
+відхилено один раз), тож accept_cookies у задачах не повторюється.
+Браузер перезапускається після BROWSER_RECYCLE_PAGES сторінок або коли RSS
+процесів Chromium перевищує BROWSER_RECYCLE_RSS_MB.
+
+Локальний запуск сервісу:
+    python -m app.scraper.browser_service --port 9222
+і в іншому терміналі BROWSER_SERVICE_URL=http://127.0.0.1:9222.
+"""
+
+import argparse
+import logging
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Generator, Optional
+
+from playwright.sync_api import Browser, BrowserContext, Page, sync_playwright
+
+from app.scraper.route_profiles import apply_route_profile
+
+logger = logging.getLogger(__name__)
+
+BROWSER_CONTEXT_OPTIONS = {
+    "locale": "uk-UA",
+    "viewport": {"width": 1366, "height": 768},
+    "user_agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/120.0.0.0 Safari/537.36"
+    ),
+}
+
+BROWSER_SERVICE_URL = os.getenv("BROWSER_SERVICE_URL", "").strip()
+BROWSER_SERVICE_PORT = int(os.getenv("BROWSER_SERVICE_PORT", "9222"))
+BROWSER_STATE_PATH = os.getenv(
+    "BROWSER_STATE_PATH", "/tmp/autoria_storage_state.json"
+)
+# Через скільки секунд storage_state вважається застарілим і погоджується знову
+BROWSER_STATE_TTL = int(os.getenv("BROWSER_STATE_TTL", str(24 * 3600)))
+BROWSER_RECYCLE_PAGES = int(os.getenv("BROWSER_RECYCLE_PAGES", "200"))
+BROWSER_RECYCLE_RSS_MB = int(os.getenv("BROWSER_RECYCLE_RSS_MB", "1500"))
+BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "true").strip().lower() != "false"
+
+CONSENT_URL = "https://auto.ria.com/uk/"
+
+_state_lock = threading.Lock()
+
+
+def _launch_options(extra_args: Optional[list[str]] = None) -> dict:
+    return {"headless": BROWSER_HEADLESS, "slow_mo": 40, "args": extra_args or []}
+
+
+def _read_rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def process_tree_rss_mb(root_pid: Optional[int] = None) -> float:
+    """
+    Сумарний RSS (МБ) процесу root_pid і всіх його нащадків (драйвер Playwright + Chromium).
+    Читає /proc, тож поза Linux повертає 0 і перезапуск за пам'яттю не спрацьовує.
+    """
+    root_pid = root_pid or os.getpid()
+    children: dict[int, list[int]] = {}
+    try:
+        pids = [int(name) for name in os.listdir("/proc") if name.isdigit()]
+    except OSError:
+        return 0.0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                # Поле comm може містити пробіли — ppid шукаємо після останньої ")"
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(pid)
+
+    total_kb = 0
+    stack = list(children.get(root_pid, []))
+    while stack:
+        pid = stack.pop()
+        total_kb += _read_rss_kb(pid)
+        stack.extend(children.get(pid, []))
+    return total_kb / 1024
+
+
+def _state_is_fresh(path: str = BROWSER_STATE_PATH) -> bool:
+    try:
+        return time.time() - os.path.getmtime(path) < BROWSER_STATE_TTL
+    except OSError:
+        return False
+
+
+def ensure_storage_state(browser: Browser, force: bool = False) -> Optional[str]:
+    """
+    Готує storage_state з відхиленим cookies-банером: відкриває AutoRia,
+    тисне «не погоджуюсь» і зберігає cookies/localStorage у BROWSER_STATE_PATH.
+    Повертає шлях або None, якщо зберегти не вдалося.
+    """
+    from app.scraper.main import accept_cookies
+
+    with _state_lock:
+        if not force and _state_is_fresh():
+            return BROWSER_STATE_PATH
+        context = browser.new_context(**BROWSER_CONTEXT_OPTIONS)
+        try:
+            page = context.new_page()
+            page.goto(CONSENT_URL, wait_until="domcontentloaded", timeout=60000)
+            accept_cookies(page)
+            tmp_path = f"{BROWSER_STATE_PATH}.tmp"
+            context.storage_state(path=tmp_path)
+            os.replace(tmp_path, BROWSER_STATE_PATH)
+            logger.info("[browser] storage_state saved to %s", BROWSER_STATE_PATH)
+            return BROWSER_STATE_PATH
+        except Exception as e:
+            logger.warning("[browser] consent pre-run failed: %s", e)
+            return None
+        finally:
+            context.close()
+
+
+@dataclass
+class BrowserLease:
+    """Орендований контекст. consented=True — cookies-банер уже відхилено в storage_state."""
+
+    context: BrowserContext
+    consented: bool
+
+    def new_page(self) -> Page:
+        return self.context.new_page()
+
+
+@dataclass
+class _WarmBrowser:
+    """Браузер (локальний або підключений до сервісу), прив'язаний до одного потоку."""
+
+    playwright: object
+    browser: Browser
+    remote: bool
+    pages: int = 0
+
+    def needs_recycle(self) -> bool:
+        if not self.browser.is_connected():
+            return True
+        if self.pages >= BROWSER_RECYCLE_PAGES:
+            logger.info("[browser] recycle after %s pages", self.pages)
+            return True
+        # RSS сервісу контролює сам сервіс; тут — лише локальний Chromium
+        if not self.remote:
+            rss = process_tree_rss_mb()
+            if rss > BROWSER_RECYCLE_RSS_MB:
+                logger.info("[browser] recycle at %.0f MB RSS", rss)
+                return True
+        return False
+
+    def close(self) -> None:
+        try:
+            self.browser.close()
+        except Exception as e:
+            logger.debug("[browser] close failed: %s", e)
+        try:
+            self.playwright.stop()
+        except Exception as e:
+            logger.debug("[browser] playwright stop failed: %s", e)
+
+
+_local = threading.local()
+
+
+def _start_browser() -> _WarmBrowser:
+    playwright = sync_playwright().start()
+    browser = None
+    try:
+        if BROWSER_SERVICE_URL:
+            try:
+                if BROWSER_SERVICE_URL.startswith(("ws://", "wss://")):
+                    browser = playwright.chromium.connect(BROWSER_SERVICE_URL)
+                else:
+                    browser = playwright.chromium.connect_over_cdp(BROWSER_SERVICE_URL)
+            except Exception as e:
+                # Сервіс недоступний — задача не падає, а запускає браузер сама
+                logger.warning(
+                    "[browser] service %s unavailable, launching locally: %s",
+                    BROWSER_SERVICE_URL,
+                    e,
+                )
+        remote = browser is not None
+        if browser is None:
+            browser = playwright.chromium.launch(**_launch_options())
+    except Exception:
+        playwright.stop()
+        raise
+    logger.info(
+        "[browser] %s browser ready (thread=%s)",
+        "remote" if remote else "local",
+        threading.current_thread().name,
+    )
+    return _WarmBrowser(playwright=playwright, browser=browser, remote=remote)
+
+
+def _thread_browser() -> _WarmBrowser:
+    warm: Optional[_WarmBrowser] = getattr(_local, "warm", None)
+    if warm is not None and warm.needs_recycle():
+        warm.close()
+        warm = None
+    if warm is None:
+        warm = _start_browser()
+        _local.warm = warm
+    return warm
+
+
+def close_thread_browser() -> None:
+    """Закриває браузер поточного потоку (для тимчасових потоків, напр. воркерів page_pool)."""
+    warm: Optional[_WarmBrowser] = getattr(_local, "warm", None)
+    if warm is not None:
+        warm.close()
+        _local.warm = None
+
+
+@contextmanager
+def lease_context(
+    profile: Optional[str] = None, **context_options
+) -> Generator[BrowserLease, None, None]:
+    """
+    Орендує новий контекст у теплого браузера поточного потоку.
+    profile — назва профілю перехоплення запитів (route_profiles), None — без блокування.
+    Контекст закривається після виходу; браузер лишається для наступних задач.
+    """
+    warm = _thread_browser()
+    state_path = ensure_storage_state(warm.browser)
+    options = {**BROWSER_CONTEXT_OPTIONS, **context_options}
+    if state_path:
+        options["storage_state"] = state_path
+    context = warm.browser.new_context(**options)
+
+    def _count_page(_page) -> None:
+        warm.pages += 1
+
+    context.on("page", _count_page)
+    apply_route_profile(context, profile)
+    try:
+        yield BrowserLease(context=context, consented=bool(state_path))
+    finally:
+        try:
+            context.close()
+        except Exception as e:
+            logger.debug("[browser] context close failed: %s", e)
+
+
+@contextmanager
+def lease_page(
+    profile: Optional[str] = None, **context_options
+) -> Generator[Page, None, None]:
+    """Орендований контекст з однією сторінкою."""
+    with lease_context(profile, **context_options) as lease:
+        yield lease.new_page()
+
+
+def _open_page_count(browser: Browser) -> int:
+    """Кількість відкритих вкладок у браузері (включно з контекстами CDP-клієнтів)."""
+    try:
+        cdp = browser.new_browser_cdp_session()
+        try:
+            targets = cdp.send("Target.getTargets").get("targetInfos", [])
+        finally:
+            cdp.detach()
+    except Exception as e:
+        logger.debug("[browser-service] Target.getTargets failed: %s", e)
+        return 0
+    return sum(1 for target in targets if target.get("type") == "page")
+
+
+def serve(port: int = BROWSER_SERVICE_PORT, check_interval: float = 30.0) -> None:
+    """
+    Сервіс: тримає Chromium з відкритим CDP-портом, готує storage_state і
+    перезапускає браузер, коли RSS перевищує BROWSER_RECYCLE_RSS_MB.
+    Поки є відкриті вкладки клієнтів, перезапуск відкладається (до подвійного ліміту).
+    """
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    # CDP без автентифікації дає повний контроль над браузером — лише loopback:
+    # воркер ділить з сервісом мережевий простір (network_mode у docker-compose)
+    args = [
+        f"--remote-debugging-port={port}",
+        "--remote-debugging-address=127.0.0.1",
+    ]
+    with sync_playwright() as p:
+        while not stop.is_set():
+            browser = p.chromium.launch(**_launch_options(args))
+            ensure_storage_state(browser, force=not _state_is_fresh())
+            logger.info("[browser-service] CDP listening on 127.0.0.1:%s", port)
+            try:
+                while not stop.wait(check_interval):
+                    if not browser.is_connected():
+                        logger.warning("[browser-service] browser died, restarting")
+                        break
+                    if not _state_is_fresh():
+                        ensure_storage_state(browser, force=True)
+                    rss = process_tree_rss_mb()
+                    if rss <= BROWSER_RECYCLE_RSS_MB:
+                        continue
+                    open_pages = _open_page_count(browser)
+                    if open_pages == 0 or rss > 2 * BROWSER_RECYCLE_RSS_MB:
+                        logger.info(
+                            "[browser-service] recycle at %.0f MB RSS (%s open pages)",
+                            rss,
+                            open_pages,
+                        )
+                        break
+            finally:
+                browser.close()
+    logger.info("[browser-service] stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Long-lived Chromium for scraper workers")
+    parser.add_argument("--port", type=int, default=BROWSER_SERVICE_PORT)
+    parser.add_argument("--check-interval", type=float, default=30.0)
+    cli_args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    serve(port=cli_args.port, check_interval=cli_args.check_interval)
@@ -0,0 +1,236 @@
+"""
+Витяг даних авто зі структурованого JSON сторінки (schema.org ld+json).
+
+Сторінка оголошення містить блок <script type="application/ld+json"> з
+ціною, маркою/моделлю/роком, пробігом, адресою, характеристиками та фото.
+Опису (#descCharacteristicsValue) і частини CAT_LIST (descEcoStandartEcoStandart,
+descConditionerValue) у JSON немає — вони завжди читаються з DOM. Повний JSON лише
+означає, що сторінка вже віддала дані і DOM можна читати без пауз і очікувань.
+"""
+
+import json
+import logging
+import re
+from typing import Any, Iterable, Iterator, Optional
+
+from app.scraper.extractor import select_image_urls
+
+logger = logging.getLogger(__name__)
+
+LD_JSON_XPATH = '//script[@type="application/ld+json"]'
+
+LD_JSON_JS = """
+() => Array.from(
+    document.querySelectorAll('script[type="application/ld+json"]')
+).map((node) => node.textContent)
+"""
+
+_VEHICLE_TYPES = {"Car", "Vehicle", "BusOrCoach", "Motorcycle", "Product"}
+
+# Поля, без яких очікування DOM не можна пропустити
+REQUIRED_EMBEDDED_FIELDS = ("price", "title", "mileage", "location")
+
+
+def _iter_objects(node: Any) -> Iterator[dict]:
+    """Обходить усі dict-и в ld+json (списки, @graph, вкладені об'єкти)."""
+    if isinstance(node, list):
+        for item in node:
+            yield from _iter_objects(item)
+    elif isinstance(node, dict):
+        yield node
+        for value in node.values():
+            if isinstance(value, (dict, list)):
+                yield from _iter_objects(value)
+
+
+def _types_of(obj: dict) -> set[str]:
+    value = obj.get("@type")
+    if isinstance(value, list):
+        return {str(v) for v in value}
+    return {str(value)} if value else set()
+
+
+def find_vehicle(script_texts: Iterable[str]) -> Optional[dict]:
+    """Перший об'єкт типу Car/Vehicle/Product з offers або brand серед ld+json блоків."""
+    for text in script_texts:
+        if not text or not text.strip():
+            continue
+        try:
+            data = json.loads(text)
+        except ValueError:
+            logger.debug("Invalid ld+json block skipped")
+            continue
+        for obj in _iter_objects(data):
+            if _types_of(obj) & _VEHICLE_TYPES and ("offers" in obj or "brand" in obj):
+                return obj
+    return None
+
+
+def _name(value: Any) -> Optional[str]:
+    if isinstance(value, dict):
+        value = value.get("name")
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if value is None:
+        return None
+    text = str(value).strip()
+    return text or None
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, dict):
+        value = value.get("value")
+    if value is None:
+        return None
+    try:
+        return float(str(value).replace(",", ".").replace(" ", ""))
+    except ValueError:
+        return None
+
+
+def _first_offer(vehicle: dict) -> dict:
+    offers = vehicle.get("offers")
+    if isinstance(offers, list):
+        offers = offers[0] if offers else None
+    return offers if isinstance(offers, dict) else {}
+
+
+def _price(offer: dict) -> Optional[str]:
+    # TruckMarket отримує ціну в доларах (price_curr=3) — іншу валюту не беремо
+    currency = (offer.get("priceCurrency") or "USD").upper()
+    price = _number(offer.get("price"))
+    if price is None or currency != "USD":
+        return None
+    return str(int(price))
+
+
+def _mileage(vehicle: dict) -> Optional[str]:
+    """Пробіг у тис. км — як у DOM ("250 тис. км")."""
+    odometer = vehicle.get("mileageFromOdometer")
+    value = _number(odometer)
+    if value is None:
+        return None
+    unit = (odometer.get("unitCode") if isinstance(odometer, dict) else None) or "KMT"
+    if unit.upper() in ("KMT", "KM") and value >= 1000:
+        value = value / 1000
+    return str(int(round(value)))
+
+
+def _location(vehicle: dict, offer: dict) -> Optional[str]:
+    """Місто — як у DOM (#basicInfoTableMainInfoGeo); cars.location — VARCHAR(50)."""
+    candidates = [
+        (offer.get("availableAtOrFrom") or {}),
+        (offer.get("seller") or {}),
+        vehicle,
+    ]
+    for holder in candidates:
+        if not isinstance(holder, dict):
+            continue
+        address = holder.get("address")
+        if not isinstance(address, dict):
+            continue
+        locality = _name(address.get("addressLocality"))
+        if locality:
+            return locality[:50]
+    return None
+
+
+def _year(vehicle: dict) -> Optional[int]:
+    for key in ("vehicleModelDate", "productionDate", "modelDate", "releaseDate"):
+        match = re.search(r"\b(19|20)\d{2}\b", str(vehicle.get(key) or ""))
+        if match:
+            return int(match.group())
+    return None
+
+
+def _engine_value(vehicle: dict) -> Optional[str]:
+    """Рядок у форматі descEngineEngine: "Дизель, 4.5 л (180 к.с.)"."""
+    engine = vehicle.get("vehicleEngine")
+    if isinstance(engine, list):
+        engine = engine[0] if engine else None
+    if not isinstance(engine, dict):
+        engine = {}
+    fuel = _name(engine.get("fuelType")) or _name(vehicle.get("fuelType"))
+    if not fuel:
+        return None
+    text = fuel
+    volume = _number(engine.get("engineDisplacement"))
+    if volume:
+        # engineDisplacement може бути в см³ (CMQ) — переводимо в літри
+        unit = engine.get("engineDisplacement", {})
+        unit = (unit.get("unitCode") if isinstance(unit, dict) else "") or ""
+        if unit.upper() == "CMQ" or volume > 100:
+            volume = volume / 1000
+        text += f", {volume:.1f} л"
+    power = _number(engine.get("enginePower"))
+    if power:
+        text += f" ({int(power)} к.с.)"
+    return text
+
+
+def _car_values(vehicle: dict, cat_list: Iterable[str]) -> dict:
+    values = {
+        "descEngineEngine": _engine_value(vehicle),
+        "descTransmissionTransmission": _name(vehicle.get("vehicleTransmission")),
+        "descDriveTypeDriveType": _name(vehicle.get("driveWheelConfiguration")),
+        "descColorColor": _name(vehicle.get("color")),
+    }
+    allowed = set(cat_list)
+    return {key: value for key, value in values.items() if value and key in allowed}
+
+
+def _image_urls(vehicle: dict) -> list[str]:
+    images = vehicle.get("image") or []
+    if not isinstance(images, list):
+        images = [images]
+    nodes = []
+    for image in images:
+        if isinstance(image, dict):
+            image = image.get("contentUrl") or image.get("url")
+        if image:
+            nodes.append({"src": str(image)})
+    return select_image_urls(nodes)
+
+
+def extract_embedded_car(
+    script_texts: Iterable[str], cat_list: Iterable[str]
+) -> dict:
+    """
+    Поля авто з ld+json у форматі extractor.extract_car_fields + brand/model/year/images.
+    Повертає лише знайдені поля (може бути порожній словник).
+    """
+    vehicle = find_vehicle(script_texts)
+    if not vehicle:
+        return {}
+
+    offer = _first_offer(vehicle)
+    name = _name(vehicle.get("name"))
+    found = {
+        "price": _price(offer),
+        "title": name,
+        "full_title": name,
+        "mileage": _mileage(vehicle),
+        "location": _location(vehicle, offer),
+        "full_description": _name(vehicle.get("description")),
+        "brand": _name(vehicle.get("brand")) or _name(vehicle.get("manufacturer")),
+        "model": _name(vehicle.get("model")),
+        "year": _year(vehicle),
+        "car_values": _car_values(vehicle, cat_list),
+        "images": _image_urls(vehicle),
+    }
+    return {key: value for key, value in found.items() if value}
+
+
+def is_complete(embedded: dict) -> bool:
+    """Чи вистачає даних з JSON, щоб читати DOM одразу, без пауз і очікування селекторів."""
+    return bool(embedded.get("car_values")) and all(
+        embedded.get(key) for key in REQUIRED_EMBEDDED_FIELDS
+    )
+
+
+def merge_embedded(fields: dict, embedded: dict) -> dict:
+    """Доповнює DOM-поля тим, що дав JSON: марка/модель/рік і список фото."""
+    for key in ("brand", "model", "year", "images"):
+        if embedded.get(key):
+            fields[key] = embedded[key]
+    return fields
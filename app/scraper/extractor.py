@@ -0,0 +1,308 @@
+"""
+Декларативний екстрактор полів сторінки авто.
+
+Усі поля (ціна, назва, пробіг, гео, описи) та значення CAT_LIST з #descList
+витягуються одним page.evaluate — один IPC-запит до Chromium замість десятків
+locator(...).text_content(). Якщо поле не знайдено, для нього окремо
+використовується старий селектор (fallback).
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+from playwright.sync_api import Page
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    """
+    Опис одного поля сторінки.
+
+    xpath — основний шлях (працює і в браузері, і в lxml);
+    fallback — попередній Playwright-селектор, використовується лише якщо xpath нічого не дав;
+    multiple — зібрати текст усіх вузлів і об'єднати через перенос рядка.
+    """
+
+    name: str
+    xpath: str
+    fallback: str
+    required: bool = True
+    multiple: bool = False
+    default: Optional[str] = None
+
+
+CAR_FIELD_SPECS: tuple[FieldSpec, ...] = (
+    FieldSpec("price", '//*[@id="sidePrice"]//strong', "#sidePrice strong"),
+    FieldSpec(
+        "title",
+        '//*[@id="sideTitleTitle"]/span',
+        'xpath=//*[@id="sideTitleTitle"]/span',
+    ),
+    FieldSpec(
+        "full_title",
+        '//*[@id="basicInfoTitle"]/h1',
+        'xpath=//*[@id="basicInfoTitle"]/h1',
+        required=False,
+        default="",
+    ),
+    FieldSpec(
+        "mileage",
+        '//*[@id="basicInfoTableMainInfo0"]//span',
+        "#basicInfoTableMainInfo0 span",
+    ),
+    FieldSpec(
+        "location",
+        '//*[@id="basicInfoTableMainInfoGeo"]//span',
+        "#basicInfoTableMainInfoGeo span",
+    ),
+    FieldSpec(
+        "description",
+        '//*[@id="descCharacteristicsValue"]/span',
+        'xpath=//*[@id="descCharacteristicsValue"]/span',
+    ),
+    # Детальний опис може бути відсутній; збираємо всі текстові частини
+    FieldSpec(
+        "full_description",
+        "/html/body/div/main/div[1]/div[2]/div[1]/div[6]/div[1]/span",
+        "xpath=/html/body/div/main/div[1]/div[2]/div[1]/div[6]/div[1]/span",
+        required=False,
+        multiple=True,
+    ),
+)
+
+# XPath блоків характеристик (id блоку -> текст першого span)
+DESC_LIST_BLOCKS_XPATH = '//*[@id="descList"]//div'
+
+_EXTRACT_JS = """
+({specs, blocksXpath, catList}) => {
+    const snapshot = (xpath) => document.evaluate(
+        xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+    );
+    const fields = {};
+    for (const spec of specs) {
+        const nodes = snapshot(spec.xpath);
+        if (spec.multiple) {
+            const texts = [];
+            for (let i = 0; i < nodes.snapshotLength; i++) {
+                texts.push(nodes.snapshotItem(i).textContent);
+            }
+            fields[spec.name] = nodes.snapshotLength ? texts : null;
+        } else {
+            fields[spec.name] = nodes.snapshotLength
+                ? nodes.snapshotItem(0).textContent
+                : null;
+        }
+    }
+    const carValues = {};
+    const blocks = snapshot(blocksXpath);
+    for (let i = 0; i < blocks.snapshotLength; i++) {
+        const block = blocks.snapshotItem(i);
+        const id = block.getAttribute("id");
+        if (!id || !catList.includes(id)) continue;
+        const span = block.querySelector("span");
+        if (!span) continue;
+        if (span.textContent) carValues[id] = span.textContent;
+    }
+    return {fields, carValues};
+}
+"""
+
+
+def clean_field_value(spec: FieldSpec, raw: Any) -> Optional[str]:
+    """Нормалізує сире значення (рядок або список рядків) так само, як старий код з locator."""
+    if raw is None:
+        return None
+    if spec.multiple:
+        parts = [t.strip() for t in raw if t and t.strip()]
+        return "\n".join(parts) if parts else None
+    return (raw or "").strip()
+
+
+def _fallback_field(page: Page, spec: FieldSpec) -> Optional[str]:
+    try:
+        locator = page.locator(spec.fallback)
+        if spec.multiple:
+            return clean_field_value(spec, locator.all_text_contents())
+        if locator.count() == 0:
+            return None
+        return clean_field_value(spec, locator.first.text_content())
+    except Exception as e:
+        logger.debug("Fallback selector failed for %s: %s", spec.name, e)
+        return None
+
+
+def resolve_fields(
+    raw_fields: dict,
+    specs: Iterable[FieldSpec] = CAR_FIELD_SPECS,
+    fallback=None,
+) -> dict:
+    """
+    Збирає фінальні значення полів зі спільного результату.
+    fallback(spec) викликається для полів, яких немає в raw_fields.
+    Якщо обов'язкове поле так і не знайдено — ValueError.
+    """
+    fields = {}
+    for spec in specs:
+        value = clean_field_value(spec, raw_fields.get(spec.name))
+        if value is None and fallback is not None:
+            value = fallback(spec)
+            if value is not None:
+                logger.info("Field %s taken from fallback selector", spec.name)
+        if value is None:
+            if spec.required:
+                raise ValueError(f"Required field '{spec.name}' not found")
+            value = spec.default
+        fields[spec.name] = value
+    return fields
+
+
+def extract_car_fields(page: Page, cat_list: Iterable[str]) -> dict:
+    """
+    Витягує всі поля сторінки авто одним page.evaluate.
+    Повертає словник полів з CAR_FIELD_SPECS + "car_values" (id блоку CAT_LIST -> значення).
+    """
+    try:
+        raw = page.evaluate(
+            _EXTRACT_JS,
+            {
+                "specs": [
+                    {"name": s.name, "xpath": s.xpath, "multiple": s.multiple}
+                    for s in CAR_FIELD_SPECS
+                ],
+                "blocksXpath": DESC_LIST_BLOCKS_XPATH,
+                "catList": list(cat_list),
+            },
+        )
+    except Exception as e:
+        logger.warning("Single-pass extraction failed, using selectors: %s", e)
+        raw = {"fields": {}, "carValues": {}}
+
+    fields = resolve_fields(
+        raw.get("fields") or {}, fallback=lambda spec: _fallback_field(page, spec)
+    )
+    fields["car_values"] = {
+        key: value.strip() for key, value in (raw.get("carValues") or {}).items()
+    }
+    return fields
+
+
+_HARVEST_JS = """
+(nodes, attrs) => nodes.map((node) => {
+    const row = {};
+    for (const name of attrs) row[name] = node.getAttribute(name);
+    return row;
+})
+"""
+
+
+def harvest_attributes(page: Page, selector: str, attrs: Iterable[str]) -> list[dict]:
+    """
+    Повертає атрибути attrs для всіх вузлів, що відповідають selector, одним викликом.
+    Порядок вузлів — як у документі; відсутній атрибут -> None.
+    """
+    return page.locator(selector).evaluate_all(_HARVEST_JS, list(attrs))
+
+
+# XPath вузла з фразою, яку мають містити title/alt фото саме цього оголошення
+IMAGE_PHRASE_XPATH = "/html/body/div/main/div[1]/div[3]/div[2]/div[1]/div[1]/div[1]/span"
+
+_GALLERY_LI = '//li[contains(@style, "width:100%")]'
+
+
+def image_node_xpaths(with_phrase: bool) -> list[str]:
+    """Ланцюжок XPath для фото: від найточнішого до найширшого; береться перший непорожній."""
+    if with_phrase:
+        first = f"{_GALLERY_LI}//picture//img"
+    else:
+        first = f"{_GALLERY_LI}//picture//img | {_GALLERY_LI}//picture//source"
+    return [
+        first,
+        f"{_GALLERY_LI}//img | {_GALLERY_LI}//source",
+        "//img | //source",
+    ]
+
+
+# XPath: лише картки авто, що не всередині блоку "В інших категоріях" (InOtherCategoryList)
+CAR_CARDS_XPATH = (
+    "//a[contains(@class, 'product-card') and not(ancestor::*[@id='InOtherCategoryList'])]"
+)
+
+
+def filter_car_links(hrefs: list[str | None]) -> list[str]:
+    """Абсолютні унікальні посилання на оголошення (/auto_…) у порядку появи."""
+    links = []
+    for href in hrefs:
+        if not href:
+            continue
+        if href.startswith("/"):
+            href = "https://auto.ria.com" + href
+        if "/auto_" in href:
+            links.append(href)
+    return list(dict.fromkeys(links))
+
+
+# Лічильник результатів пошуку: окремий вузол або фраза «Знайдено N оголошень»
+SEARCH_TOTAL_XPATH = '//*[@id="staticResultsCount"]'
+_RESULT_COUNT_RE = re.compile(r"Знайдено\s+([\d\s\u00a0]+?)\s+оголош", re.IGNORECASE)
+
+
+def parse_result_count(counter_text: Optional[str], page_text: str = "") -> Optional[int]:
+    """Кількість оголошень у пошуку: з тексту лічильника, інакше з фрази в тексті сторінки."""
+    for text, pattern in ((counter_text, None), (page_text, _RESULT_COUNT_RE)):
+        if not text:
+            continue
+        if pattern is not None:
+            match = pattern.search(text)
+            if not match:
+                continue
+            text = match.group(1)
+        digits = re.sub(r"\D", "", text)
+        if digits:
+            return int(digits)
+    return None
+
+
+IMAGE_ATTRS = ("src", "data-src", "srcset", "title", "alt")
+MAX_IMAGES = 20
+
+
+def to_hd_image_url(src: str) -> str | None:
+    """Фото оголошення з riastatic -> URL HD-версії (…hd.jpg); інші URL -> None."""
+    if ("riastatic.com" in src) and ("/photosnew/auto/photo/" in src):
+        return re.sub(r"(\d+)[a-z]+\.(webp|jpg)$", r"\1hd.jpg", src)
+    return None
+
+
+def select_image_urls(
+    nodes: list[dict], required_phrase: str = "", limit: int = MAX_IMAGES
+) -> list[str]:
+    """
+    Відбирає HD-URL фото з атрибутів вузлів img/source (результат harvest_attributes).
+    Якщо задано required_phrase, лишає лише вузли, у title/alt яких вона є.
+    Порядок зберігається, дублікати відкидаються, не більше limit фото.
+    """
+    image_urls: list[str] = []
+    phrase = required_phrase.lower()
+
+    for attrs in nodes:
+        src = attrs.get("src") or attrs.get("data-src") or attrs.get("srcset")
+        if not src:
+            continue
+
+        if "," in src:
+            src = src.split(",")[0].strip().split(" ")[0]
+
+        if phrase:
+            title_attr = (attrs.get("title") or attrs.get("alt") or "").strip()
+            if not title_attr or phrase not in title_attr.lower():
+                continue
+
+        hd_src = to_hd_image_url(src)
+        if hd_src and hd_src not in image_urls:
+            image_urls.append(hd_src)
+
+    return image_urls[:limit]
@@ -0,0 +1,231 @@
+"""
+HTTP-бекенд для сторінок AutoRia: звичайний GET через пул з'єднань + розбір
+серверного HTML через lxml за тими самими FieldSpec/XPath, що й у браузері.
+
+Якщо потрібних вузлів (#sidePrice, #descList, a.product-card) у відповіді
+немає — повертаємо None, і виклична сторона переходить на Playwright.
+Лічильники FETCH_STATS показують, яку частку сторінок віддав кожен бекенд.
+"""
+
+import logging
+import os
+import threading
+from typing import Iterable, Optional
+
+import requests
+from lxml import html as lxml_html
+from requests.adapters import HTTPAdapter
+
+from app.scraper.browser_service import BROWSER_CONTEXT_OPTIONS
+from app.scraper.extractor import (
+    CAR_CARDS_XPATH,
+    CAR_FIELD_SPECS,
+    DESC_LIST_BLOCKS_XPATH,
+    IMAGE_ATTRS,
+    IMAGE_PHRASE_XPATH,
+    SEARCH_TOTAL_XPATH,
+    filter_car_links,
+    image_node_xpaths,
+    parse_result_count,
+    resolve_fields,
+    select_image_urls,
+)
+from app.scraper.embedded_json import (
+    LD_JSON_XPATH,
+    extract_embedded_car,
+    merge_embedded,
+)
+
+logger = logging.getLogger(__name__)
+
+# http_first — спочатку HTTP, браузер лише як fallback; browser — завжди Playwright
+FETCH_MODE = os.getenv("SCRAPER_FETCH_MODE", "http_first").strip().lower()
+HTTP_TIMEOUT = float(os.getenv("SCRAPER_HTTP_TIMEOUT", "20"))
+
+REQUIRED_CAR_XPATHS = ('//*[@id="sidePrice"]', '//*[@id="descList"]')
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def http_first_enabled() -> bool:
+    return FETCH_MODE == "http_first"
+
+
+def get_session() -> requests.Session:
+    """Спільна keep-alive сесія для всіх HTTP-запитів до AutoRia."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(
+                {
+                    "User-Agent": BROWSER_CONTEXT_OPTIONS["user_agent"],
+                    "Accept-Language": "uk-UA,uk;q=0.9",
+                    "Accept": "text/html,application/xhtml+xml",
+                }
+            )
+            _session = session
+        return _session
+
+
+class FetchStats:
+    """Потокобезпечні лічильники: скільки сторінок якого типу віддав кожен бекенд."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: dict[str, dict[str, int]] = {}
+
+    def record(self, kind: str, backend: str) -> None:
+        with self._lock:
+            by_backend = self._counts.setdefault(kind, {})
+            by_backend[backend] = by_backend.get(backend, 0) + 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = {}
+
+    def snapshot(self) -> dict:
+        """{kind: {"http": n, "browser": m, "http_ratio": 0.xx}} для ProcessRun.details."""
+        with self._lock:
+            result = {}
+            for kind, by_backend in self._counts.items():
+                total = sum(by_backend.values())
+                result[kind] = dict(by_backend)
+                if "http" in by_backend or "browser" in by_backend:
+                    result[kind]["http_ratio"] = (
+                        round(by_backend.get("http", 0) / total, 3) if total else 0.0
+                    )
+            return result
+
+
+FETCH_STATS = FetchStats()
+
+
+def fetch_document(url: str):
+    """GET url і розбір у lxml-дерево. None, якщо запит невдалий."""
+    try:
+        response = get_session().get(url, timeout=HTTP_TIMEOUT)
+    except requests.RequestException as e:
+        logger.info("HTTP fetch failed for %s: %s", url, e)
+        return None
+    if response.status_code != 200 or not response.content:
+        logger.info("HTTP fetch %s -> %s", url, response.status_code)
+        return None
+    try:
+        return lxml_html.fromstring(response.content)
+    except Exception as e:
+        logger.info("HTML parse failed for %s: %s", url, e)
+        return None
+
+
+def _text_of(nodes) -> list[str]:
+    return [node.text_content() for node in nodes]
+
+
+def _attrs_of(nodes, attrs: Iterable[str]) -> list[dict]:
+    return [{name: node.get(name) for name in attrs} for node in nodes]
+
+
+def _dom_fields_from_doc(doc, cat_list: Iterable[str]) -> Optional[dict]:
+    if not all(doc.xpath(xpath) for xpath in REQUIRED_CAR_XPATHS):
+        return None
+
+    raw_fields = {}
+    for spec in CAR_FIELD_SPECS:
+        nodes = doc.xpath(spec.xpath)
+        if not nodes:
+            raw_fields[spec.name] = None
+        elif spec.multiple:
+            raw_fields[spec.name] = _text_of(nodes)
+        else:
+            raw_fields[spec.name] = nodes[0].text_content()
+    try:
+        fields = resolve_fields(raw_fields)
+    except ValueError as e:
+        logger.info("HTTP page incomplete: %s", e)
+        return None
+
+    cat_set = set(cat_list)
+    car_values = {}
+    for block in doc.xpath(DESC_LIST_BLOCKS_XPATH):
+        block_id = block.get("id")
+        if not block_id or block_id not in cat_set:
+            continue
+        spans = block.xpath(".//span")
+        if spans and spans[0].text_content():
+            car_values[block_id] = spans[0].text_content().strip()
+    if not car_values:
+        return None
+    fields["car_values"] = car_values
+    return fields
+
+
+def _dom_images_from_doc(doc) -> list[str]:
+    phrase_nodes = doc.xpath(IMAGE_PHRASE_XPATH)
+    required_phrase = (phrase_nodes[0].text_content() or "").strip() if phrase_nodes else ""
+    nodes = []
+    for xpath in image_node_xpaths(bool(required_phrase)):
+        nodes = doc.xpath(xpath)
+        if nodes:
+            break
+    return select_image_urls(_attrs_of(nodes, IMAGE_ATTRS), required_phrase)
+
+
+def extract_car_fields_from_doc(doc, cat_list: Iterable[str]) -> Optional[dict]:
+    """
+    Те саме, що extractor.extract_car_fields, але для lxml-дерева (без браузера).
+    Поля — з DOM (опису і частини CAT_LIST у ld+json немає), марка/модель/рік і фото — з JSON.
+    Завжди повертає "images" (HD-URL фото). None — якщо сторінку треба віддати браузеру.
+    """
+    fields = _dom_fields_from_doc(doc, cat_list)
+    if fields is None:
+        return None
+    FETCH_STATS.record("car_fields", "dom")
+    merge_embedded(
+        fields,
+        extract_embedded_car(
+            [node.text_content() for node in doc.xpath(LD_JSON_XPATH)], cat_list
+        ),
+    )
+
+    if not fields.get("images"):
+        fields["images"] = _dom_images_from_doc(doc)
+    return fields
+
+
+def fetch_car_page(url: str, cat_list: Iterable[str]) -> Optional[dict]:
+    """HTTP-спроба для сторінки авто. None — потрібен браузер."""
+    doc = fetch_document(url)
+    if doc is None:
+        return None
+    return extract_car_fields_from_doc(doc, cat_list)
+
+
+def fetch_search_page(url: str) -> Optional[tuple[list[str], Optional[int]]]:
+    """
+    HTTP-спроба для сторінки пошуку: (посилання, кількість оголошень або None).
+    None — карток a.product-card немає, потрібен браузер.
+    """
+    doc = fetch_document(url)
+    if doc is None:
+        return None
+    cards = doc.xpath(CAR_CARDS_XPATH)
+    if not cards:
+        return None
+    links = filter_car_links([card.get("href") for card in cards])
+    counter = doc.xpath(SEARCH_TOTAL_XPATH)
+    total = parse_result_count(
+        counter[0].text_content() if counter else None,
+        "" if counter else doc.text_content(),
+    )
+    return links, total
+
+
+def fetch_search_links(url: str) -> Optional[list[str]]:
+    """HTTP-спроба для сторінки пошуку. None — карток a.product-card немає, потрібен браузер."""
+    result = fetch_search_page(url)
+    return result[0] if result is not None else None
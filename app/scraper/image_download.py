@@ -0,0 +1,185 @@
+"""
+Етап завантаження фото авто: спільна keep-alive сесія (http_fetch.get_session),
+обмежена кількість паралельних завантажень і обмеження частоти на хост CDN.
+
+ImageStage виконує обробку фото і збереження авто у фоні, щоб браузер тим часом
+відкривав наступне авто. IMAGE_STATS рахує байти/сек і затримку кожного фото.
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+import requests
+
+from app.scraper.http_fetch import HTTP_TIMEOUT, get_session
+from app.scraper.page_pool import HostRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Скільки фото одночасно завантажується (на весь процес)
+IMAGE_CONCURRENCY = int(os.getenv("IMAGE_CONCURRENCY", "4"))
+# Мінімальний інтервал (сек) між запитами до одного хоста CDN + джитер
+IMAGE_HOST_INTERVAL = float(os.getenv("IMAGE_HOST_INTERVAL", "0.2"))
+IMAGE_HOST_JITTER = float(os.getenv("IMAGE_HOST_JITTER", "0.2"))
+# Фоновий етап: скільки авто обробляється одночасно і скільки може чекати в черзі
+IMAGE_STAGE_WORKERS = int(os.getenv("IMAGE_STAGE_WORKERS", "2"))
+IMAGE_STAGE_QUEUE = int(os.getenv("IMAGE_STAGE_QUEUE", "4"))
+
+_IMAGE_HEADERS = {"Accept": "image/avif,image/webp,image/*,*/*;q=0.8"}
+
+
+class ImageDownloadStats:
+    """
+    Потокобезпечні лічильники завантажень: кількість, байти, затримка кожного фото.
+    Швидкість рахується за час, коли йшло хоча б одне завантаження.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._images = 0
+            self._failed = 0
+            self._bytes = 0
+            self._latencies: list[float] = []
+            self._active = 0
+            self._busy_since = 0.0
+            self._busy_sec = 0.0
+
+    def started(self) -> None:
+        with self._lock:
+            if self._active == 0:
+                self._busy_since = time.monotonic()
+            self._active += 1
+
+    def finished(self, size: Optional[int], latency: float) -> None:
+        """size=None — завантаження не вдалося."""
+        with self._lock:
+            self._active -= 1
+            if self._active == 0:
+                self._busy_sec += time.monotonic() - self._busy_since
+            if size is None:
+                self._failed += 1
+                return
+            self._images += 1
+            self._bytes += size
+            self._latencies.append(latency)
+
+    def snapshot(self) -> dict:
+        """Словник для ProcessRun.details."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            busy = self._busy_sec
+            if self._active:
+                busy += time.monotonic() - self._busy_since
+            result = {
+                "images": self._images,
+                "failed": self._failed,
+                "bytes": self._bytes,
+                "bytes_per_sec": round(self._bytes / busy) if busy > 0 else 0,
+            }
+            if latencies:
+                result["latency_ms_avg"] = round(1000 * sum(latencies) / len(latencies))
+                result["latency_ms_p95"] = round(
+                    1000 * latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+                )
+            return result
+
+
+IMAGE_STATS = ImageDownloadStats()
+
+_rate_limiter = HostRateLimiter(IMAGE_HOST_INTERVAL, IMAGE_HOST_JITTER)
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _download_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, IMAGE_CONCURRENCY), thread_name_prefix="image-download"
+            )
+        return _executor
+
+
+def download_image_bytes(url: str) -> Optional[bytes]:
+    """Завантажує одне фото через спільну сесію. None — якщо не вдалося."""
+    _rate_limiter.wait(url)
+    IMAGE_STATS.started()
+    started = time.monotonic()
+    content = None
+    try:
+        response = get_session().get(url, timeout=HTTP_TIMEOUT, headers=_IMAGE_HEADERS)
+        response.raise_for_status()
+        content = response.content
+    except requests.RequestException as e:
+        logger.error(f"Failed to download {url}: {e}")
+    finally:
+        latency = time.monotonic() - started
+        IMAGE_STATS.finished(len(content) if content is not None else None, latency)
+    if content is not None:
+        logger.debug(f"Downloaded {url}: {len(content)} B in {latency * 1000:.0f} ms")
+    return content
+
+
+def download_images(urls: list[str]) -> list[Optional[bytes]]:
+    """Завантажує фото паралельно (IMAGE_CONCURRENCY). Порядок результатів = порядок urls."""
+    executor = _download_executor()
+    futures = [
+        executor.submit(contextvars.copy_context().run, download_image_bytes, url)
+        for url in urls
+    ]
+    return [future.result() for future in futures]
+
+
+class ImageStage:
+    """
+    Фоновий етап «фото → збереження авто»: submit() повертає одразу, а job
+    виконується в окремому потоці, поки воркер парсить наступне авто.
+    Черга обмежена IMAGE_STAGE_QUEUE — якщо фото не встигають, submit() чекає.
+    """
+
+    def __init__(
+        self, workers: int = IMAGE_STAGE_WORKERS, max_pending: int = IMAGE_STAGE_QUEUE
+    ):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="image-stage"
+        )
+        self._slots = threading.BoundedSemaphore(max(1, workers) + max(0, max_pending))
+        self._futures: list[Future] = []
+        self._lock = threading.Lock()
+
+    def submit(self, job: Callable[[], object]) -> Future:
+        self._slots.acquire()
+        try:
+            # Копія контексту: логи етапу теж потрапляють у ProcessRun.logs
+            future = self._executor.submit(contextvars.copy_context().run, job)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        with self._lock:
+            self._futures.append(future)
+        return future
+
+    def drain(self) -> int:
+        """Чекає завершення всіх job і зупиняє етап. Повертає кількість job з помилкою."""
+        with self._lock:
+            futures = list(self._futures)
+        failed = 0
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                logger.exception("[image_stage] job failed: %s", e)
+                failed += 1
+        self._executor.shutdown(wait=True)
+        return failed
@@ -0,0 +1,150 @@
+"""
+Профілі кодування фото для TruckMarket: максимальна довша сторона, якість і формат
+(progressive/optimized JPEG або WebP). Профіль обирається за категорією батьківського
+лінка (Link.car_type) і застосовується в тому ж проході, що й обрізання логотипа
+(image_transform). За замовчуванням — original (як до профілів); jpeg / webp вмикаються
+через IMAGE_PROFILE або IMAGE_PROFILE_BY_CATEGORY, коли вимірювання їх виправдовують.
+
+Розмір і час кодування кожного профілю на вибірці фото:
+    python -m app.scraper.image_profiles app/scraper/car_images
+"""
+
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+IMAGE_WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+# Довша сторона фото після обрізання (px); більші фото зменшуються, 0 — без зменшення
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1600"))
+# Профіль за замовчуванням і профілі окремих категорій: JSON {"<Link.car_type>": "<профіль>"}
+IMAGE_PROFILE = os.getenv("IMAGE_PROFILE", "original")
+IMAGE_PROFILE_BY_CATEGORY: dict[str, str] = json.loads(
+    os.getenv("IMAGE_PROFILE_BY_CATEGORY") or "{}"
+)
+
+
+@dataclass(frozen=True)
+class ImageProfile:
+    name: str
+    max_edge: int
+    quality: int
+    format: str = "jpeg"  # jpeg | webp
+    progressive: bool = True
+    optimize: bool = True
+
+    @property
+    def ext(self) -> str:
+        return ".webp" if self.format == "webp" else ".jpg"
+
+    @property
+    def mime_type(self) -> str:
+        return "image/webp" if self.format == "webp" else "image/jpeg"
+
+    @property
+    def signature(self) -> str:
+        """Усе, що впливає на закодований файл: входить у ключ blob-а в сховищі."""
+        return (
+            f"{self.format}:{self.max_edge}:{self.quality}"
+            f":{int(self.progressive)}{int(self.optimize)}"
+        )
+
+    def encode_params(self) -> list[int]:
+        if self.format == "webp":
+            return [cv2.IMWRITE_WEBP_QUALITY, self.quality]
+        return [
+            cv2.IMWRITE_JPEG_QUALITY, self.quality,
+            cv2.IMWRITE_JPEG_PROGRESSIVE, int(self.progressive),
+            cv2.IMWRITE_JPEG_OPTIMIZE, int(self.optimize),
+        ]
+
+    def resize(self, image):
+        """Зменшує фото до max_edge по довшій стороні (INTER_AREA); менші не змінюються."""
+        height, width = image.shape[:2]
+        longest = max(height, width)
+        if not self.max_edge or longest <= self.max_edge:
+            return image
+        scale = self.max_edge / longest
+        return cv2.resize(
+            image,
+            (max(1, round(width * scale)), max(1, round(height * scale))),
+            interpolation=cv2.INTER_AREA,
+        )
+
+
+IMAGE_PROFILES: dict[str, ImageProfile] = {
+    # Як було до профілів: повна роздільність, звичайний JPEG
+    "original": ImageProfile(
+        "original", 0, IMAGE_JPEG_QUALITY, progressive=False, optimize=False
+    ),
+    "jpeg": ImageProfile("jpeg", IMAGE_MAX_EDGE, IMAGE_JPEG_QUALITY),
+    "webp": ImageProfile(
+        "webp", IMAGE_MAX_EDGE, IMAGE_WEBP_QUALITY, "webp", progressive=False, optimize=False
+    ),
+}
+
+
+def get_profile(name: Optional[str] = None) -> ImageProfile:
+    profile = IMAGE_PROFILES.get(name or IMAGE_PROFILE)
+    if profile is None:
+        logger.warning("Unknown image profile %r, using 'original'", name or IMAGE_PROFILE)
+        profile = IMAGE_PROFILES["original"]
+    return profile
+
+
+def profile_for_category(car_type: Optional[str]) -> ImageProfile:
+    """Профіль фото для категорії батьківського лінка (Link.car_type)."""
+    return get_profile(IMAGE_PROFILE_BY_CATEGORY.get(car_type or "", IMAGE_PROFILE))
+
+
+def benchmark(images_dir: str) -> dict:
+    """
+    Кодує кожне фото з images_dir усіма профілями: середній розмір (KB) і час кодування
+    (мс) на фото, частка від original. Час завантаження на TruckMarket — з
+    ProcessRun.details["uploads"] запусків process_car_add_truck_market.
+    """
+    totals = {name: [0, 0.0] for name in IMAGE_PROFILES}  # bytes, encode_ms
+    images = 0
+    for root, _, files in os.walk(images_dir):
+        for name in sorted(files):
+            if not name.lower().endswith((".jpg", ".jpeg", ".png", ".webp")):
+                continue
+            image = cv2.imread(os.path.join(root, name))
+            if image is None:
+                continue
+            images += 1
+            for profile in IMAGE_PROFILES.values():
+                started = time.perf_counter()
+                ok, buffer = cv2.imencode(
+                    profile.ext, profile.resize(image), profile.encode_params()
+                )
+                totals[profile.name][1] += (time.perf_counter() - started) * 1000
+                if ok:
+                    totals[profile.name][0] += len(buffer)
+    original_bytes = totals["original"][0]
+    return {
+        "images": images,
+        **{
+            name: {
+                "kb_avg": round(size / images / 1024, 1) if images else 0.0,
+                "encode_ms_avg": round(encode_ms / images, 1) if images else 0.0,
+                "ratio": round(size / original_bytes, 2) if original_bytes else 0.0,
+            }
+            for name, (size, encode_ms) in totals.items()
+        },
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare image profile sizes and encode time")
+    parser.add_argument("images_dir")
+    print(benchmark(parser.parse_args().images_dir))
@@ -0,0 +1,366 @@
+"""
+Контентно-адресоване сховище оброблених фото авто.
+
+Замість окремої uuid-папки з копіями фото на кожне авто:
+
+- blobs/<ab>/<key> — оброблене (обрізане) фото; key — хеш пікселів вихідного фото і
+  профілю кодування з розширенням (<hash>.jpg / <hash>.webp), тож те саме фото з різних
+  оголошень / повторного парсингу зберігається один раз;
+  поруч <key>.phash — перцептивний хеш фото для пошуку дублікатів оголошень;
+- url_index/<ab>/<sha1(url)> — key для URL джерела (або NO_LOGO), щоб повторно
+  виставлене авто не завантажувало ті самі фото знову;
+- manifests/<id>.json — впорядкований список key для одного авто. id зберігається
+  в Car.path_to_images замість назви папки.
+
+Старі uuid-папки (car_images/<uuid>/car_N_no_logo.jpg) читаються й видаляються як раніше.
+У режимі IMAGE_PIPELINE_MODE=memory нові фото тримаються в BLOB_CACHE і пишуться у фоні;
+перед url_index і маніфестом авто його фото дописуються на диск (persist_blobs).
+Усі записи атомарні (тимчасовий файл + os.replace) — у сховище пишуть кілька процесів.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+IMAGE_STORE_DIR = os.getenv("IMAGE_STORE_DIR", "car_images")
+
+# disk — фото пишуться одразу; memory — закодовані фото лишаються в пам'яті процесу
+# (IMAGE_MEMORY_CACHE_MB), на диск пишуться до маніфесту авто, завантаження на
+# TruckMarket читає їх з пам'яті — для воркерів на повільних дисках контейнера
+IMAGE_PIPELINE_MODE = os.getenv("IMAGE_PIPELINE_MODE", "disk")
+IMAGE_MEMORY_CACHE_MB = int(os.getenv("IMAGE_MEMORY_CACHE_MB", "256"))
+
+# Фото з цього URL уже оброблялось, але логотип не знайдено — не завантажувати знову
+NO_LOGO = "-"
+
+_MANIFEST_ID_RE = re.compile(r"^m-[0-9a-f]{32}$")
+_LAYOUT_DIRS = ("blobs", "url_index", "manifests")
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _scan(path: str, files: bool) -> Iterator[os.DirEntry]:
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_file() if files else entry.is_dir():
+                    yield entry
+    except FileNotFoundError:
+        return
+
+
+def _num_key(name: str) -> tuple[int, str]:
+    # "Людське" сортування: car_2 перед car_10
+    m = re.search(r"(\d+)", name)
+    if m:
+        return int(m.group(1)), name
+    return 0, name
+
+
+class BlobCache:
+    """
+    LRU-кеш закодованих фото в пам'яті процесу, обмежений max_bytes, з фоновим записом
+    на диск (write-behind, один потік). Незаписані фото не витісняються: якщо вони
+    займають увесь ліміт, put() повертає False і фото пишеться одразу.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._pending: set[str] = set()
+        self._size = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+
+    def contains(self, path: str) -> bool:
+        with self._lock:
+            return path in self._entries
+
+    def get(self, path: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(path)
+            if data is not None:
+                self._entries.move_to_end(path)
+            return data
+
+    def put(self, path: str, data: bytes) -> bool:
+        with self._lock:
+            if path in self._entries:
+                return True
+            self._evict(len(data))
+            if self._size + len(data) > self.max_bytes:
+                return False
+            self._entries[path] = data
+            self._size += len(data)
+            self._pending.add(path)
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(
+                    target=self._write_loop, name="image-store-writer", daemon=True
+                )
+                self._writer.start()
+        self._queue.put(path)
+        return True
+
+    def discard(self, path: str) -> None:
+        """Прибирає фото з пам'яті (ще не записане лишається до запису)."""
+        with self._lock:
+            if path in self._entries and path not in self._pending:
+                self._size -= len(self._entries.pop(path))
+
+    def flush(self) -> None:
+        """Чекає, поки всі фото з пам'яті будуть записані на диск."""
+        self._queue.join()
+
+    def persist(self, paths: list[str]) -> None:
+        """Записує на диск ще не записані фото з paths зараз, не чекаючи фонового потоку."""
+        for path in paths:
+            with self._lock:
+                data = self._entries.get(path) if path in self._pending else None
+            if data is None:
+                continue
+            _atomic_write(path, data)
+            with self._lock:
+                self._pending.discard(path)
+
+    def _evict(self, needed: int) -> None:
+        # Лише записані на диск, від найдавніше використаних
+        for path in list(self._entries):
+            if self._size + needed <= self.max_bytes:
+                return
+            if path not in self._pending:
+                self._size -= len(self._entries.pop(path))
+
+    def _write_loop(self) -> None:
+        while True:
+            path = self._queue.get()
+            try:
+                with self._lock:
+                    # Вже записане через persist() — не пишемо вдруге
+                    data = self._entries.get(path) if path in self._pending else None
+                if data is not None:
+                    _atomic_write(path, data)
+            except OSError as e:
+                logger.error("[image_store] background write failed for %s: %s", path, e)
+            finally:
+                with self._lock:
+                    self._pending.discard(path)
+                self._queue.task_done()
+
+
+BLOB_CACHE = BlobCache(IMAGE_MEMORY_CACHE_MB * 1024 * 1024)
+
+
+def flush_image_store() -> None:
+    """Дописує на диск фото, що ще лише в пам'яті (при зупинці воркера)."""
+    BLOB_CACHE.flush()
+
+
+class ImageStore:
+    def __init__(self, base_dir: str = IMAGE_STORE_DIR):
+        self.base_dir = base_dir
+
+    # --- blobs ---
+
+    def blob_path(self, key: str) -> str:
+        # key з розширенням — закодований профілем (image_profiles); без — старий JPEG
+        filename = key if "." in key else f"{key}.jpg"
+        return os.path.join(self.base_dir, "blobs", key[:2], filename)
+
+    def has_blob(self, key: str) -> bool:
+        path = self.blob_path(key)
+        return BLOB_CACHE.contains(path) or os.path.isfile(path)
+
+    def touch_blob(self, key: str) -> None:
+        """Оновлює mtime blob-а при повторному використанні — для LRU збирача сміття."""
+        try:
+            os.utime(self.blob_path(key))
+        except OSError:
+            pass
+
+    def put_blob(self, key: str, data: bytes) -> None:
+        """
+        Записує закодоване фото. У режимі memory — у кеш процесу з фоновим записом
+        на диск; якщо кеш переповнений незаписаними фото — одразу на диск.
+        """
+        path = self.blob_path(key)
+        if IMAGE_PIPELINE_MODE == "memory" and BLOB_CACHE.put(path, data):
+            return
+        _atomic_write(path, data)
+
+    def persist_blobs(self, keys: list[str]) -> None:
+        """
+        Дописує на диск фото, що ще лише в кеші. Викликається до remember_url /
+        create_manifest: після падіння процесу маніфест і url_index не вказують на фото,
+        яких немає на диску.
+        """
+        BLOB_CACHE.persist([self.blob_path(key) for key in keys])
+
+    def read_image(self, path: str) -> bytes:
+        """Вміст фото за шляхом з image_paths: з кешу процесу, якщо є, інакше з диска."""
+        data = BLOB_CACHE.get(path)
+        if data is not None:
+            return data
+        with open(path, "rb") as f:
+            return f.read()
+
+    # --- перцептивні хеші (app.scraper.phash), поруч із blob ---
+
+    def _phash_path(self, key: str) -> str:
+        return os.path.join(self.base_dir, "blobs", key[:2], f"{key}.phash")
+
+    def has_phash(self, key: str) -> bool:
+        return os.path.isfile(self._phash_path(key))
+
+    def write_phash(self, key: str, value: int) -> None:
+        _atomic_write(self._phash_path(key), f"{value:016x}".encode("ascii"))
+
+    def read_phash(self, key: str) -> Optional[int]:
+        try:
+            with open(self._phash_path(key), "r", encoding="ascii") as f:
+                return int(f.read().strip(), 16)
+        except (OSError, ValueError):
+            return None
+
+    # --- url index ---
+
+    def _url_path(self, url: str, variant: str = "") -> str:
+        # variant — підпис профілю кодування: те саме фото в іншому профілі — інший blob
+        source = f"{url}#{variant}" if variant else url
+        digest = hashlib.sha1(source.encode("utf-8")).hexdigest()
+        return os.path.join(self.base_dir, "url_index", digest[:2], digest)
+
+    def lookup_url(self, url: str, variant: str = "") -> Optional[str]:
+        """key вже обробленого фото з цього URL, NO_LOGO, або None — треба завантажити."""
+        try:
+            with open(self._url_path(url, variant), "r", encoding="utf-8") as f:
+                key = f.read().strip()
+        except OSError:
+            return None
+        if key == NO_LOGO:
+            return NO_LOGO
+        # Blob міг прибрати збирач сміття — тоді фото качаємо знову
+        if key and self.has_blob(key):
+            self.touch_blob(key)
+            return key
+        return None
+
+    def remember_url(self, url: str, key: str, variant: str = "") -> None:
+        try:
+            _atomic_write(self._url_path(url, variant), key.encode("utf-8"))
+        except OSError as e:
+            logger.warning("[image_store] url index write failed for %s: %s", url, e)
+
+    # --- manifests ---
+
+    def _manifest_path(self, manifest_id: str) -> str:
+        return os.path.join(self.base_dir, "manifests", f"{manifest_id}.json")
+
+    def is_manifest(self, path: str) -> bool:
+        return bool(path) and bool(_MANIFEST_ID_RE.match(path))
+
+    def create_manifest(self, keys: list[str], **meta) -> str:
+        """Зберігає впорядкований список фото авто. Повертає id для Car.path_to_images."""
+        manifest_id = f"m-{uuid.uuid4().hex}"
+        body = {"images": keys, "created_at": datetime.utcnow().isoformat() + "Z", **meta}
+        _atomic_write(
+            self._manifest_path(manifest_id),
+            json.dumps(body, ensure_ascii=False).encode("utf-8"),
+        )
+        return manifest_id
+
+    def manifest_keys(self, manifest_id: str) -> list[str]:
+        try:
+            with open(self._manifest_path(manifest_id), "r", encoding="utf-8") as f:
+                return list(json.load(f).get("images") or [])
+        except (OSError, ValueError):
+            return []
+
+    # --- для споживачів Car.path_to_images ---
+
+    def image_paths(self, path: str) -> list[str]:
+        """Шляхи до фото авто в порядку завантаження: з маніфесту або зі старої uuid-папки."""
+        if not path:
+            return []
+        if self.is_manifest(path):
+            return [
+                self.blob_path(key)
+                for key in self.manifest_keys(path)
+                if self.has_blob(key)
+            ]
+        dir_path = os.path.join(self.base_dir, path)
+        if not os.path.isdir(dir_path):
+            return []
+        filenames = [
+            name
+            for name in os.listdir(dir_path)
+            if name.lower().endswith((".jpg", ".jpeg", ".png", ".webp"))
+        ]
+        filenames.sort(key=_num_key)
+        return [os.path.join(dir_path, filename) for filename in filenames]
+
+    def release(self, path: str) -> None:
+        """
+        Фото авто більше не потрібні (вже завантажені на TruckMarket): видаляє маніфест
+        (blob-и лишаються для повторних оголошень) або стару uuid-папку.
+        """
+        if not path:
+            return
+        if self.is_manifest(path):
+            # Вже завантажені фото не тримаємо в пам'яті (на диску вони лишаються)
+            for key in self.manifest_keys(path):
+                BLOB_CACHE.discard(self.blob_path(key))
+            try:
+                os.remove(self._manifest_path(path))
+                logger.info("Removed car images manifest after upload: %s", path)
+            except FileNotFoundError:
+                pass
+            return
+        dir_path = os.path.join(self.base_dir, path)
+        if os.path.isdir(dir_path):
+            shutil.rmtree(dir_path)
+            logger.info("Removed car images folder after upload: %s", dir_path)
+
+    # --- обхід для збирача сміття (functions/image_gc) ---
+
+    def iter_manifests(self) -> Iterator[os.DirEntry]:
+        """Файли маніфестів (entry.name = <id>.json)."""
+        yield from _scan(os.path.join(self.base_dir, "manifests"), files=True)
+
+    def iter_legacy_dirs(self) -> Iterator[os.DirEntry]:
+        """Старі uuid-папки авто в корені сховища."""
+        for entry in _scan(self.base_dir, files=False):
+            if entry.name not in _LAYOUT_DIRS:
+                yield entry
+
+    def iter_blob_files(self) -> Iterator[os.DirEntry]:
+        """Усі файли в blobs/: фото, їх .phash і незавершені .tmp."""
+        for shard in _scan(os.path.join(self.base_dir, "blobs"), files=False):
+            yield from _scan(shard.path, files=True)
+
+    def iter_url_entries(self) -> Iterator[os.DirEntry]:
+        for shard in _scan(os.path.join(self.base_dir, "url_index"), files=False):
+            yield from _scan(shard.path, files=True)
+
+    def phash_paths_for(self, blob_file: str) -> list[str]:
+        """Можливі .phash поруч із файлом blob-а (ключ з розширенням і старий без нього)."""
+        root, _ = os.path.splitext(blob_file)
+        return [f"{blob_file}.phash", f"{root}.phash"]
+
@@ -0,0 +1,388 @@
+"""
+CPU-етап обробки фото: декодування, пошук логотипа, обрізання і JPEG-кодування.
+
+Виконується в ProcessPoolExecutor (IMAGE_TRANSFORM_WORKERS процесів, spawn), щоб
+OpenCV навантажував усі ядра і не ділив GIL з потоками, що керують Playwright.
+Модуль навмисно не імпортує браузерний код — дочірні процеси піднімаються швидко.
+Статистика банку шаблонів із дочірніх процесів повертається в результаті
+і зливається в батьківський процес (logo_matcher.merge_logo_stats).
+
+З LOGO_DECODE_REDUCTION=2/4/8 логотип шукається на сірій копії, декодованій зі
+зменшенням (IMREAD_REDUCED_GRAYSCALE_*); повне кольорове фото декодується лише для
+уточнення кандидата і запису обрізаного фото. За замовчуванням (1) — одне повне
+декодування: на вихідних фото кандидат знаходиться майже завжди, і друге декодування
+коштує більше, ніж економить.
+
+Порівняння часу декодування і пікової пам'яті на вихідних фото (з логотипом):
+    python -m app.scraper.image_transform <каталог фото> --reduction 2
+"""
+
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from app.scraper.image_profiles import IMAGE_PROFILE, ImageProfile, get_profile
+from app.scraper.image_store import NO_LOGO, ImageStore
+from app.scraper.logo_matcher import LogoMatcher, get_logo_matcher, merge_logo_stats
+from app.scraper.phash import dhash
+
+logger = logging.getLogger(__name__)
+
+# Кількість процесів обробки фото (порожньо — кількість ядер; 0 — у потоці, що її викликав)
+IMAGE_TRANSFORM_WORKERS = int(os.getenv("IMAGE_TRANSFORM_WORKERS") or os.cpu_count() or 1)
+# Пошук логотипа на сірому фото, декодованому зменшеним у N разів (1 — на повному кольоровому)
+LOGO_DECODE_REDUCTION = int(os.getenv("LOGO_DECODE_REDUCTION", "1"))
+
+_REDUCED_GRAYSCALE_FLAGS = {
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+
+@dataclass
+class TransformResult:
+    processed: int = 0
+    elapsed_ms: float = 0.0
+    decode_ms: float = 0.0
+    # Скільки фото довелося декодувати повністю / скільки відкинуто за зменшеною копією
+    full_decodes: int = 0
+    skipped_full_decodes: int = 0
+    # Фото, чий blob уже був у сховищі (той самий піксельний хеш)
+    deduped: int = 0
+    # Байти завантажених фото / закодованих профілем (нові blob-и)
+    source_bytes: int = 0
+    encoded_bytes: int = 0
+    keys: list[Optional[str]] = field(default_factory=list)
+    # Закодовані нові фото {key: bytes}, якщо transform_images(return_blobs=True)
+    blobs: dict[str, bytes] = field(default_factory=dict)
+    logo_stats: dict[str, tuple[int, int]] = field(default_factory=dict)
+
+
+def decode_image(content: bytes | None):
+    """Decodes downloaded image bytes into a numpy array (None if empty or broken)."""
+    if not content:
+        return None
+    img_arr = np.frombuffer(content, dtype=np.uint8)
+    return cv2.imdecode(img_arr, cv2.IMREAD_COLOR)
+
+
+def decode_reduced_gray(content: bytes | None, factor: int):
+    """Сіре фото, декодоване одразу зі зменшенням у factor (2/4/8) разів — для пошуку логотипа."""
+    if not content:
+        return None
+    img_arr = np.frombuffer(content, dtype=np.uint8)
+    return cv2.imdecode(img_arr, _REDUCED_GRAYSCALE_FLAGS[factor])
+
+
+def encode_cropped(image, match, profile: ImageProfile) -> bytes:
+    """Обрізання, зменшення і кодування профілем — один прохід по повному фото, у пам'яті."""
+    cropped = profile.resize(image[match.crop_y :, :])
+    ok, buffer = cv2.imencode(profile.ext, cropped, profile.encode_params())
+    if not ok:
+        raise ValueError(f"cv2.imencode failed ({profile.name})")
+    logger.debug(
+        f"Encoded {len(buffer)} B ({match.template}, score {match.score:.3f}, "
+        f"{match.elapsed_ms:.1f} ms)"
+    )
+    return buffer.tobytes()
+
+
+def pixel_key(pixels, profile: ImageProfile) -> str:
+    """
+    Ключ фото в сховищі: хеш декодованих пікселів (не залежить від URL і метаданих JPEG)
+    і профілю кодування, з розширенням файлу профілю.
+    """
+    digest = hashlib.sha256(f"{pixels.shape}|{profile.signature}".encode("ascii"))
+    digest.update(np.ascontiguousarray(pixels).data)
+    return digest.hexdigest() + profile.ext
+
+
+def _decode_for_matching(content: bytes, reduction: int, result: TransformResult):
+    """Копія фото для пошуку логотипа і ключа: зменшена сіра або (reduction=1) повна кольорова."""
+    started = time.perf_counter()
+    if reduction in _REDUCED_GRAYSCALE_FLAGS:
+        pixels = decode_reduced_gray(content, reduction)
+    else:
+        pixels = decode_image(content)
+        if pixels is not None:
+            result.full_decodes += 1
+    result.decode_ms += (time.perf_counter() - started) * 1000
+    return pixels
+
+
+def process_image_bytes(
+    content: bytes,
+    matcher: LogoMatcher,
+    profile: ImageProfile,
+    reduction: int = LOGO_DECODE_REDUCTION,
+    result: Optional[TransformResult] = None,
+    pixels=None,
+) -> Optional[bytes]:
+    """
+    Одне фото: з reduction 2/4/8 логотип шукається на зменшеній сірій копії, повне
+    кольорове фото декодується лише для уточнення кандидата і кодування обрізаного фото;
+    з reduction=1 — одне повне декодування для пошуку і кодування.
+    pixels — вже декодована копія для пошуку (_decode_for_matching), якщо є.
+    Повертає закодоване фото або None, якщо логотип не знайдено.
+    """
+    result = result if result is not None else TransformResult()
+    if pixels is None:
+        pixels = _decode_for_matching(content, reduction, result)
+    if pixels is None:
+        return None
+
+    if reduction not in _REDUCED_GRAYSCALE_FLAGS:
+        return crop_image(pixels, matcher, profile)
+
+    reduced = pixels
+
+    def _load_full():
+        started = time.perf_counter()
+        image = decode_image(content)
+        result.decode_ms += (time.perf_counter() - started) * 1000
+        result.full_decodes += 1
+        return image
+
+    match, image = matcher.match_reduced(reduced, reduction, _load_full)
+    if image is None:
+        result.skipped_full_decodes += 1
+    if not match.found:
+        logger.debug(f"Logo not found or match too low ({match.score:.3f})")
+        return None
+    return encode_cropped(image, match, profile)
+
+
+def crop_image(image, matcher: LogoMatcher, profile: ImageProfile) -> Optional[bytes]:
+    """Обрізає фото під логотипом і кодує профілем. None — логотип не знайдено."""
+    match = matcher.match(image)
+    if not match.found:
+        logger.debug(f"Logo not found or match too low ({match.score:.3f})")
+        return None
+    return encode_cropped(image, match, profile)
+
+
+def write_cropped(image, out_path: str, matcher: LogoMatcher, profile: ImageProfile) -> bool:
+    """Обрізає фото під логотипом і пише його у файл. False — логотип не знайдено."""
+    data = crop_image(image, matcher, profile)
+    if data is None:
+        return False
+    with open(out_path, "wb") as f:
+        f.write(data)
+    return True
+
+
+def transform_images(
+    contents: list[Optional[bytes]],
+    store_dir: str,
+    template_path: str,
+    profile_name: str = IMAGE_PROFILE,
+    return_blobs: bool = False,
+) -> TransformResult:
+    """
+    Обробляє завантажені фото авто у сховище image_store (store_dir) профілем profile_name.
+    result.keys[i] — key blob-а для contents[i], NO_LOGO або None (не вдалося декодувати).
+    Фото, чий blob уже є, повторно не обрізаються й не кодуються.
+    return_blobs — нові blob-и не пишуться на диск, а повертаються в result.blobs
+    (режим IMAGE_PIPELINE_MODE=memory: їх кладе в кеш сховища батьківський процес).
+    Виконується в дочірньому процесі, тому лише з серіалізовними аргументами.
+    """
+    started = time.perf_counter()
+    matcher = get_logo_matcher(template_path)
+    store = ImageStore(store_dir)
+    profile = get_profile(profile_name)
+    result = TransformResult()
+    for i, content in enumerate(contents, 1):
+        key = None
+        if content:
+            result.source_bytes += len(content)
+            try:
+                pixels = _decode_for_matching(content, LOGO_DECODE_REDUCTION, result)
+                if pixels is not None:
+                    key = pixel_key(pixels, profile)
+                    if store.has_blob(key):
+                        store.touch_blob(key)
+                        result.deduped += 1
+                    else:
+                        data = process_image_bytes(
+                            content, matcher, profile, result=result, pixels=pixels
+                        )
+                        if data is None:
+                            key = NO_LOGO
+                        else:
+                            result.encoded_bytes += len(data)
+                            if return_blobs:
+                                result.blobs[key] = data
+                            else:
+                                store.put_blob(key, data)
+                    if key != NO_LOGO and not store.has_phash(key):
+                        store.write_phash(key, dhash(pixels))
+            except Exception as e:
+                logger.error(f"Error processing image {i}: {e}")
+                key = None
+        if key and key != NO_LOGO:
+            result.processed += 1
+        result.keys.append(key)
+    result.elapsed_ms = (time.perf_counter() - started) * 1000
+    result.logo_stats = matcher.take_stats()
+    return result
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _transform_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if IMAGE_TRANSFORM_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn: fork процесу з потоками Playwright і пулом з'єднань БД небезпечний
+            _pool = ProcessPoolExecutor(
+                max_workers=IMAGE_TRANSFORM_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            logger.info("[image_transform] started %s worker process(es)", IMAGE_TRANSFORM_WORKERS)
+        return _pool
+
+
+def shutdown_transform_pool() -> None:
+    """Зупиняє процеси обробки фото (при зупинці воркера)."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def run_transform(
+    contents: list[Optional[bytes]],
+    store_dir: str,
+    template_path: str,
+    profile_name: str = IMAGE_PROFILE,
+    return_blobs: bool = False,
+) -> TransformResult:
+    """
+    Обробка фото одного авто в пулі процесів (блокує викликаючий потік етапу фото,
+    не сторінку браузера). Якщо пул зламався — перезапуск і обробка в цьому процесі.
+    """
+    pool = _transform_pool()
+    result = None
+    if pool is not None:
+        try:
+            result = pool.submit(
+                transform_images, contents, store_dir, template_path, profile_name, return_blobs
+            ).result()
+        except BrokenProcessPool as e:
+            logger.error("[image_transform] process pool broken, processing inline: %s", e)
+            shutdown_transform_pool()
+    if result is None:
+        result = transform_images(
+            contents, store_dir, template_path, profile_name, return_blobs
+        )
+    merge_logo_stats(result.logo_stats)
+    return result
+
+
+def benchmark(images_dir: str, reduction: int = 2) -> dict:
+    """
+    Повне кольорове декодування + пошук проти зменшеного сірого шляху на фото з images_dir:
+    середній час декодування/пошуку, пікова пам'ять (tracemalloc) на фото і збіг обрізання.
+    images_dir — вихідні фото з логотипом (як їх віддає auto.ria), а не обрізані car_N_no_logo.jpg.
+    """
+    import tracemalloc
+
+    matcher = get_logo_matcher()
+    totals = {"full": [0.0, 0.0, 0], "reduced": [0.0, 0.0, 0]}  # decode_ms, match_ms, peak
+    images = mismatches = found = skipped = 0
+
+    def _measure(kind: str, run) -> Optional[int]:
+        tracemalloc.start()
+        try:
+            decode_ms, match = run()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        total = totals[kind]
+        total[0] += decode_ms
+        total[1] += match.elapsed_ms
+        total[2] = max(total[2], peak)
+        return match.crop_y
+
+    def _full(content):
+        started = time.perf_counter()
+        image = decode_image(content)
+        decode_ms = (time.perf_counter() - started) * 1000
+        return decode_ms, matcher.match(image)
+
+    def _reduced(content):
+        result = TransformResult()
+        started = time.perf_counter()
+        reduced = decode_reduced_gray(content, reduction)
+        result.decode_ms += (time.perf_counter() - started) * 1000
+
+        def _load_full():
+            started = time.perf_counter()
+            image = decode_image(content)
+            result.decode_ms += (time.perf_counter() - started) * 1000
+            return image
+
+        nonlocal skipped
+        match, image = matcher.match_reduced(reduced, reduction, _load_full)
+        skipped += image is None
+        return result.decode_ms, match
+
+    for root, _, files in os.walk(images_dir):
+        for name in sorted(files):
+            if not name.lower().endswith((".jpg", ".jpeg")):
+                continue
+            with open(os.path.join(root, name), "rb") as f:
+                content = f.read()
+            images += 1
+            full_crop = _measure("full", lambda: _full(content))
+            reduced_crop = _measure("reduced", lambda: _reduced(content))
+            found += full_crop is not None
+            if full_crop != reduced_crop:
+                mismatches += 1
+                logger.warning("%s: crop_y full=%s reduced=%s", name, full_crop, reduced_crop)
+
+    report = {
+        "images": images,
+        "found": found,
+        "reduction": reduction,
+        "crop_mismatches": mismatches,
+        "skipped_full_decodes": skipped,
+    }
+    for kind, (decode_ms, match_ms, peak) in totals.items():
+        report[kind] = {
+            "decode_ms_avg": round(decode_ms / images, 2) if images else 0.0,
+            "match_ms_avg": round(match_ms / images, 2) if images else 0.0,
+            "peak_mb": round(peak / (1024 * 1024), 2),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark full-colour vs reduced-grayscale decode for logo matching"
+    )
+    parser.add_argument("images_dir", help="raw source photos (before the logo is cropped)")
+    parser.add_argument("--reduction", type=int, default=2)
+    cli_args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    print(benchmark(cli_args.images_dir, cli_args.reduction))
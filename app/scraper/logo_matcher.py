@@ -0,0 +1,537 @@
+"""
+Пошук логотипа (водяного знака) AutoRia на фото для обрізання.
+
+LogoMatcher тримає банк шаблонів: кілька логотипів (LOGO_TEMPLATES / LOGO_TEMPLATE_DIR)
+у кількох масштабах (LOGO_TEMPLATE_SCALES). Кожен варіант підготовлений один раз
+(кольоровий, сірий і зменшений сірий) і шукається лише у смузі зображення
+(LOGO_ROI_TOP..LOGO_ROI_BOTTOM від висоти), бо водяний знак завжди зверху.
+
+Пошук від грубого до точного: варіанти перебираються від найчастіше влучних,
+для кожного — грубий пошук у зменшеній сірій смузі; впевнений грубий кандидат
+одразу уточнюється в кольорі на повній роздільності, і перше влучання завершує
+пошук. Решта кандидатів уточнюються в порядку грубої оцінки. Уточнена оцінка
+рахується так само, як у старому matchTemplate по всьому фото, тож поріг той самий.
+
+Статистика влучань варіантів зберігається в logo_template_stats (flush_logo_stats);
+варіанти, що майже ніколи не влучають, при завантаженні банку відкидаються.
+
+Порівняння зі старим способом на вихідних фото auto.ria (з логотипом, не обрізані
+car_N_no_logo.jpg з car_images):
+    python -m app.scraper.logo_matcher /path/to/raw_photos
+"""
+
+import argparse
+import glob
+import itertools
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Iterable, Optional, Sequence
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "icon_test.png")
+
+LOGO_MATCH_THRESHOLD = float(os.getenv("LOGO_MATCH_THRESHOLD", "0.8"))
+# Смуга пошуку — частки висоти фото (0 — верх, 1 — низ)
+LOGO_ROI_TOP = float(os.getenv("LOGO_ROI_TOP", "0"))
+LOGO_ROI_BOTTOM = float(os.getenv("LOGO_ROI_BOTTOM", "0.35"))
+# Масштаб грубого пошуку (1 — без зменшення) і запас (px) вікна уточнення
+LOGO_MATCH_SCALE = float(os.getenv("LOGO_MATCH_SCALE", "0.5"))
+LOGO_REFINE_MARGIN = int(os.getenv("LOGO_REFINE_MARGIN", "8"))
+# Банк шаблонів: додаткові файли (через кому) і/або тека з .png; масштаби шаблонів
+LOGO_TEMPLATES = os.getenv("LOGO_TEMPLATES", "")
+LOGO_TEMPLATE_DIR = os.getenv("LOGO_TEMPLATE_DIR", "")
+LOGO_TEMPLATE_SCALES = os.getenv("LOGO_TEMPLATE_SCALES", "1.0,0.75,1.25")
+# Груба оцінка, з якою кандидат уточнюється одразу (рання зупинка), і нижче якої — не уточнюється
+LOGO_COARSE_CONFIDENT = float(os.getenv("LOGO_COARSE_CONFIDENT", "0.9"))
+LOGO_COARSE_MIN = float(os.getenv("LOGO_COARSE_MIN", "0.3"))
+# Відкидати варіант, якщо після N спроб частка влучань нижча за поріг (0 — не відкидати)
+LOGO_PRUNE_MIN_ATTEMPTS = int(os.getenv("LOGO_PRUNE_MIN_ATTEMPTS", "500"))
+LOGO_PRUNE_MIN_HIT_RATIO = float(os.getenv("LOGO_PRUNE_MIN_HIT_RATIO", "0.002"))
+
+
+@dataclass
+class LogoMatch:
+    """Результат пошуку: найкраща оцінка, лівий верхній кут логотипа і час пошуку."""
+
+    score: float
+    location: tuple[int, int]
+    template_size: tuple[int, int]  # (w, h)
+    elapsed_ms: float
+    threshold: float
+    template: str = ""  # ключ варіанта банку, напр. "icon_test.png@1"
+
+    @property
+    def found(self) -> bool:
+        return self.score >= self.threshold
+
+    @property
+    def crop_y(self) -> Optional[int]:
+        """Рядок, з якого починається фото без логотипа (None — логотип не знайдено)."""
+        if not self.found:
+            return None
+        return self.location[1] + self.template_size[1]
+
+
+def template_key(template_path: str, scale: float) -> str:
+    """
+    Ключ варіанта для статистики: шлях відносно кореня шаблонів (LOGO_TEMPLATE_DIR, інакше
+    каталог основного шаблону; поза коренем — абсолютний) і масштаб — однакові імена
+    файлів з різних каталогів не зливаються в один рядок logo_template_stats.
+    """
+    root = os.path.abspath(LOGO_TEMPLATE_DIR or os.path.dirname(DEFAULT_TEMPLATE_PATH))
+    path = os.path.abspath(template_path)
+    if os.path.commonpath([root, path]) == root:
+        path = os.path.relpath(path, root)
+    return f"{path.replace(os.sep, '/')}@{scale:g}"
+
+
+class _TemplateVariant:
+    """Один шаблон в одному масштабі, підготовлений для грубого і точного пошуку."""
+
+    def __init__(self, template_path: str, template, scale: float, coarse_scale: float):
+        self.key = template_key(template_path, scale)
+        if scale != 1.0:
+            template = cv2.resize(
+                template,
+                (max(1, int(template.shape[1] * scale)), max(1, int(template.shape[0] * scale))),
+                interpolation=cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC,
+            )
+        self.template = template
+        self.h, self.w = template.shape[:2]
+        self.small = None
+        small_w, small_h = int(self.w * coarse_scale), int(self.h * coarse_scale)
+        if coarse_scale < 1.0 and small_w >= 8 and small_h >= 8:
+            gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
+            self.small = cv2.resize(gray, (small_w, small_h), interpolation=cv2.INTER_AREA)
+
+
+class LogoMatcher:
+    """Банк шаблонів логотипа, підготовлений один раз; match() шукає у верхній смузі фото."""
+
+    def __init__(
+        self,
+        template_paths: str | Sequence[str] = DEFAULT_TEMPLATE_PATH,
+        threshold: float = LOGO_MATCH_THRESHOLD,
+        roi_top: float = LOGO_ROI_TOP,
+        roi_bottom: float = LOGO_ROI_BOTTOM,
+        scale: float = LOGO_MATCH_SCALE,
+        refine_margin: int = LOGO_REFINE_MARGIN,
+        template_scales: Iterable[float] = (1.0,),
+        coarse_confident: float = LOGO_COARSE_CONFIDENT,
+        coarse_min: float = LOGO_COARSE_MIN,
+        template_stats: Optional[dict[str, tuple[int, int]]] = None,
+    ):
+        if isinstance(template_paths, str):
+            template_paths = [template_paths]
+        self.threshold = threshold
+        self.roi_top = min(max(roi_top, 0.0), 1.0)
+        self.roi_bottom = min(max(roi_bottom, self.roi_top), 1.0)
+        self.scale = min(max(scale, 0.05), 1.0)
+        self.refine_margin = max(0, refine_margin)
+        self.coarse_confident = coarse_confident
+        self.coarse_min = coarse_min
+
+        variants = []
+        for path in template_paths:
+            template = cv2.imread(path)
+            if template is None:
+                raise FileNotFoundError(f"Template file '{path}' not found")
+            for template_scale in template_scales:
+                variants.append(_TemplateVariant(path, template, template_scale, self.scale))
+        self.primary_key = variants[0].key
+
+        # Статистика {ключ: (спроб, влучань)}: порядок перебору і відкидання рідкісних варіантів
+        template_stats = template_stats or {}
+        self.variants = [v for v in variants if not self._should_prune(v.key, template_stats)]
+        self.variants.sort(key=lambda v: -template_stats.get(v.key, (0, 0))[1])
+        pruned = len(variants) - len(self.variants)
+        if pruned:
+            logger.info("[logo_matcher] pruned %s rarely-hit template variant(s)", pruned)
+
+        # Мінімальні розміри — чи фото взагалі вміщує хоч один варіант
+        self.template_h = min(v.h for v in self.variants)
+        self.template_w = min(v.w for v in self.variants)
+        self.template = variants[0].template
+
+        self._stats_lock = threading.Lock()
+        self._pending: dict[str, list[int]] = {}
+
+    def _should_prune(self, key: str, stats: dict[str, tuple[int, int]]) -> bool:
+        if key == self.primary_key or LOGO_PRUNE_MIN_ATTEMPTS <= 0:
+            return False
+        attempts, hits = stats.get(key, (0, 0))
+        return attempts >= LOGO_PRUNE_MIN_ATTEMPTS and hits / attempts < LOGO_PRUNE_MIN_HIT_RATIO
+
+    def _band(self, image_h: int) -> tuple[int, int]:
+        top = int(image_h * self.roi_top)
+        bottom = max(int(math.ceil(image_h * self.roi_bottom)), top + self.template_h)
+        return top, min(bottom, image_h)
+
+    def _coarse(self, small_band, variant: _TemplateVariant):
+        """(оцінка, (x, y) у координатах смуги) за зменшеною сірою копією; None — без грубого кроку."""
+        if variant.small is None or small_band is None:
+            return None
+        th, tw = variant.small.shape[:2]
+        if small_band.shape[0] < th or small_band.shape[1] < tw:
+            return None
+        res = cv2.matchTemplate(small_band, variant.small, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, (x, y) = cv2.minMaxLoc(res)
+        return float(max_val), (int(round(x / self.scale)), int(round(y / self.scale)))
+
+    def _refine(self, band, variant: _TemplateVariant, candidate):
+        """Кольорова оцінка на повній роздільності у вікні навколо кандидата (або по всій смузі)."""
+        band_h, band_w = band.shape[:2]
+        if band_h < variant.h or band_w < variant.w:
+            return -1.0, (0, 0)
+        x0, y0, x1, y1 = 0, 0, band_w, band_h
+        if candidate is not None:
+            margin = self.refine_margin + int(math.ceil(1 / self.scale))
+            cx, cy = candidate
+            x0 = min(max(0, cx - margin), band_w - variant.w)
+            y0 = min(max(0, cy - margin), band_h - variant.h)
+            x1 = max(min(band_w, cx + variant.w + margin), x0 + variant.w)
+            y1 = max(min(band_h, cy + variant.h + margin), y0 + variant.h)
+        res = cv2.matchTemplate(band[y0:y1, x0:x1], variant.template, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, (x, y) = cv2.minMaxLoc(res)
+        return float(max_val), (x0 + x, y0 + y)
+
+    def _fits(self, image_h: int, image_w: int) -> bool:
+        top, bottom = self._band(image_h)
+        return bottom - top >= self.template_h and image_w >= self.template_w
+
+    def _candidates(self, small_band, band_top: int, tried: list[str]):
+        """
+        Кандидати (варіант, (x, y) у координатах фото або None — шукати по всій смузі)
+        у порядку уточнення. Варіанти перебираються від найчастіше влучних; впевнений
+        грубий кандидат віддається одразу (влучання зупиняє перебір), решта — після,
+        за спаданням грубої оцінки. small_band — сіра смуга в масштабі self.scale.
+        """
+        deferred = []
+        for variant in self.variants:
+            tried.append(variant.key)
+            coarse = self._coarse(small_band, variant)
+            if coarse is None:
+                deferred.append((1.0, variant, None))
+                continue
+            score, (x, y) = coarse
+            candidate = (x, band_top + y)
+            if score >= self.coarse_confident:
+                yield variant, candidate
+            elif score >= self.coarse_min or len(self.variants) == 1:
+                deferred.append((score, variant, candidate))
+        deferred.sort(key=lambda item: -item[0])
+        for _, variant, candidate in deferred:
+            yield variant, candidate
+
+    def _search(self, image, candidates, started: float, tried: list[str]) -> LogoMatch:
+        """Уточнює кандидатів на повному кольоровому фото до першого влучання."""
+        top, bottom = self._band(image.shape[0])
+        band = image[top:bottom]
+        best = None
+        for variant, candidate in candidates:
+            relative = None if candidate is None else (candidate[0], candidate[1] - top)
+            score, (x, y) = self._refine(band, variant, relative)
+            if best is None or score > best[0]:
+                best = (score, (x, top + y), variant)
+            if score >= self.threshold:
+                break
+        return self._result(best, started, tried)
+
+    def _result(self, best, started: float, tried: list[str]) -> LogoMatch:
+        score, location, variant = best or (-1.0, (0, 0), self.variants[0])
+        match = LogoMatch(
+            score=score,
+            location=location,
+            template_size=(variant.w, variant.h),
+            elapsed_ms=(time.perf_counter() - started) * 1000,
+            threshold=self.threshold,
+            template=variant.key,
+        )
+        self._record(tried, match.template if match.found else None)
+        return match
+
+    def _small_gray(self, gray_band, band_scale: float = 1.0):
+        """Сіра смуга, приведена до масштабу грубого пошуку (band_scale — її масштаб відносно фото)."""
+        if not any(v.small is not None for v in self.variants):
+            return None
+        ratio = self.scale / band_scale
+        if abs(ratio - 1.0) < 1e-6:
+            return gray_band
+        return cv2.resize(
+            gray_band,
+            (max(1, int(gray_band.shape[1] * ratio)), max(1, int(gray_band.shape[0] * ratio))),
+            interpolation=cv2.INTER_AREA,
+        )
+
+    def match(self, image) -> LogoMatch:
+        started = time.perf_counter()
+        tried: list[str] = []
+        image_h, image_w = image.shape[:2]
+        if not self._fits(image_h, image_w):
+            return self._result(None, started, tried)
+        top, bottom = self._band(image_h)
+        small_band = None
+        if any(v.small is not None for v in self.variants):
+            small_band = self._small_gray(cv2.cvtColor(image[top:bottom], cv2.COLOR_BGR2GRAY))
+        return self._search(image, self._candidates(small_band, top, tried), started, tried)
+
+    def match_reduced(
+        self, reduced_gray, factor: int, load_full: Callable[[], Any]
+    ) -> tuple[LogoMatch, Any]:
+        """
+        Грубий пошук на сірому фото, декодованому зі зменшенням у factor разів
+        (IMREAD_REDUCED_GRAYSCALE_*). Повне кольорове фото (load_full) декодується
+        лише тоді, коли є кандидат для уточнення. Повертає (LogoMatch, повне фото або None).
+        """
+        started = time.perf_counter()
+        tried: list[str] = []
+        reduced_h, reduced_w = reduced_gray.shape[:2]
+        full_h, full_w = reduced_h * factor, reduced_w * factor
+        if not self._fits(full_h, full_w):
+            return self._result(None, started, tried), None
+        top, bottom = self._band(full_h)
+        reduced_top = top // factor
+        small_band = self._small_gray(
+            reduced_gray[reduced_top : int(math.ceil(bottom / factor))], 1.0 / factor
+        )
+        candidates = self._candidates(small_band, reduced_top * factor, tried)
+        first = next(candidates, None)
+        if first is None:
+            return self._result(None, started, tried), None
+
+        decode_started = time.perf_counter()
+        image = load_full()
+        # Час повного декодування не входить у час пошуку
+        started += time.perf_counter() - decode_started
+        if image is None:
+            return self._result(None, started, tried), None
+        if not self._fits(*image.shape[:2]):
+            return self._result(None, started, tried), image
+        return self._search(image, itertools.chain([first], candidates), started, tried), image
+
+    def crop(self, image, match: Optional[LogoMatch] = None):
+        """Фото без смуги з логотипом або None, якщо логотип не знайдено."""
+        match = match or self.match(image)
+        if not match.found:
+            return None
+        return image[match.crop_y :, :]
+
+    def _record(self, tried: list[str], hit: Optional[str]) -> None:
+        with self._stats_lock:
+            for key in tried:
+                counts = self._pending.setdefault(key, [0, 0])
+                counts[0] += 1
+                if key == hit:
+                    counts[1] += 1
+
+    def take_stats(self) -> dict[str, tuple[int, int]]:
+        """Накопичені з останнього виклику {ключ: (спроб, влучань)} — і обнуляє їх."""
+        with self._stats_lock:
+            pending, self._pending = self._pending, {}
+        return {key: (attempts, hits) for key, (attempts, hits) in pending.items()}
+
+
+def configured_template_paths() -> list[str]:
+    """Основний шаблон + LOGO_TEMPLATES + усі .png з LOGO_TEMPLATE_DIR (без повторів)."""
+    paths = [DEFAULT_TEMPLATE_PATH]
+    paths += [p.strip() for p in LOGO_TEMPLATES.split(",") if p.strip()]
+    if LOGO_TEMPLATE_DIR:
+        paths += sorted(glob.glob(os.path.join(LOGO_TEMPLATE_DIR, "*.png")))
+    return list(dict.fromkeys(os.path.abspath(p) for p in paths))
+
+
+def configured_template_scales() -> list[float]:
+    """Масштаби з LOGO_TEMPLATE_SCALES; 1 завжди перший — це основний варіант, який не відкидається."""
+    scales = [float(s) for s in LOGO_TEMPLATE_SCALES.split(",") if s.strip()]
+    return list(dict.fromkeys([1.0] + scales))
+
+
+def load_template_stats() -> dict[str, tuple[int, int]]:
+    """{ключ варіанта: (спроб, влучань)} з logo_template_stats; порожньо, якщо БД недоступна."""
+    try:
+        from database.db import SessionLocal
+        from database.models import LogoTemplateStat
+
+        db = SessionLocal()
+        try:
+            return {
+                row.template: (row.attempts, row.hits)
+                for row in db.query(LogoTemplateStat).all()
+            }
+        finally:
+            db.close()
+    except Exception as e:
+        logger.info("[logo_matcher] template stats unavailable: %s", e)
+        return {}
+
+
+def save_template_stats(stats: dict[str, tuple[int, int]]) -> None:
+    """Додає лічильники до logo_template_stats (інкремент у SQL — безпечно з кількох процесів)."""
+    if not stats:
+        return
+    from database.db import SessionLocal
+    from database.models import LogoTemplateStat
+
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        for key, (attempts, hits) in stats.items():
+            values = {
+                LogoTemplateStat.attempts: LogoTemplateStat.attempts + attempts,
+                LogoTemplateStat.hits: LogoTemplateStat.hits + hits,
+                LogoTemplateStat.updated_at: now,
+            }
+            if hits:
+                values[LogoTemplateStat.last_hit_at] = now
+            updated = (
+                db.query(LogoTemplateStat)
+                .filter(LogoTemplateStat.template == key)
+                .update(values, synchronize_session=False)
+            )
+            if not updated:
+                db.add(
+                    LogoTemplateStat(
+                        template=key,
+                        attempts=attempts,
+                        hits=hits,
+                        last_hit_at=now if hits else None,
+                        updated_at=now,
+                    )
+                )
+        db.commit()
+    except Exception as e:
+        logger.error("[logo_matcher] saving template stats failed: %s", e)
+        db.rollback()
+    finally:
+        db.close()
+
+
+_matchers: dict[str, LogoMatcher] = {}
+_matchers_lock = threading.Lock()
+# Статистика, отримана з інших процесів (пул image_transform), ще не збережена в БД
+_merged_stats: dict[str, tuple[int, int]] = {}
+
+
+def get_logo_matcher(template_path: str = DEFAULT_TEMPLATE_PATH) -> LogoMatcher:
+    """
+    Спільний LogoMatcher на процес. Для основного шаблону — увесь налаштований банк
+    (шаблони × масштаби, упорядкований і проріджений за статистикою), для іншого
+    шляху — лише цей шаблон у налаштованих масштабах.
+    """
+    with _matchers_lock:
+        matcher = _matchers.get(template_path)
+        if matcher is None:
+            if os.path.abspath(template_path) == os.path.abspath(DEFAULT_TEMPLATE_PATH):
+                paths = configured_template_paths()
+            else:
+                paths = [template_path]
+            matcher = LogoMatcher(
+                paths,
+                template_scales=configured_template_scales(),
+                template_stats=load_template_stats(),
+            )
+            _matchers[template_path] = matcher
+        return matcher
+
+
+def _add_stats(
+    target: dict[str, tuple[int, int]], stats: dict[str, tuple[int, int]]
+) -> None:
+    for key, (attempts, hits) in stats.items():
+        prev_attempts, prev_hits = target.get(key, (0, 0))
+        target[key] = (prev_attempts + attempts, prev_hits + hits)
+
+
+def merge_logo_stats(stats: dict[str, tuple[int, int]]) -> None:
+    """Додає статистику з іншого процесу — її збереже наступний flush_logo_stats()."""
+    with _matchers_lock:
+        _add_stats(_merged_stats, stats)
+
+
+def flush_logo_stats() -> dict[str, tuple[int, int]]:
+    """Зберігає накопичену статистику всіх LogoMatcher процесу (і злиту з пулу). Повертає збережене."""
+    with _matchers_lock:
+        matchers = list(_matchers.values())
+        merged = dict(_merged_stats)
+        _merged_stats.clear()
+    for matcher in matchers:
+        _add_stats(merged, matcher.take_stats())
+    save_template_stats(merged)
+    return merged
+
+
+def _legacy_match(image, template) -> LogoMatch:
+    """Старий спосіб: кольоровий matchTemplate по всьому фото (для порівняння)."""
+    started = time.perf_counter()
+    res = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+    _, max_val, _, max_loc = cv2.minMaxLoc(res)
+    h, w = template.shape[:2]
+    return LogoMatch(
+        score=float(max_val),
+        location=max_loc,
+        template_size=(w, h),
+        elapsed_ms=(time.perf_counter() - started) * 1000,
+        threshold=LOGO_MATCH_THRESHOLD,
+    )
+
+
+def benchmark(images_dir: str, template_path: str = DEFAULT_TEMPLATE_PATH) -> dict:
+    """
+    Порівнює LogoMatcher зі старим пошуком на всіх фото в images_dir: час і збіг обрізання.
+    Матчер — лише з основним шаблоном у масштабі 1, як і старий спосіб.
+    images_dir — вихідні фото, як їх віддає auto.ria (з логотипом); вже обрізані
+    car_N_no_logo.jpg з car_images для цього не годяться — логотипа там немає.
+    """
+    matcher = LogoMatcher(template_path)
+    legacy_ms = matcher_ms = 0.0
+    images = mismatches = found = 0
+    for root, _, files in os.walk(images_dir):
+        for name in sorted(files):
+            if not name.lower().endswith((".jpg", ".jpeg", ".png")):
+                continue
+            image = cv2.imread(os.path.join(root, name))
+            if image is None or image.shape[0] < matcher.template_h or image.shape[1] < matcher.template_w:
+                continue
+            legacy = _legacy_match(image, matcher.template)
+            current = matcher.match(image)
+            images += 1
+            legacy_ms += legacy.elapsed_ms
+            matcher_ms += current.elapsed_ms
+            found += current.found
+            if legacy.crop_y != current.crop_y:
+                mismatches += 1
+                logger.warning(
+                    "%s: crop_y legacy=%s matcher=%s (scores %.3f / %.3f)",
+                    name,
+                    legacy.crop_y,
+                    current.crop_y,
+                    legacy.score,
+                    current.score,
+                )
+    return {
+        "images": images,
+        "found": found,
+        "crop_mismatches": mismatches,
+        "legacy_ms_avg": round(legacy_ms / images, 2) if images else 0.0,
+        "matcher_ms_avg": round(matcher_ms / images, 2) if images else 0.0,
+        "speedup": round(legacy_ms / matcher_ms, 1) if matcher_ms else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark LogoMatcher against full-image matching")
+    parser.add_argument("images_dir", help="raw source photos (before the logo is cropped)")
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE_PATH)
+    cli_args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    print(benchmark(cli_args.images_dir, cli_args.template))
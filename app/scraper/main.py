@@ -1,13 +1,37 @@
 import time
 import random
 import logging
-import os
-import uuid
-import re
-import requests
-import numpy as np
-import cv2
+from concurrent.futures import Future
+from contextlib import ExitStack
 from playwright.sync_api import sync_playwright, Page
+from app.scraper.browser_service import lease_page
+from app.scraper.extractor import (
+    CAR_CARDS_XPATH,
+    IMAGE_ATTRS,
+    IMAGE_PHRASE_XPATH,
+    MAX_IMAGES,
+    SEARCH_TOTAL_XPATH,
+    extract_car_fields,
+    filter_car_links,
+    harvest_attributes,
+    image_node_xpaths,
+    parse_result_count,
+    select_image_urls,
+)
+from app.scraper.embedded_json import (
+    LD_JSON_JS,
+    extract_embedded_car,
+    is_complete,
+    merge_embedded,
+)
+from app.scraper.logo_matcher import DEFAULT_TEMPLATE_PATH, get_logo_matcher
+from app.scraper.http_fetch import FETCH_STATS, fetch_car_page, http_first_enabled
+from app.scraper.image_download import ImageStage, download_image_bytes, download_images
+from app.scraper.image_profiles import ImageProfile, get_profile
+from app.scraper.image_store import IMAGE_PIPELINE_MODE, NO_LOGO, ImageStore
+from app.scraper.image_transform import decode_image, run_transform, write_cropped
+from app.scraper.route_profiles import CAR_ROUTE_PROFILE, timed_goto
+from functions.car_batch_writer import CarBatchWriter, CarRecord
 from functions.function import save_data_to_db, save_failed_car_and_add_to_delete
 from database.models import StatusProcessed
 
@@ -42,83 +66,104 @@ CAT_LIST = [
 def download_as_array(url: str):
     """Downloads image from URL and returns as numpy array."""
     try:
-        time.sleep(1)
-        r = requests.get(url, timeout=15)
-        r.raise_for_status()
-        img_arr = np.frombuffer(r.content, dtype=np.uint8)
-        return cv2.imdecode(img_arr, cv2.IMREAD_COLOR)
+        return decode_image(download_image_bytes(url))
     except Exception as e:
-        logger.error(f"Failed to download {url}: {e}")
+        logger.error(f"Failed to decode {url}: {e}")
         return None
 
 
 def generate_formatted_data(
-    image, out_path: str, template_path: str, quality: int = 85
+    image, out_path: str, template_path: str, profile: ImageProfile | None = None
 ) -> bool:
-    """Crops image using template matching and saves to output path."""
-    if not os.path.exists(template_path):
-        logger.error(f"Template file '{template_path}' not found")
-        return False
-
-    template = cv2.imread(template_path)
-    h, w = template.shape[:2]
-    res = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
-    _, max_val, _, max_loc = cv2.minMaxLoc(res)
-
-    if max_val >= 0.8:
-        y_crop = max_loc[1] + h
-        cropped = image[y_crop:, :]
-        cv2.imwrite(out_path, cropped, [cv2.IMWRITE_JPEG_QUALITY, quality])
-        logger.debug(f"Processed {os.path.basename(out_path)}")
-        return True
-    else:
-        logger.debug("Logo not found or match too low")
+    """Crops image using template matching and saves it to output path with an encoder profile."""
+    try:
+        matcher = get_logo_matcher(template_path)
+    except FileNotFoundError as e:
+        logger.error(str(e))
         return False
+    return write_cropped(image, out_path, matcher, profile or get_profile())
 
 
 def process_images(
-    images: list, template_path: str = None, output_base: str = "car_images"
+    images: list,
+    template_path: str = None,
+    store: ImageStore = None,
+    profile: ImageProfile = None,
 ) -> str:
-    """Processes images by cropping and saves to UUID folder, returns folder name."""
+    """
+    Processes car images into the content-addressed image store, encoded with `profile`.
+    Returns a manifest id for Car.path_to_images ("" if nothing was processed).
+    """
     if not images:
         logger.warning("No images to process")
         return ""
 
     if template_path is None:
-        template_path = os.path.join(os.path.dirname(__file__), "icon_test.png")
-
-    folder_name = str(uuid.uuid4())
-    output_dir = os.path.join(output_base, folder_name)
-
-    try:
-        os.makedirs(output_dir, exist_ok=True)
-        logger.info(f"Created folder: '{output_dir}'")
-    except Exception as e:
-        logger.error(f"Error creating folder '{output_dir}': {e}")
-        return ""
+        template_path = DEFAULT_TEMPLATE_PATH
+    if store is None:
+        store = ImageStore()
+    if profile is None:
+        profile = get_profile()
+
+    # Фото з уже відомих URL (повторно виставлене авто) не завантажуються знову
+    known = {url: store.lookup_url(url, profile.signature) for url in images}
+    to_fetch = [url for url in images if known[url] is None]
+    reused = len(images) - len(to_fetch)
+
+    if to_fetch:
+        # Фото качаються паралельно через спільну сесію (частоту на хост обмежує image_download)
+        started = time.monotonic()
+        contents = download_images(to_fetch)
+        downloaded = [c for c in contents if c]
+        logger.info(
+            f"Downloaded {len(downloaded)}/{len(to_fetch)} images "
+            f"({sum(map(len, downloaded)) / 1024:.0f} KB) in {time.monotonic() - started:.1f}s"
+        )
 
-    processed_count = 0
-    for i, url in enumerate(images, 1):
+        # Декодування, пошук логотипа і JPEG — у пулі процесів (image_transform)
         try:
-            # Затримка 1 секунда між обробкою кожного фото
-            if i > 1:
-                time.sleep(1)
-
-            img = download_as_array(url)
-            if img is None:
-                continue
-
-            out_file = f"car_{i}_no_logo.jpg"
-            out_path = os.path.join(output_dir, out_file)
-
-            if generate_formatted_data(img, out_path, template_path):
-                processed_count += 1
+            result = run_transform(
+                contents,
+                store.base_dir,
+                template_path,
+                profile.name,
+                return_blobs=IMAGE_PIPELINE_MODE == "memory",
+            )
         except Exception as e:
-            logger.error(f"Error processing {url}: {e}")
-
-    if processed_count:
-        logger.info(f"Processed {processed_count} images in '{output_dir}'")
-        return folder_name
+            logger.error(f"Error processing images: {e}")
+            return ""
+        logger.info(
+            f"Transformed {result.processed} images in {result.elapsed_ms:.0f} ms "
+            f"(decode {result.decode_ms:.0f} ms, full decodes {result.full_decodes}, "
+            f"skipped {result.skipped_full_decodes}, deduped {result.deduped})"
+        )
+        if result.encoded_bytes:
+            logger.info(
+                f"Encoded with profile '{profile.name}': {result.source_bytes / 1024:.0f} KB "
+                f"downloaded -> {result.encoded_bytes / 1024:.0f} KB stored"
+            )
+        for key, data in result.blobs.items():
+            store.put_blob(key, data)
+        # Фото — на диск до url_index, маніфесту і запису авто в БД
+        store.persist_blobs(list(result.blobs))
+        for url, key in zip(to_fetch, result.keys):
+            if key:
+                store.remember_url(url, key, profile.signature)
+                known[url] = key
+
+    keys = []
+    for url in images:
+        key = known[url]
+        if key and key != NO_LOGO and key not in keys:
+            keys.append(key)
+
+    if keys:
+        manifest_id = store.create_manifest(keys, profile=profile.name)
+        logger.info(
+            f"Stored {len(keys)} images in manifest '{manifest_id}' "
+            f"(reused {reused} of {len(images)} by URL)"
+        )
+        return manifest_id
     else:
         logger.warning("No images were processed")
         return ""
@@ -126,113 +171,44 @@ def process_images(
 
 def get_images_by_width(url: str, page=None, target_width: str = "100%") -> list:
     """Extracts image URLs from a page using Playwright."""
-    browser = None
-    playwright_instance = None
-    should_close_browser = False
-
-    try:
+    with ExitStack() as stack:
         if page is None:
-            playwright_instance = sync_playwright().start()
-            browser = playwright_instance.chromium.launch()
-            page = browser.new_page()
-            should_close_browser = True
-            # Якщо створюємо новий page, завантажуємо сторінку
-            if url:
-                page.goto(url, wait_until="domcontentloaded", timeout=60000)
-                page.wait_for_load_state("networkidle", timeout=30000)
+            # Власна сторінка в орендованому контексті теплого браузера
+            try:
+                page = stack.enter_context(lease_page(CAR_ROUTE_PROFILE))
+                if url:
+                    timed_goto(page, url, wait_until="domcontentloaded", timeout=60000)
+                    page.wait_for_load_state("networkidle", timeout=30000)
+            except Exception as e:
+                logger.error(f"Error loading page {url}: {e}")
+                return []
         # Якщо page передано, не завантажуємо сторінку знову (вона вже завантажена в parse_car)
-    except Exception as e:
-        logger.error(f"Error loading page {url}: {e}")
-        if browser:
-            browser.close()
-        if playwright_instance:
-            playwright_instance.stop()
-        return []
+        return _collect_image_urls(page)
+
 
+def _collect_image_urls(page: Page) -> list:
     required_phrase = ""
     try:
-        phrase_locator = page.locator(
-            "xpath=/html/body/div/main/div[1]/div[3]/div[2]/div[1]/div[1]/div[1]/span"
-        )
+        phrase_locator = page.locator(f"xpath={IMAGE_PHRASE_XPATH}")
         if phrase_locator.count() > 0:
             required_phrase = (phrase_locator.first.text_content() or "").strip()
     except Exception as e:
         logger.debug(f"Failed to extract phrase from XPath: {e}")
 
-    image_urls = []
-
     try:
-        if required_phrase:
-            containers = page.locator('li[style*="width:100%"] picture img')
-        else:
-            containers = page.locator(
-                'li[style*="width:100%"] picture img, li[style*="width:100%"] picture source'
-            )
-
-        container_count = containers.count()
-
-        if container_count == 0:
-            containers = page.locator(
-                'li[style*="width:100%"] img, li[style*="width:100%"] source'
-            )
-            container_count = containers.count()
-
-        if container_count == 0:
-            containers = page.locator("img, source")
-            container_count = containers.count()
-
-        for i in range(container_count):
-            try:
-                element = containers.nth(i)
-
-                src = (
-                    element.get_attribute("src")
-                    or element.get_attribute("data-src")
-                    or element.get_attribute("srcset")
-                )
-                if not src:
-                    continue
-
-                if "," in src:
-                    src = src.split(",")[0].strip().split(" ")[0]
-
-                if required_phrase:
-                    title_attr = (
-                        element.get_attribute("title")
-                        or element.get_attribute("alt")
-                        or ""
-                    ).strip()
-                    if (
-                        not title_attr
-                        or required_phrase.lower() not in title_attr.lower()
-                    ):
-                        continue
-
-                if ("riastatic.com" in src) and ("/photosnew/auto/photo/" in src):
-                    hd_src = re.sub(r"(\d+)[a-z]+\.(webp|jpg)$", r"\1hd.jpg", src)
-                    # Додаємо тільки якщо ще немає в списку (зберігаємо порядок)
-                    if hd_src not in image_urls:
-                        image_urls.append(hd_src)
-            except Exception as e:
-                logger.debug(f"Error processing element {i}: {e}")
-                continue
-
+        nodes = []
+        for xpath in image_node_xpaths(bool(required_phrase)):
+            nodes = harvest_attributes(page, f"xpath={xpath}", IMAGE_ATTRS)
+            if nodes:
+                break
     except Exception as e:
         logger.error(f"Error searching for images: {e}")
-        if browser:
-            browser.close()
-        if playwright_instance:
-            playwright_instance.stop()
         return []
-    finally:
-        if browser and should_close_browser:
-            browser.close()
-        if playwright_instance and should_close_browser:
-            playwright_instance.stop()
-
-    # Обмежуємо до 20 фото включно (порядок зберігається)
-    image_urls = image_urls[:20]
-    logger.info(f"Found {len(image_urls)} images (limited to 20, order preserved)")
+
+    image_urls = select_image_urls(nodes, required_phrase)
+    logger.info(
+        f"Found {len(image_urls)} images (limited to {MAX_IMAGES}, order preserved)"
+    )
     return image_urls
 
 
@@ -283,12 +259,6 @@ def accept_cookies(page: Page):
         pass
 
 
-# XPath: лише картки авто, що не всередині блоку "В інших категоріях" (InOtherCategoryList)
-_CAR_CARDS_XPATH = (
-    "//a[contains(@class, 'product-card') and not(ancestor::*[@id='InOtherCategoryList'])]"
-)
-
-
 def get_links(page: Page) -> list[str]:
     logger.info("Waiting for search cards")
 
@@ -301,21 +271,34 @@ def get_links(page: Page) -> list[str]:
     pause(1.5, 3)
     scroll(page, 2)
 
-    cards = page.locator(f"xpath={_CAR_CARDS_XPATH}")
-    links = []
+    cards = harvest_attributes(page, f"xpath={CAR_CARDS_XPATH}", ("href",))
+    links = filter_car_links([card["href"] for card in cards])
 
-    for i in range(cards.count()):
-        href = cards.nth(i).get_attribute("href")
-        if not href:
-            continue
-        if href.startswith("/"):
-            href = "https://auto.ria.com" + href
-        if "/auto_" in href:
-            links.append(href)
+    logger.info("Found %s auto links (excluding InOtherCategoryList)", len(links))
+    return links
+
+
+_SEARCH_TOTAL_JS = """
+(xpath) => {
+    const node = document.evaluate(
+        xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+    ).singleNodeValue;
+    return {
+        counter: node ? node.textContent : null,
+        text: node ? "" : (document.body ? document.body.innerText : ""),
+    };
+}
+"""
 
-    unique = list(dict.fromkeys(links))
-    logger.info("Found %s auto links (excluding InOtherCategoryList)", len(unique))
-    return unique
+
+def get_search_total(page: Page) -> int | None:
+    """Кількість оголошень на вже відкритій сторінці пошуку (None — не знайдено)."""
+    try:
+        raw = page.evaluate(_SEARCH_TOTAL_JS, SEARCH_TOTAL_XPATH)
+    except Exception as e:
+        logger.debug("Search total not available: %s", e)
+        return None
+    return parse_result_count(raw.get("counter"), raw.get("text") or "")
 
 
 def extract_car_values(page: Page) -> dict:
@@ -456,14 +439,59 @@ def extract_car_info_from_values(car_values: dict) -> dict:
     return result
 
 
-def parse_car(page: Page, car_link: str, parent_link: str):
+def _save_car(
+    writer: CarBatchWriter | None,
+    data: dict,
+    parent_link: str,
+    car_link: str,
+    processed_status: StatusProcessed | None = None,
+) -> None:
+    """Зберігає авто одразу або, якщо є writer, додає в пачку CarBatchWriter."""
+    if writer is not None:
+        writer.add(CarRecord(data, parent_link, car_link, processed_status))
+    else:
+        save_data_to_db(data, parent_link, car_link, processed_status=processed_status)
+
+
+def _save_failed(writer: CarBatchWriter | None, parent_link: str, car_link: str) -> None:
+    if writer is not None:
+        writer.add(CarRecord({}, parent_link, car_link, parse_failed=True))
+    else:
+        save_failed_car_and_add_to_delete(parent_link, car_link)
+
+
+def _load_car_fields_in_browser(
+    page: Page, car_link: str, parent_link: str, writer: CarBatchWriter | None = None
+):
     """
-    Парсить дані про авто за персональним лінком.
-    При помилці (таймаут, відсутній #descList тощо) ставить FAILED і додає в links_to_delete.
+    Відкриває сторінку авто в браузері і витягує поля: спершу з ld+json, інакше з DOM.
+    Повертає None, якщо сторінка не відкрилась або немає базових полів (авто вже збережено як FAILED).
     """
-    logger.info("OPEN %s", car_link)
     try:
-        page.goto(car_link, wait_until="domcontentloaded", timeout=60000)
+        timed_goto(page, car_link, wait_until="domcontentloaded", timeout=60000)
+    except Exception as e:
+        logger.error("Parse failed (goto): %s", e)
+        _save_failed(writer, parent_link, car_link)
+        return None
+
+    # ld+json є вже після domcontentloaded — якщо він повний, DOM не чекаємо
+    try:
+        embedded = extract_embedded_car(page.evaluate(LD_JSON_JS), CAT_LIST)
+    except Exception as e:
+        logger.debug("Embedded JSON unavailable: %s", e)
+        embedded = {}
+    if is_complete(embedded):
+        # Дані вже на сторінці: опис і CAT_LIST (їх у JSON немає) читаємо з DOM одразу
+        try:
+            fields = extract_car_fields(page, CAT_LIST)
+        except Exception as e:
+            logger.info("DOM not ready after embedded JSON, waiting: %s", e)
+        else:
+            if fields["car_values"]:
+                FETCH_STATS.record("car_fields", "embedded_json")
+                return merge_embedded(fields, embedded)
+
+    try:
         pause(2, 4)
         scroll(page, 2)
         move_mouse(page)
@@ -471,54 +499,17 @@ def parse_car(page: Page, car_link: str, parent_link: str):
         page.wait_for_selector("#descList", timeout=20000)
     except Exception as e:
         logger.error("Parse failed (goto/wait): %s", e)
-        save_failed_car_and_add_to_delete(parent_link, car_link)
-        return
+        _save_failed(writer, parent_link, car_link)
+        return None
 
     try:
-        price = page.locator("#sidePrice strong").text_content().strip()
-        title = (
-            page.locator('xpath=//*[@id="sideTitleTitle"]/span').text_content().strip()
-        )
-        # Парсимо повну назву з basicInfoTitle для brand та model
-        full_title_elem = page.locator('xpath=//*[@id="basicInfoTitle"]/h1')
-        full_title = ""
-        if full_title_elem.count() > 0:
-            full_title = full_title_elem.first.text_content().strip()
-        mileage = page.locator("#basicInfoTableMainInfo0 span").text_content().strip()
-        location = (
-            page.locator("#basicInfoTableMainInfoGeo span").text_content().strip()
-        )
-        description = (
-            page.locator('xpath=//*[@id="descCharacteristicsValue"]/span')
-            .text_content()
-            .strip()
-        )
-
-        # Парсимо детальний опис (може бути або не бути)
-        # Коректний XPath з сторінки:
-        # /html/body/div/main/div[1]/div[2]/div[1]/div[6]/div[1]/span/text()
-        full_description = None
-        try:
-            full_desc_locator = page.locator(
-                "xpath=/html/body/div/main/div[1]/div[2]/div[1]/div[6]/div[1]/span"
-            )
-            if full_desc_locator.count() > 0:
-                # Беремо всі текстові частини і об'єднуємо в один багаторядковий текст
-                parts = [
-                    t.strip()
-                    for t in full_desc_locator.all_text_contents()
-                    if t and t.strip()
-                ]
-                if parts:
-                    full_description = "\n".join(parts)
-        except Exception:
-            # Якщо елементу немає або структура інша – залишаємо None
-            full_description = None
-
+        # Усі поля одним page.evaluate; відсутні поля — через старі селектори
+        fields = extract_car_fields(page, CAT_LIST)
     except Exception as e:
         logger.error("FAILED base fields: %s", e)
         try:
-            save_data_to_db(
+            _save_car(
+                writer,
                 {
                     "price": "0",
                     "full_title": "",
@@ -534,28 +525,75 @@ def parse_car(page: Page, car_link: str, parent_link: str):
                 },
                 parent_link,
                 car_link,
-                processed_status=StatusProcessed.FAILED,
+                StatusProcessed.FAILED,
             )
         except Exception:
             pass
-        return
+        return None
 
-    car_values = extract_car_values(page)
+    if not fields["car_values"]:
+        fields["car_values"] = extract_car_values(page)
+    FETCH_STATS.record("car_fields", "dom")
+    return merge_embedded(fields, embedded)
+
+
+def parse_car(
+    page: Page,
+    car_link: str,
+    parent_link: str,
+    image_stage: ImageStage | None = None,
+    image_profile: ImageProfile | None = None,
+    writer: CarBatchWriter | None = None,
+) -> Future | bool:
+    """
+    Парсить дані про авто за персональним лінком.
+    Спершу пробує звичайний HTTP (SCRAPER_FETCH_MODE=http_first), браузер — якщо в HTML бракує вузлів.
+    При помилці (таймаут, відсутній #descList тощо) ставить FAILED і додає в links_to_delete.
+
+    З image_stage фото обробляються і авто зберігається у фоні: parse_car повертає
+    Future цього етапу, а сторінку вже можна віддавати наступному авто.
+    Без image_stage (або без фото) усе робиться тут же і повертається True.
+    False — авто не спарсено і збережено як FAILED.
+    image_profile — профіль кодування фото для категорії батьківського лінка.
+    writer — CarBatchWriter: авто не пишеться в БД одразу, а йде в пачку.
+    """
+    logger.info("OPEN %s", car_link)
+    fields = None
+    if http_first_enabled():
+        fields = fetch_car_page(car_link, CAT_LIST)
+        if fields is None:
+            logger.info("HTTP page incomplete, falling back to browser: %s", car_link)
+
+    if fields is not None:
+        FETCH_STATS.record("car", "http")
+    else:
+        FETCH_STATS.record("car", "browser")
+        fields = _load_car_fields_in_browser(page, car_link, parent_link, writer)
+        if fields is None:
+            return False
+
+    price = fields["price"]
+    title = fields["title"]
+    full_title = fields["full_title"]
+    mileage = fields["mileage"]
+    location = fields["location"]
+    description = fields["description"]
+    full_description = fields["full_description"]
+
+    car_values = fields["car_values"]
+    logger.info("car_values parsed: %s", car_values)
 
     if not car_values:
         logger.error("car_values EMPTY - saving with FAILED status")
         try:
-            save_data_to_db(
+            _save_car(
+                writer,
                 {
-                    "price": price if "price" in locals() else "0",
-                    "full_title": title if "title" in locals() else "",
-                    "mileage": mileage if "mileage" in locals() else "0",
-                    "location": location if "location" in locals() else "",
-                    "description": (
-                        description
-                        if "description" in locals()
-                        else "car_values is empty"
-                    ),
+                    "price": price,
+                    "full_title": title,
+                    "mileage": mileage,
+                    "location": location,
+                    "description": description,
                     "car_values": {},
                     "brand": "Unknown",
                     "year": 0,
@@ -565,18 +603,18 @@ def parse_car(page: Page, car_link: str, parent_link: str):
                 },
                 parent_link,
                 car_link,
-                processed_status=StatusProcessed.FAILED,
+                StatusProcessed.FAILED,
             )
         except Exception:
             pass
-        return
+        return False
 
     # Парсимо title для brand та year (fallback)
     title_info = parse_title(title)
 
     # Парсимо повну назву з basicInfoTitle для brand, model та year
     brand_model_info = {"brand": "Unknown", "model": None, "year": 0}
-    if "full_title" in locals() and full_title:
+    if full_title:
         brand_model_info = parse_brand_and_model(full_title)
         # Якщо не знайшли brand з full_title, використовуємо з title
         if brand_model_info["brand"] == "Unknown":
@@ -589,17 +627,19 @@ def parse_car(page: Page, car_link: str, parent_link: str):
         brand_model_info = title_info
         brand_model_info["model"] = None
 
+    # Структуровані дані сторінки (ld+json) точніші за розбір назви
+    for key in ("brand", "model", "year"):
+        if fields.get(key):
+            brand_model_info[key] = fields[key]
+
     # Витягуємо інформацію з car_values
     car_info = extract_car_info_from_values(car_values)
 
-    # Отримуємо зображення зі сторінки
-    images = get_images_by_width(car_link, page=page)
-
-    # Обробляємо зображення
-    path_to_images = ""
-    if images:
-        path_to_images = process_images(images)
-        logger.info(f"Processed {len(images)} images, folder: {path_to_images}")
+    # Отримуємо зображення зі сторінки (HTTP-бекенд уже повернув їх разом з полями)
+    if "images" in fields:
+        images = fields["images"]
+    else:
+        images = get_images_by_width(car_link, page=page)
 
     data = {
         "price": price,
@@ -607,9 +647,7 @@ def parse_car(page: Page, car_link: str, parent_link: str):
         "mileage": mileage,
         "location": location,
         "description": description,
-        "full_description": full_description
-        if "full_description" in locals()
-        else None,
+        "full_description": full_description,
         "car_values": car_values,
         # Додаємо витягнуті дані
         "brand": brand_model_info["brand"],
@@ -618,11 +656,8 @@ def parse_car(page: Page, car_link: str, parent_link: str):
         "fuel_type": car_info["fuel_type"],
         "transmission": car_info["transmission"],
         "color": car_info["color"],
-        # Додаємо шлях до оброблених зображень
-        "path_to_images": path_to_images,
     }
 
-    logger.warning("SAVE DATA car_values=%s", data["car_values"])
     logger.info(
         "Parsed data: brand=%s, year=%s, fuel_type=%s, transmission=%s",
         data["brand"],
@@ -630,8 +665,23 @@ def parse_car(page: Page, car_link: str, parent_link: str):
         data["fuel_type"],
         data["transmission"],
     )
-    save_data_to_db(data, parent_link, car_link)
-    logger.info("SAVED %s", car_link)
+
+    def _process_images_and_save():
+        # Обробляємо зображення; шлях до папки з ними зберігається разом з авто
+        data["path_to_images"] = ""
+        if images:
+            data["path_to_images"] = process_images(images, profile=image_profile)
+            logger.info(
+                f"Processed {len(images)} images, manifest: {data['path_to_images']}"
+            )
+        logger.warning("SAVE DATA car_values=%s", data["car_values"])
+        _save_car(writer, data, parent_link, car_link)
+        logger.info("SAVED %s", car_link)
+
+    if image_stage is not None and images:
+        return image_stage.submit(_process_images_and_save)
+    _process_images_and_save()
+    return True
 
 
 def run():
@@ -0,0 +1,173 @@
+"""
+Пул сторінок Playwright для паралельного парсингу авто.
+
+Sync API Playwright прив'язаний до потоку, в якому його створили, тому кожен
+воркер пулу орендує власний контекст (browser_service) і бере задачі зі спільної черги.
+Частоту звернень до одного хоста обмежує спільний HostRateLimiter.
+"""
+
+import contextvars
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Generator, Iterable, Optional
+from urllib.parse import urlparse
+
+from playwright.sync_api import Page
+
+from app.scraper.browser_service import close_thread_browser, lease_page
+from app.scraper.route_profiles import CAR_ROUTE_PROFILE
+
+logger = logging.getLogger(__name__)
+
+# Кількість паралельних сторінок (воркерів) для parse_links_to_create
+PARSE_CONCURRENCY = int(os.getenv("PARSE_CONCURRENCY", "3"))
+# Мінімальний інтервал (сек) між відкриттям сторінок одного хоста + випадковий джитер
+PARSE_HOST_INTERVAL = float(os.getenv("PARSE_HOST_INTERVAL", "1"))
+PARSE_HOST_JITTER = float(os.getenv("PARSE_HOST_JITTER", "4"))
+
+class HostRateLimiter:
+    """
+    Обмежує частоту запитів до одного хоста: між двома стартами запитів
+    до того самого хоста проходить щонайменше min_interval (+ джитер) секунд.
+    Потокобезпечний — один екземпляр ділять усі воркери пулу.
+    """
+
+    def __init__(self, min_interval: float, jitter: float = 0.0):
+        self.min_interval = max(0.0, min_interval)
+        self.jitter = max(0.0, jitter)
+        self._next_slot: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str) -> float:
+        """Блокує до наступного вільного слота для хоста url. Повертає час очікування."""
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot.get(host, now), now)
+            self._next_slot[host] = (
+                slot + self.min_interval + random.uniform(0, self.jitter)
+            )
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+@dataclass
+class PoolStats:
+    """Підсумок роботи пулу: скільки задач оброблено і з якою швидкістю."""
+
+    concurrency: int = 0
+    processed: int = 0
+    failed: int = 0
+    elapsed_sec: float = 0.0
+    per_worker: dict[int, int] = field(default_factory=dict)
+
+    @property
+    def per_minute(self) -> float:
+        if self.elapsed_sec <= 0:
+            return 0.0
+        return self.processed * 60.0 / self.elapsed_sec
+
+    def as_details(self) -> dict:
+        """Словник для ProcessRun.details."""
+        return {
+            "concurrency": self.concurrency,
+            "parsed": self.processed,
+            "failed": self.failed,
+            "elapsed_sec": round(self.elapsed_sec, 1),
+            "cars_per_min": round(self.per_minute, 2),
+        }
+
+
+@contextmanager
+def open_browser_page() -> Generator[Page, None, None]:
+    """Сторінка в орендованому контексті браузера поточного потоку (browser_service)."""
+    try:
+        with lease_page(CAR_ROUTE_PROFILE) as page:
+            yield page
+    finally:
+        # Потік воркера завершується — його браузер більше нікому не знадобиться
+        close_thread_browser()
+
+
+def run_page_pool(
+    items: Iterable[Any],
+    handler: Callable[[Page, Any], bool],
+    concurrency: Optional[int] = None,
+    page_factory: Callable[[], Any] = open_browser_page,
+) -> PoolStats:
+    """
+    Обробляє items пулом із concurrency сторінок.
+
+    handler(page, item) повертає True при успіху; виняток або False рахуються як failed.
+    Кожен воркер відкриває сторінку через page_factory (контекстний менеджер)
+    і бере наступний item зі спільної черги, доки вона не спорожніє.
+    """
+    work: queue.Queue = queue.Queue()
+    for item in items:
+        work.put(item)
+
+    total = work.qsize()
+    concurrency = max(1, min(concurrency or PARSE_CONCURRENCY, total or 1))
+    stats = PoolStats(concurrency=concurrency)
+    lock = threading.Lock()
+
+    def _worker(worker_id: int) -> None:
+        done = 0
+        try:
+            with page_factory() as page:
+                while True:
+                    try:
+                        item = work.get_nowait()
+                    except queue.Empty:
+                        break
+                    try:
+                        ok = bool(handler(page, item))
+                    except Exception as e:
+                        logger.exception("[page_pool] worker=%s item error: %s", worker_id, e)
+                        ok = False
+                    with lock:
+                        if ok:
+                            stats.processed += 1
+                            done += 1
+                        else:
+                            stats.failed += 1
+        except Exception as e:
+            # Браузер воркера не стартував або впав — решту черги доберуть інші воркери
+            logger.exception("[page_pool] worker=%s crashed: %s", worker_id, e)
+        finally:
+            with lock:
+                stats.per_worker[worker_id] = done
+
+    started = time.monotonic()
+    threads = []
+    for worker_id in range(concurrency):
+        # Копія контексту: логи воркерів теж потрапляють у ProcessRun.logs
+        ctx = contextvars.copy_context()
+        t = threading.Thread(
+            target=ctx.run,
+            args=(_worker, worker_id),
+            name=f"page-pool-{worker_id}",
+            daemon=True,
+        )
+        t.start()
+        threads.append(t)
+    for t in threads:
+        t.join()
+    stats.elapsed_sec = time.monotonic() - started
+
+    logger.info(
+        "[page_pool] done: %s ok, %s failed, %s workers, %.2f items/min",
+        stats.processed,
+        stats.failed,
+        concurrency,
+        stats.per_minute,
+    )
+    return stats
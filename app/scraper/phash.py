@@ -0,0 +1,82 @@
+"""
+Перцептивний хеш фото авто (dHash, 64 біти) і BK-дерево для пошуку близьких хешів
+за відстанню Геммінга. Хеш рахується один раз на оброблене фото (image_transform)
+і не змінюється від перекодування JPEG, зміни розміру чи невеликої корекції кольору.
+"""
+
+from typing import Iterable, Iterator, Optional
+
+import cv2
+import numpy as np
+
+HASH_BITS = 64
+_MASK = (1 << HASH_BITS) - 1
+
+
+def dhash(gray: np.ndarray) -> int:
+    """dHash: 9x8 сіра копія, біт = «піксель світліший за сусіда праворуч»."""
+    if gray.ndim == 3:
+        gray = cv2.cvtColor(gray, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return bin((a ^ b) & _MASK).count("1")
+
+
+def to_db(value: int) -> int:
+    """Беззнаковий 64-бітний хеш -> знаковий BIGINT."""
+    value &= _MASK
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+def from_db(value: int) -> int:
+    return value & _MASK
+
+
+class BKTree:
+    """
+    BK-дерево за відстанню Геммінга: вузол — хеш і прив'язані до нього значення
+    (наприклад id авто), діти — за відстанню до вузла. Пошук у радіусі r відкидає
+    піддерева, для яких |d - k| > r.
+    """
+
+    def __init__(self, items: Iterable[tuple[int, object]] = ()):
+        self._root: Optional[list] = None  # [hash, values, {distance: child}]
+        self.size = 0
+        for value_hash, value in items:
+            self.add(value_hash, value)
+
+    def add(self, value_hash: int, value) -> None:
+        self.size += 1
+        if self._root is None:
+            self._root = [value_hash, [value], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(value_hash, node[0])
+            if distance == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value_hash, [value], {}]
+                return
+            node = child
+
+    def search(self, value_hash: int, radius: int) -> Iterator[tuple[int, object]]:
+        """(відстань, значення) для всіх хешів у межах radius."""
+        if self._root is None:
+            return
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming(value_hash, node[0])
+            if distance <= radius:
+                for value in node[1]:
+                    yield distance, value
+            for child_distance, child in node[2].items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
@@ -0,0 +1,220 @@
+"""
+Профілі перехоплення запитів (context.route) для браузерних сторінок.
+
+links_only  — сторінки пошуку: потрібні лише href карток a.product-card,
+              тому блокуємо картинки, відео, шрифти, CSS і сторонні домени;
+car_details — сторінка авто: фото беремо з атрибутів img/source, самі файли
+              не потрібні; скрипти AutoRia лишаємо (гідратація, #descList);
+full        — без блокування (для відлагодження/порівняння).
+
+ROUTE_STATS рахує по кожному профілю: скільки запитів заблоковано, скільки
+байтів завантажено, оцінку зекономлених байтів і середній час завантаження
+сторінки — знімок потрапляє у ProcessRun.details.
+"""
+
+import logging
+import os
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlparse
+
+from playwright.sync_api import BrowserContext, Page, Route
+
+logger = logging.getLogger(__name__)
+
+# Профілі за замовчуванням для збору посилань і сторінок авто
+LINKS_ROUTE_PROFILE = os.getenv("SCRAPER_LINKS_PROFILE", "links_only")
+CAR_ROUTE_PROFILE = os.getenv("SCRAPER_CAR_PROFILE", "car_details")
+
+FIRST_PARTY_SUFFIXES = ("ria.com", "riastatic.com")
+
+# Оцінка розміру заблокованого ресурсу, поки немає власних замірів цього типу
+_DEFAULT_RESOURCE_BYTES = {
+    "image": 60_000,
+    "media": 500_000,
+    "font": 40_000,
+    "stylesheet": 30_000,
+    "script": 80_000,
+}
+_FALLBACK_RESOURCE_BYTES = 5_000
+
+
+@dataclass(frozen=True)
+class RouteProfile:
+    name: str
+    blocked_types: frozenset = frozenset()
+    block_third_party: bool = False
+
+    @property
+    def intercepts(self) -> bool:
+        return bool(self.blocked_types) or self.block_third_party
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        if resource_type == "document":
+            return False
+        if resource_type in self.blocked_types:
+            return True
+        return self.block_third_party and not is_first_party(url)
+
+
+PROFILES: dict[str, RouteProfile] = {
+    "links_only": RouteProfile(
+        "links_only",
+        blocked_types=frozenset({"image", "media", "font", "stylesheet"}),
+        block_third_party=True,
+    ),
+    "car_details": RouteProfile(
+        "car_details",
+        blocked_types=frozenset({"image", "media", "font"}),
+        block_third_party=True,
+    ),
+    "full": RouteProfile("full"),
+}
+
+
+def is_first_party(url: str) -> bool:
+    host = (urlparse(url).hostname or "").lower()
+    if not host:
+        return True
+    return any(host == s or host.endswith("." + s) for s in FIRST_PARTY_SUFFIXES)
+
+
+def get_profile(name: Optional[str]) -> RouteProfile:
+    profile = PROFILES.get((name or "full").strip().lower())
+    if profile is None:
+        logger.warning("Unknown route profile %r, using 'full'", name)
+        return PROFILES["full"]
+    return profile
+
+
+class RouteStats:
+    """Потокобезпечні лічильники перехоплення по профілях."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._profiles: dict[str, dict] = {}
+            # Середній розмір ресурсу за типом — для оцінки зекономлених байтів
+            self._type_bytes: dict[str, list[int]] = {}
+
+    def _profile(self, name: str) -> dict:
+        return self._profiles.setdefault(
+            name,
+            {
+                "requests": 0,
+                "blocked": 0,
+                "blocked_by_type": {},
+                "bytes_loaded": 0,
+                "page_loads": 0,
+                "load_ms_total": 0.0,
+            },
+        )
+
+    def record_request(self, name: str) -> None:
+        with self._lock:
+            self._profile(name)["requests"] += 1
+
+    def record_blocked(self, name: str, resource_type: str) -> None:
+        with self._lock:
+            stats = self._profile(name)
+            stats["blocked"] += 1
+            by_type = stats["blocked_by_type"]
+            by_type[resource_type] = by_type.get(resource_type, 0) + 1
+
+    def record_response(self, name: str, resource_type: str, size: int) -> None:
+        with self._lock:
+            self._profile(name)["bytes_loaded"] += size
+            totals = self._type_bytes.setdefault(resource_type, [0, 0])
+            totals[0] += size
+            totals[1] += 1
+
+    def record_load(self, name: str, elapsed_ms: float) -> None:
+        with self._lock:
+            stats = self._profile(name)
+            stats["page_loads"] += 1
+            stats["load_ms_total"] += elapsed_ms
+
+    def _avg_bytes(self, resource_type: str) -> int:
+        size, count = self._type_bytes.get(resource_type, (0, 0))
+        if count:
+            return size // count
+        return _DEFAULT_RESOURCE_BYTES.get(resource_type, _FALLBACK_RESOURCE_BYTES)
+
+    def snapshot(self) -> dict:
+        """{profile: {requests, blocked, bytes_loaded, bytes_saved_est, avg_load_ms, …}}."""
+        with self._lock:
+            result = {}
+            for name, stats in self._profiles.items():
+                saved = sum(
+                    count * self._avg_bytes(resource_type)
+                    for resource_type, count in stats["blocked_by_type"].items()
+                )
+                loads = stats["page_loads"]
+                result[name] = {
+                    "requests": stats["requests"],
+                    "blocked": stats["blocked"],
+                    "blocked_by_type": dict(stats["blocked_by_type"]),
+                    "bytes_loaded": stats["bytes_loaded"],
+                    "bytes_saved_est": saved,
+                    "page_loads": loads,
+                    "avg_load_ms": round(stats["load_ms_total"] / loads, 1) if loads else 0.0,
+                }
+            return result
+
+
+ROUTE_STATS = RouteStats()
+
+# Профіль кожного контексту — щоб timed_goto знав, куди записати час завантаження
+_context_profiles: "weakref.WeakKeyDictionary[BrowserContext, str]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _content_length(response) -> int:
+    try:
+        return int(response.headers.get("content-length") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def apply_route_profile(context: BrowserContext, name: Optional[str]) -> RouteProfile:
+    """Вмикає профіль на контексті: route для блокування + облік завантажених байтів."""
+    profile = get_profile(name)
+    _context_profiles[context] = profile.name
+
+    def _on_response(response) -> None:
+        ROUTE_STATS.record_response(
+            profile.name, response.request.resource_type, _content_length(response)
+        )
+
+    context.on("request", lambda _request: ROUTE_STATS.record_request(profile.name))
+    context.on("response", _on_response)
+
+    if profile.intercepts:
+
+        def _handle(route: Route) -> None:
+            request = route.request
+            if profile.should_block(request.resource_type, request.url):
+                ROUTE_STATS.record_blocked(profile.name, request.resource_type)
+                route.abort()
+            else:
+                route.continue_()
+
+        context.route("**/*", _handle)
+    return profile
+
+
+def timed_goto(page: Page, url: str, **kwargs):
+    """page.goto із записом часу завантаження в статистику профілю контексту."""
+    started = time.monotonic()
+    try:
+        return page.goto(url, **kwargs)
+    finally:
+        name = _context_profiles.get(page.context, "full")
+        ROUTE_STATS.record_load(name, (time.monotonic() - started) * 1000)
@@ -6,22 +6,41 @@ import logging
 import threading
 import time
 import random
+import math
+import os
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Callable, Optional
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
-from playwright.sync_api import sync_playwright, Page
+from playwright.sync_api import Page
 from app.scraper.main import (
     pause,
     scroll,
     move_mouse,
     accept_cookies,
     get_links,
+    get_search_total,
     parse_car,
 )
+from app.scraper.http_fetch import FETCH_STATS, fetch_search_page, http_first_enabled
+from app.scraper.browser_service import close_thread_browser, lease_context
+from app.scraper.page_pool import HostRateLimiter, run_page_pool
+from app.scraper.route_profiles import CAR_ROUTE_PROFILE, LINKS_ROUTE_PROFILE, timed_goto
 from database.db import SessionLocal
 from database.models import Link
 
 logger = logging.getLogger(__name__)
 
+# Інкрементальний збір: сортування «спочатку нові» і зупинка після K сторінок лише з відомими авто
+NEWEST_FIRST_SORT = os.getenv("SCRAPER_NEWEST_FIRST_SORT", "sort[0].order=dates.created.desc")
+INCREMENTAL_KNOWN_PAGES = int(os.getenv("RECHECK_KNOWN_PAGES_STOP", "2"))
+# Паралельний повний збір: скільки сторінок пошуку читати одночасно (1 — по черзі)
+# і мінімальний інтервал (сек) між запитами до хоста + джитер
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "3"))
+SEARCH_HOST_INTERVAL = float(os.getenv("SEARCH_HOST_INTERVAL", "2"))
+SEARCH_HOST_JITTER = float(os.getenv("SEARCH_HOST_JITTER", "2"))
+
 
 def update_page_in_url(url: str, page: int) -> str:
     """
@@ -65,29 +84,22 @@ def run_scraper_for_link(parent_link: str, link_id: int):
         try:
             logger.info(f"Starting scraper for link_id={link_id}, url={parent_link}")
 
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True, slow_mo=40)
-                context = browser.new_context(
-                    locale="uk-UA",
-                    viewport={"width": 1366, "height": 768},
-                    user_agent=(
-                        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                        "AppleWebKit/537.36 (KHTML, like Gecko) "
-                        "Chrome/120.0.0.0 Safari/537.36"
-                    ),
-                )
-
-                page = context.new_page()
+            # Тут і збір посилань, і сторінки авто — профіль сторінки авто
+            with lease_context(CAR_ROUTE_PROFILE) as lease:
+                page = lease.new_page()
 
-                logger.info("OPEN search page")
-                page.goto(parent_link, wait_until="domcontentloaded", timeout=60000)
+                if not lease.consented:
+                    logger.info("OPEN search page")
+                    timed_goto(
+                        page, parent_link, wait_until="domcontentloaded", timeout=60000
+                    )
 
-                pause(2, 4)
-                scroll(page)
-                move_mouse(page)
+                    pause(2, 4)
+                    scroll(page)
+                    move_mouse(page)
 
-                accept_cookies(page)
-                pause(2, 3)
+                    accept_cookies(page)
+                    pause(2, 3)
 
                 # Парсимо всі сторінки
                 page_number = 0
@@ -98,7 +110,9 @@ def run_scraper_for_link(parent_link: str, link_id: int):
                     current_url = update_page_in_url(parent_link, page_number)
                     logger.info(f"PAGE {page_number}: Opening {current_url}")
 
-                    page.goto(current_url, wait_until="domcontentloaded", timeout=60000)
+                    timed_goto(
+                        page, current_url, wait_until="domcontentloaded", timeout=60000
+                    )
                     pause(2, 4)
                     scroll(page)
                     move_mouse(page)
@@ -142,7 +156,6 @@ def run_scraper_for_link(parent_link: str, link_id: int):
                     page_number += 1
                     pause(2, 4)  # Невелика пауза між сторінками
 
-                browser.close()
                 logger.info(
                     f"Scraper finished for link_id={link_id}. Total pages: {page_number}, Total cars: {total_cars_parsed}"
                 )
@@ -163,6 +176,9 @@ def run_scraper_for_link(parent_link: str, link_id: int):
 
         except Exception as e:
             logger.exception(f"Error in scraper for link_id={link_id}: {e}")
+        finally:
+            # Потік одноразовий — його браузер далі не потрібен
+            close_thread_browser()
 
     # Запускаємо в окремому потоці
     thread = threading.Thread(target=_run, daemon=True)
@@ -170,50 +186,179 @@ def run_scraper_for_link(parent_link: str, link_id: int):
     return thread
 
 
-def get_all_car_links(parent_link: str) -> list[str]:
+@dataclass
+class LinkCollection:
+    """Результат збору посилань з пошуку батьківського лінка."""
+
+    links: list[str]
+    pages: int
+    # True — пройдено всі сторінки до порожньої; False — зупинились раніше (інкрементальний режим)
+    complete: bool
+
+
+def search_page_size(url: str) -> Optional[int]:
+    """Кількість оголошень на сторінці пошуку з параметра limit (None — не задано)."""
+    value = parse_qs(urlparse(url).query).get("limit", [""])[0]
+    return int(value) if value.isdigit() and int(value) > 0 else None
+
+
+def with_newest_first(url: str) -> str:
+    """Додає до URL пошуку сортування «спочатку нові» (NEWEST_FIRST_SORT)."""
+    key, _, value = NEWEST_FIRST_SORT.partition("=")
+    parsed = urlparse(url)
+    query_params = parse_qs(parsed.query)
+    query_params[key] = [value]
+    return urlunparse(parsed._replace(query=urlencode(query_params, doseq=True)))
+
+
+def _search_page_opener(stack: ExitStack, search_url: str) -> Callable[[], Page]:
     """
-    Парсить тільки посилання на всі авто для даного батьківського лінка.
-    Повертає список унікальних лінків.
+    Повертає get_page(): браузерна сторінка пошуку створюється лише при першому виклику
+    (коли HTTP не дав карток). Контекст закривається разом зі stack.
     """
-    logger.info("get_all_car_links starting for url=%s", parent_link)
-    all_links: list[str] = []
-
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True, slow_mo=40)
-        context = browser.new_context(
-            locale="uk-UA",
-            viewport={"width": 1366, "height": 768},
-            user_agent=(
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/120.0.0.0 Safari/537.36"
-            ),
-        )
+    browser_page: Optional[Page] = None
+
+    def get_page() -> Page:
+        nonlocal browser_page
+        if browser_page is not None:
+            return browser_page
+        lease = stack.enter_context(lease_context(LINKS_ROUTE_PROFILE))
+        browser_page = lease.new_page()
+
+        if not lease.consented:
+            logger.info("OPEN search page")
+            timed_goto(
+                browser_page,
+                search_url,
+                wait_until="domcontentloaded",
+                timeout=60000,
+            )
 
-        page = context.new_page()
+            pause(2, 4)
+            scroll(browser_page)
+            move_mouse(browser_page)
 
-        logger.info("OPEN search page")
-        page.goto(parent_link, wait_until="domcontentloaded", timeout=60000)
+            accept_cookies(browser_page)
+            pause(2, 3)
+        return browser_page
 
-        pause(2, 4)
-        scroll(page)
-        move_mouse(page)
+    return get_page
 
-        accept_cookies(page)
-        pause(2, 3)
 
-        page_number = 0
+def _read_search_page(
+    url: str, get_page: Callable[[], Page]
+) -> tuple[list[str], Optional[int]]:
+    """Посилання з однієї сторінки пошуку + кількість оголошень (якщо видно). HTTP, потім браузер."""
+    result = fetch_search_page(url) if http_first_enabled() else None
+    if result is not None:
+        FETCH_STATS.record("search", "http")
+        return result
 
-        while True:
-            current_url = update_page_in_url(parent_link, page_number)
-            logger.info(f"PAGE {page_number}: Opening {current_url}")
+    FETCH_STATS.record("search", "browser")
+    page = get_page()
+    timed_goto(page, url, wait_until="domcontentloaded", timeout=60000)
+    pause(2, 4)
+    scroll(page)
+    move_mouse(page)
 
-            page.goto(current_url, wait_until="domcontentloaded", timeout=60000)
-            pause(2, 4)
-            scroll(page)
-            move_mouse(page)
+    links = get_links(page)
+    return links, (get_search_total(page) if links else None)
+
+
+def _fetch_search_pages_parallel(
+    search_url: str, page_numbers: list[int]
+) -> dict[int, list[str]]:
+    """
+    Сторінки пошуку page_numbers паралельно (SEARCH_CONCURRENCY воркерів, кожен зі
+    своїм браузером за потреби) під спільним обмеженням частоти на хост.
+    Повертає {номер сторінки: посилання}; невдалі сторінки відсутні.
+    """
+    results: dict[int, list[str]] = {}
+    rate_limiter = HostRateLimiter(SEARCH_HOST_INTERVAL, SEARCH_HOST_JITTER)
+
+    @contextmanager
+    def _worker_page():
+        try:
+            with ExitStack() as stack:
+                yield _search_page_opener(stack, search_url)
+        finally:
+            # Потік воркера тимчасовий — його браузер закриваємо
+            close_thread_browser()
+
+    def _fetch(get_page, page_number: int) -> bool:
+        url = update_page_in_url(search_url, page_number)
+        rate_limiter.wait(url)
+        logger.info(f"PAGE {page_number}: Opening {url}")
+        links, _ = _read_search_page(url, get_page)
+        if not links:
+            return False
+        results[page_number] = links
+        return True
+
+    run_page_pool(
+        page_numbers, _fetch, concurrency=SEARCH_CONCURRENCY, page_factory=_worker_page
+    )
+    return results
 
-            links = get_links(page)
+
+def collect_car_links(
+    parent_link: str,
+    known_links: Optional[set[str]] = None,
+    stop_after_known_pages: int = INCREMENTAL_KNOWN_PAGES,
+    resume_pages: Optional[dict[int, list[str]]] = None,
+    on_progress: Optional[Callable[[dict[int, list[str]]], None]] = None,
+) -> LinkCollection:
+    """
+    Збирає посилання на авто з усіх сторінок пошуку батьківського лінка.
+
+    known_links=None — повний прохід до першої порожньої сторінки. Якщо на
+    сторінці 0 видно кількість оголошень і SEARCH_CONCURRENCY > 1, решта
+    сторінок діапазону читається паралельно, а посилання зливаються в порядку сторінок.
+
+    Інакше — інкрементальний режим: сортування «спочатку нові», сторінки по черзі,
+    і збір зупиняється, щойно stop_after_known_pages сторінок поспіль містять лише
+    вже відомі посилання (далі йдуть старіші оголошення, які вже є в БД).
+
+    У режимі http_first сторінки пошуку спершу читаються звичайним HTTP;
+    браузер запускається лише тоді, коли в HTML немає карток a.product-card.
+
+    resume_pages — сторінки з чекпоінта попереднього (перерваного) запуску: вони не
+    читаються повторно, збір продовжується з першої відсутньої сторінки (по черзі).
+    on_progress(pages) викликається після кожної прочитаної сторінки (і після
+    паралельного блоку) з усіма сторінками на цей момент — для запису чекпоінта.
+    """
+    incremental = known_links is not None
+    search_url = with_newest_first(parent_link) if incremental else parent_link
+    logger.info(
+        "collect_car_links starting for url=%s (mode=%s)",
+        parent_link,
+        "incremental" if incremental else "full",
+    )
+    pages: dict[int, list[str]] = dict(resume_pages or {})
+    complete = True
+    known_streak = 0
+
+    def _next_missing(page_number: int) -> int:
+        while page_number in pages:
+            page_number += 1
+        return page_number
+
+    def _report_progress() -> None:
+        if on_progress is not None:
+            on_progress(dict(pages))
+
+    with ExitStack() as stack:
+        get_page = _search_page_opener(stack, search_url)
+        page_number = _next_missing(0)
+        if pages:
+            logger.info(
+                f"Resuming from PAGE {page_number} ({len(pages)} page(s) from checkpoint)"
+            )
+
+        while True:
+            current_url = update_page_in_url(search_url, page_number)
+            logger.info(f"PAGE {page_number}: Opening {current_url}")
+            links, total = _read_search_page(current_url, get_page)
 
             if not links:
                 logger.info(
@@ -222,14 +367,73 @@ def get_all_car_links(parent_link: str) -> list[str]:
                 break
 
             logger.info(f"PAGE {page_number}: Found {len(links)} cars")
+            pages[page_number] = links
+            _report_progress()
+            page_number = _next_missing(page_number + 1)
+
+            if incremental:
+                if all(link in known_links for link in links):
+                    known_streak += 1
+                else:
+                    known_streak = 0
+                if known_streak >= stop_after_known_pages:
+                    logger.info(
+                        f"PAGE {page_number - 1}: {known_streak} page(s) of known cars in a row. "
+                        "Stopping incremental collector."
+                    )
+                    complete = False
+                    break
+            elif page_number == 1 and total and SEARCH_CONCURRENCY > 1:
+                # Розмір сторінки — з параметра limit; на сторінці 0 посилань може бути
+                # менше (InOtherCategoryList, дублікати), і оцінка за нею завищує кількість
+                page_count = math.ceil(total / (search_page_size(search_url) or len(links)))
+                if page_count > 1:
+                    logger.info(
+                        f"{total} cars in search, {page_count} pages: "
+                        f"fetching pages 1..{page_count - 1} in parallel"
+                    )
+                    rest = list(range(1, page_count))
+                    pages.update(_fetch_search_pages_parallel(search_url, rest))
+                    missing = [n for n in rest if n not in pages]
+                    # Невдалі сторінки — ще раз по черзі
+                    for n in missing:
+                        url = update_page_in_url(search_url, n)
+                        logger.info(f"PAGE {n}: Retrying {url}")
+                        links, _ = _read_search_page(url, get_page)
+                        if links:
+                            pages[n] = links
+                    _report_progress()
+                    last_page = max(pages)
+                    gaps = [n for n in rest if n not in pages and n < last_page]
+                    for n in gaps:
+                        logger.warning(f"PAGE {n}: still empty, link list is incomplete")
+                    if gaps:
+                        complete = False
+                    if last_page < page_count - 1:
+                        # Порожні сторінки після останньої непорожньої — кінець видачі
+                        # (оголошення зникли або total був завищений), а не збій
+                        logger.info(
+                            f"PAGE {last_page + 1}: No cars found. Stopping link collector."
+                        )
+                        break
+                    # Далі — по черзі від кінця діапазону, поки не буде порожньої сторінки
+                    # (поки ми читали, могли з'явитися нові оголошення)
+                    page_number = _next_missing(page_count)
 
-            all_links.extend(links)
-
-            page_number += 1
             pause(2, 4)
 
-        browser.close()
-
+    all_links = [link for n in sorted(pages) for link in pages[n]]
     unique_links = list(dict.fromkeys(all_links))
-    logger.info(f"Total unique car links collected: {len(unique_links)}")
-    return unique_links
+    logger.info(
+        f"Total unique car links collected: {len(unique_links)} "
+        f"(pages: {len(pages)}, complete: {complete})"
+    )
+    return LinkCollection(links=unique_links, pages=len(pages), complete=complete)
+
+
+def get_all_car_links(parent_link: str) -> list[str]:
+    """
+    Парсить тільки посилання на всі авто для даного батьківського лінка (повний прохід).
+    Повертає список унікальних лінків.
+    """
+    return collect_car_links(parent_link).links
@@ -1,22 +1,246 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import DeclarativeBase, sessionmaker
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Generator, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
+from sqlalchemy.pool import QueuePool
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 
 class Base(DeclarativeBase):
     pass
 
 
+# Тип процесу: web (gunicorn) або worker (Celery) — для різних налаштувань пулу
+DB_PROCESS_TYPE = os.getenv("DB_PROCESS_TYPE", "web").lower()
+
+# Значення за замовчуванням: web — короткі запити, багато процесів gunicorn;
+# worker — один solo-воркер, але з потоками (пул сторінок, запис пачок, фото) і довгими запитами
+_POOL_DEFAULTS = {
+    "web": {
+        "POOL_SIZE": "5",
+        "MAX_OVERFLOW": "5",
+        "POOL_TIMEOUT": "10",
+        "POOL_RECYCLE": "1800",
+        "POOL_PRE_PING": "true",
+        "STATEMENT_TIMEOUT_MS": "30000",
+    },
+    "worker": {
+        "POOL_SIZE": "4",
+        "MAX_OVERFLOW": "4",
+        "POOL_TIMEOUT": "30",
+        "POOL_RECYCLE": "1800",
+        "POOL_PRE_PING": "true",
+        "STATEMENT_TIMEOUT_MS": "300000",
+    },
+}
+
+
+def _pool_setting(name: str) -> str:
+    """WEB_DB_<name> / WORKER_DB_<name>, інакше DB_<name>, інакше значення для типу процесу."""
+    defaults = _POOL_DEFAULTS.get(DB_PROCESS_TYPE, _POOL_DEFAULTS["web"])
+    return (
+        os.getenv(f"{DB_PROCESS_TYPE.upper()}_DB_{name}")
+        or os.getenv(f"DB_{name}")
+        or defaults[name]
+    )
+
+
+DB_POOL_SIZE = int(_pool_setting("POOL_SIZE"))
+DB_MAX_OVERFLOW = int(_pool_setting("MAX_OVERFLOW"))
+DB_POOL_TIMEOUT = float(_pool_setting("POOL_TIMEOUT"))
+DB_POOL_RECYCLE = int(_pool_setting("POOL_RECYCLE"))
+DB_POOL_PRE_PING = _pool_setting("POOL_PRE_PING").lower() in ("1", "true", "yes")
+# 0 — без ліміту
+DB_STATEMENT_TIMEOUT_MS = int(_pool_setting("STATEMENT_TIMEOUT_MS"))
+
+
+class DbPoolStats:
+    """Потокобезпечні лічильники пулу з'єднань: видачі, очікування вільного з'єднання, таймаути."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._checkouts = 0
+            self._connects = 0
+            self._invalidated = 0
+            self._timeouts = 0
+            self._wait_ms = 0.0
+            self._max_wait_ms = 0.0
+
+    def record_wait(self, wait_ms: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self._wait_ms += wait_ms
+            self._max_wait_ms = max(self._max_wait_ms, wait_ms)
+            if timed_out:
+                self._timeouts += 1
+
+    def record(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, f"_{counter}", getattr(self, f"_{counter}") + 1)
+
+    def snapshot(self) -> dict:
+        """Лічильники з останнього reset() і поточний стан пулу — для ProcessRun.details / /api/db-pool."""
+        pool = engine.pool
+        with self._lock:
+            return {
+                "process_type": DB_PROCESS_TYPE,
+                "pool_size": DB_POOL_SIZE,
+                "max_overflow": DB_MAX_OVERFLOW,
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "checkouts": self._checkouts,
+                "connects": self._connects,
+                "invalidated": self._invalidated,
+                "timeouts": self._timeouts,
+                "wait_ms_total": round(self._wait_ms, 1),
+                "wait_ms_avg": round(self._wait_ms / self._checkouts, 2) if self._checkouts else 0.0,
+                "wait_ms_max": round(self._max_wait_ms, 1),
+            }
+
+
+DB_POOL_STATS = DbPoolStats()
+
+
+class _MeteredQueuePool(QueuePool):
+    """QueuePool, що рахує час очікування вільного з'єднання (включно з підключенням нового)."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            DB_POOL_STATS.record_wait((time.perf_counter() - started) * 1000, timed_out=True)
+            raise
+        DB_POOL_STATS.record_wait((time.perf_counter() - started) * 1000)
+        return connection
+
+
 engine = create_engine(
     os.getenv("DATABASE_DEVELOPMENT_URI"),
     echo=os.getenv("SQLALCHEMY_ECHO", "false").lower() in ("1", "true", "yes"),
+    poolclass=_MeteredQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    connect_args=(
+        {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+        if DB_STATEMENT_TIMEOUT_MS
+        else {}
+    ),
 )
 
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_STATS.record("checkouts")
+
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    DB_POOL_STATS.record("connects")
+
+
+@event.listens_for(engine, "invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    DB_POOL_STATS.record("invalidated")
+
+
 SessionLocal = sessionmaker(
     bind=engine,
     autoflush=False,
     autocommit=False,
 )
+
+
+class _UnitOfWork:
+    """
+    З'єднання, яке ділять хелпери однієї Celery-таски або Flask-запиту (у потоці власника).
+    Береться з пулу лише при першому get_session() у скоупі.
+    """
+
+    def __init__(self):
+        self.thread_id = threading.get_ident()
+        self._connection: Optional[Connection] = None
+
+    def connection(self) -> Connection:
+        if self._connection is None or self._connection.invalidated or self._connection.closed:
+            if self._connection is not None:
+                self._connection.close()
+            self._connection = engine.connect()
+        return self._connection
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+_current_uow: contextvars.ContextVar[Optional[_UnitOfWork]] = contextvars.ContextVar(
+    "db_unit_of_work", default=None
+)
+
+
+def get_session() -> Session:
+    """
+    Сесія для хелпера: у межах session_scope() — нова сесія на спільному з'єднанні скоупу
+    (хелпери, що викликаються по черзі, беруть з пулу одне з'єднання замість одного на
+    кожен), поза скоупом або з іншого потоку — звичайна SessionLocal(). Використовується
+    як SessionLocal(): commit/rollback/close у хелпері.
+
+    Вкладена сесія (інша сесія скоупу ще в транзакції) не приєднується до її транзакції,
+    а отримує окреме з'єднання: на спільному її commit нічого б не записав, а close()
+    зовнішньої відкотив би і її зміни. Тіла тасок тримають власну SessionLocal() усю
+    таску, тож таска з хелперами зазвичай тримає два з'єднання: тіла і скоупу.
+    """
+    uow = _current_uow.get()
+    if uow is None or uow.thread_id != threading.get_ident():
+        return SessionLocal()
+    connection = uow.connection()
+    if connection.in_transaction():
+        return SessionLocal()
+    return SessionLocal(bind=connection)
+
+
+def begin_session_scope() -> contextvars.Token:
+    """
+    Відкриває скоуп (для сигналів Celery / хуків Flask); закривається end_session_scope(token).
+    З'єднання з пулу скоуп сам не бере — лише перший get_session().
+    """
+    return _current_uow.set(_UnitOfWork())
+
+
+def end_session_scope(token: contextvars.Token) -> None:
+    uow = _current_uow.get()
+    try:
+        if uow is not None:
+            uow.close()
+    except Exception as e:
+        logger.warning("Failed to release scoped DB connection: %s", e)
+    finally:
+        _current_uow.reset(token)
+
+
+@contextmanager
+def session_scope() -> Generator[None, None, None]:
+    token = begin_session_scope()
+    try:
+        yield
+    finally:
+        end_session_scope(token)
@@ -1,5 +1,6 @@
 from typing import List, Optional
 from sqlalchemy import (
+    BigInteger,
     Integer,
     DateTime,
     JSON,
@@ -7,7 +8,9 @@ from sqlalchemy import (
     String,
     Text,
     ForeignKey,
+    Index,
     Enum as SAEnum,
+    text,
 )
 from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -25,6 +28,7 @@ class StatusProcessed(Enum):
     ACTIVE = "active"
     PROCESS = "process"  # в процесі відправки на TruckMarket
     FAILED = "failed"  # не вдалося спарсити — відправити в links_to_delete
+    DUPLICATE = "duplicate"  # ті самі фото, що в уже опублікованого авто — не відправляється
 
 
 class StatusProcessedType(TypeDecorator):
@@ -32,6 +36,7 @@ class StatusProcessedType(TypeDecorator):
 
     impl = postgresql.ENUM(
         "deleted", "created", "updated", "not_processed", "active", "process", "failed",
+        "duplicate",
         name="statusprocessed"
     )
     cache_ok = True
@@ -61,6 +66,8 @@ class StatusProcessedType(TypeDecorator):
             return StatusProcessed.NOT_PROCESSED
         if s == "active":
             return StatusProcessed.ACTIVE
+        if s == "duplicate":
+            return StatusProcessed.DUPLICATE
         return None
 
 
@@ -142,6 +149,9 @@ class Link(Base):
     last_recheck_at: Mapped[Optional[datetime]] = mapped_column(
         DateTime, nullable=True
     )  # Остання планова перевірка to_create/to_delete (понеділок)
+    last_full_sweep_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime, nullable=True
+    )  # Останній повний прохід усіх сторінок (лише він виявляє видалені авто)
     parse_status: Mapped[LinkParseStatus] = mapped_column(
         LinkParseStatusType(), nullable=False, default=LinkParseStatus.PENDING
     )
@@ -161,10 +171,43 @@ class Link(Base):
         back_populates="parent_link",
         cascade="all, delete-orphan",
     )
+    collect_checkpoint: Mapped[Optional["LinkCollectCheckpoint"]] = relationship(
+        "LinkCollectCheckpoint",
+        back_populates="parent_link",
+        cascade="all, delete-orphan",
+        uselist=False,
+    )
+
+
+class LinkCollectCheckpoint(Base):
+    """Прогрес незавершеного збору посилань зі сторінок пошуку (для відновлення після збою)."""
+
+    __tablename__ = "link_collect_checkpoints"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    parent_link_id: Mapped[int] = mapped_column(
+        ForeignKey("links.id", ondelete="CASCADE"), nullable=False, unique=True
+    )
+    parent_link: Mapped["Link"] = relationship(back_populates="collect_checkpoint")
+    mode: Mapped[str] = mapped_column(String(20), nullable=False)  # full | incremental
+    next_page: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # {"номер сторінки": [car URL, ...]} — усі вже прочитані сторінки
+    pages: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
 
 
 class LinkToDelete(Base):
     __tablename__ = "links_to_delete"
+    __table_args__ = (
+        Index("ix_links_to_delete_parent_link_id", "parent_link_id"),
+        # Черга (process_links_to_delete): лише PROCESS, COMPLETED накопичуються
+        Index(
+            "ix_links_to_delete_process",
+            "id",
+            postgresql_where=text("status = 'process'"),
+        ),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     parent_link_id: Mapped[int] = mapped_column(ForeignKey("links.id"), nullable=False)
     parent_link: Mapped["Link"] = relationship(back_populates="links_to_delete")
@@ -176,6 +219,15 @@ class LinkToDelete(Base):
 
 class LinkToCreate(Base):
     __tablename__ = "links_to_create"
+    __table_args__ = (
+        Index("ix_links_to_create_parent_link_id", "parent_link_id"),
+        # Черга (parse_links_to_create): лише PROCESS, COMPLETED накопичуються
+        Index(
+            "ix_links_to_create_process",
+            "id",
+            postgresql_where=text("status = 'process'"),
+        ),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     parent_link_id: Mapped[int] = mapped_column(ForeignKey("links.id"), nullable=False)
     parent_link: Mapped["Link"] = relationship(back_populates="links_to_create")
@@ -187,12 +239,26 @@ class LinkToCreate(Base):
 
 class Car(Base):
     __tablename__ = "cars"
+    __table_args__ = (
+        # Авто батьківського лінка (збір, видалення лінка) і фільтр адмінки з сортуванням
+        Index("ix_cars_link_id_created_at", "link_id", "created_at"),
+        # Черга відправки (CREATED) і фільтр статусу в адмінці з сортуванням
+        Index("ix_cars_processed_status_created_at", "processed_status", "created_at"),
+        # Пагінація адмінки без фільтрів
+        Index("ix_cars_created_at", "created_at"),
+        # Пошук за ID на TruckMarket: у неопублікованих авто NULL
+        Index(
+            "ix_cars_truck_car_id",
+            "truck_car_id",
+            postgresql_where=text("truck_car_id IS NOT NULL"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
 
     link_id: Mapped[int] = mapped_column(ForeignKey("links.id"), nullable=False)
     link: Mapped["Link"] = relationship(back_populates="cars")
-    link_path: Mapped[str] = mapped_column(String(150), nullable=False)
+    link_path: Mapped[str] = mapped_column(String(150), nullable=False, unique=True)
     brand: Mapped[str] = mapped_column(String(50), nullable=False)
     model: Mapped[Optional[str]] = mapped_column(
         String(50)
@@ -213,6 +279,9 @@ class Car(Base):
     truck_car_id: Mapped[Optional[int]] = mapped_column(
         Integer, nullable=True
     )  # ID оголошення в TruckMarket
+    duplicate_of: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("cars.id", ondelete="SET NULL"), nullable=True
+    )  # Опубліковане авто, дублікатом якого визнано це (статус DUPLICATE)
 
     car_values: Mapped[dict] = mapped_column(JSON, nullable=False)
     description: Mapped[str] = mapped_column(Text, nullable=False)
@@ -245,3 +314,31 @@ class ProcessRun(Base):
     celery_task_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     # Історія логів під час виконання: список {t, level, msg}
     logs: Mapped[Optional[list]] = mapped_column(JSON, nullable=True)
+
+
+class LogoTemplateStat(Base):
+    """Статистика варіантів шаблону логотипа (файл@масштаб): порядок перебору і відкидання рідкісних."""
+    __tablename__ = "logo_template_stats"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    template: Mapped[str] = mapped_column(String(255), nullable=False, unique=True)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    hits: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_hit_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+
+class CarImageHash(Base):
+    """Перцептивні хеші (dHash) фото опублікованих авто: пошук дублікатів оголошень."""
+    __tablename__ = "car_image_hashes"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    car_id: Mapped[int] = mapped_column(
+        ForeignKey("cars.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    image_key: Mapped[str] = mapped_column(String(64), nullable=False)
+    # 64-бітний хеш як знаковий BIGINT (app.scraper.phash.to_db / from_db)
+    phash: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,239 @@
+"""
+Буферизований запис спарсених авто: parse_car (і фоновий етап фото) лише додають
+запис у CarBatchWriter, а окремий потік пише пачками — при CAR_BATCH_SIZE записах
+або раз на CAR_BATCH_INTERVAL сек — upsert-ами з functions.car_upsert в одній
+транзакції на пачку. Повільна БД більше не зупиняє браузер.
+
+Якщо пачка не записалась, вона розбивається на окремі записи; запис, що не вдався
+й окремо, зберігається як FAILED з links_to_delete — як у save_data_to_db.
+close() (або вихід з with) дописує все, що лишилось у буфері.
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import update
+
+from database.db import SessionLocal
+from database.models import LinkToCreate, StatusLinkChange, StatusProcessed
+from functions.car_upsert import (
+    add_links_to_delete,
+    mark_cars_failed,
+    upsert_cars,
+    upsert_link_ids,
+)
+from functions.function import build_car_row, failed_car_row
+
+logger = logging.getLogger(__name__)
+
+# Розмір пачки і максимальний час (сек) між записами пачок
+CAR_BATCH_SIZE = int(os.getenv("CAR_BATCH_SIZE", "50"))
+CAR_BATCH_INTERVAL = float(os.getenv("CAR_BATCH_INTERVAL", "5"))
+# Скільки пачок може чекати в буфері, перш ніж add() почне чекати запису
+_MAX_PENDING_BATCHES = 4
+
+
+@dataclass
+class CarRecord:
+    data: dict
+    parent_link: str
+    car_link: str
+    # None — CREATED (UPDATED для наявного авто); FAILED — з links_to_delete
+    processed_status: Optional[StatusProcessed] = None
+    # Сторінку авто не вдалося відкрити: як save_failed_car_and_add_to_delete
+    parse_failed: bool = False
+    added_at: float = field(default_factory=time.monotonic)
+
+
+class CarBatchWriter:
+    """
+    complete_links_to_create — у тій самій транзакції ставити links_to_create.status=COMPLETED
+    для записаних посилань (парсер по links_to_create).
+    """
+
+    def __init__(
+        self,
+        batch_size: int = CAR_BATCH_SIZE,
+        flush_interval: float = CAR_BATCH_INTERVAL,
+        complete_links_to_create: bool = False,
+    ):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.complete_links_to_create = complete_links_to_create
+        self._cond = threading.Condition()
+        self._buffer: list[CarRecord] = []
+        self._closed = False
+        # Виняток, з яким упав потік запису: add() більше не чекає на нього
+        self._error: Optional[BaseException] = None
+        self.stats = {
+            "records": 0,
+            "batches": 0,
+            "split_batches": 0,
+            "failed_records": 0,
+            "skipped_final": 0,
+            "flush_ms": 0.0,
+        }
+        # Копія контексту: логи потоку запису теж потрапляють у ProcessRun.logs
+        self._thread = threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(self._run,),
+            name="car-batch-writer",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def __enter__(self) -> "CarBatchWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def add(self, record: CarRecord) -> None:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("CarBatchWriter is closed")
+            while len(self._buffer) >= self.batch_size * _MAX_PENDING_BATCHES:
+                if self._error is not None or not self._thread.is_alive():
+                    raise RuntimeError(f"CarBatchWriter thread stopped: {self._error}")
+                self._cond.wait()
+            self._buffer.append(record)
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify_all()
+
+    def close(self) -> dict:
+        """Дописує буфер і зупиняє потік запису. Повертає статистику для ProcessRun.details."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        # Якщо потік запису впав — дописуємо залишок тут
+        with self._cond:
+            leftover, self._buffer = self._buffer, []
+        if leftover:
+            self._write(leftover)
+        return self.snapshot()
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "flush_ms": round(self.stats["flush_ms"])}
+
+    def _run(self) -> None:
+        try:
+            self._run_batches()
+        except BaseException as e:
+            logger.exception("[car_batch_writer] writer thread crashed: %s", e)
+            with self._cond:
+                self._error = e
+                # Розбудити add(), що чекають місця в буфері
+                self._cond.notify_all()
+
+    def _run_batches(self) -> None:
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._closed and len(self._buffer) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._buffer[: self.batch_size]
+                del self._buffer[: self.batch_size]
+                closed = self._closed
+                self._cond.notify_all()
+            if batch:
+                try:
+                    self._write(batch)
+                except BaseException:
+                    # Пачка повертається в буфер — її дописує close()
+                    with self._cond:
+                        self._buffer[:0] = batch
+                    raise
+            elif closed:
+                return
+
+    def _write(self, batch: list[CarRecord]) -> None:
+        started = time.perf_counter()
+        session = SessionLocal()
+        try:
+            self._write_records(session, batch)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error("[car_batch_writer] batch of %s failed, splitting: %s", len(batch), e)
+            self.stats["split_batches"] += 1
+            for record in batch:
+                self._write_one(session, record)
+        finally:
+            session.close()
+        self.stats["batches"] += 1
+        self.stats["records"] += len(batch)
+        self.stats["flush_ms"] += (time.perf_counter() - started) * 1000
+        logger.info(
+            "[car_batch_writer] wrote %s cars in %.0f ms (oldest waited %.1fs)",
+            len(batch),
+            (time.perf_counter() - started) * 1000,
+            time.monotonic() - min(r.added_at for r in batch),
+        )
+
+    def _write_one(self, session, record: CarRecord) -> None:
+        try:
+            self._write_records(session, [record])
+            session.commit()
+            return
+        except Exception as e:
+            session.rollback()
+            logger.error("[car_batch_writer] %s failed: %s", record.car_link, e)
+        self.stats["failed_records"] += 1
+        if record.parse_failed:
+            return
+        # Як save_data_to_db при помилці: авто FAILED і посилання в links_to_delete
+        try:
+            self._write_records(
+                session,
+                [CarRecord({}, record.parent_link, record.car_link, parse_failed=True)],
+            )
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error("[car_batch_writer] failed to save FAILED status: %s", e)
+
+    def _write_records(self, session, records: list[CarRecord]) -> None:
+        link_ids = upsert_link_ids(session, [r.parent_link for r in records])
+        parsed = [r for r in records if not r.parse_failed]
+        failed = [r for r in records if r.parse_failed]
+
+        written = upsert_cars(
+            session,
+            [
+                build_car_row(
+                    r.data,
+                    link_ids[r.parent_link],
+                    r.car_link,
+                    r.processed_status or StatusProcessed.CREATED,
+                )
+                for r in parsed
+            ],
+        )
+        self.stats["skipped_final"] += len({r.car_link for r in parsed} - written)
+        mark_cars_failed(
+            session, [failed_car_row(link_ids[r.parent_link], r.car_link) for r in failed]
+        )
+        add_links_to_delete(
+            session,
+            [
+                (link_ids[r.parent_link], r.car_link)
+                for r in records
+                if r.parse_failed
+                or (r.processed_status == StatusProcessed.FAILED and r.car_link in written)
+            ],
+        )
+        if self.complete_links_to_create:
+            session.execute(
+                update(LinkToCreate)
+                .where(LinkToCreate.link.in_([r.car_link for r in records]))
+                .values(status=StatusLinkChange.COMPLETED)
+            )
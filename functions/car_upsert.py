@@ -0,0 +1,365 @@
+"""
+Запис спарсених авто set-based upsert-ом (PostgreSQL INSERT ... ON CONFLICT).
+
+Замість SELECT лінка + UPDATE його часу, SELECT авто за link_path, ORM update/insert
+і окремого SELECT + INSERT у links_to_delete: для пачки (CarBatchWriter) — по одному
+оператору на таблицю в одній транзакції, для одного авто (save_data_to_db) — один
+оператор save_car з CTE на всі три таблиці. Авто у фінальних статусах (FINAL_STATUSES)
+не перезаписуються: це умова WHERE в ON CONFLICT DO UPDATE.
+
+Порівняння з попереднім ORM-шляхом на локальному Postgres (rows/sec):
+    python -m functions.car_upsert --rows 500 --batch 50
+
+save_car — текстовий SQL, зібраний один раз: INSERT ... ON CONFLICT з діалекту
+postgresql SQLAlchemy 2.0 не кешує і компілюється на кожен виклик (~2 мс на оператор),
+тому поодинці upsert_link_ids + upsert_cars повільніші за ORM.
+"""
+
+from datetime import datetime, timezone
+from typing import Iterable
+
+from sqlalchemy import bindparam, case, literal, or_, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from database.models import (
+    Car,
+    Link,
+    LinkParseStatus,
+    LinkToDelete,
+    StatusLinkChange,
+    StatusProcessed,
+    StatusProcessedType,
+)
+
+# Статуси, після яких авто не перезаписуємо при повторному парсингу
+FINAL_STATUSES = (StatusProcessed.CREATED, StatusProcessed.ACTIVE, StatusProcessed.DELETED)
+
+# Колонки, які повторний парсинг оновлює в наявного авто (link_id і source — ні)
+_UPDATE_COLUMNS = (
+    "brand",
+    "model",
+    "fuel_type",
+    "transmission",
+    "price",
+    "year",
+    "mileage",
+    "color",
+    "location",
+    "path_to_images",
+    "car_values",
+    "description",
+    "full_description",
+)
+
+
+def upsert_link_ids(session: Session, urls: Iterable[str]) -> dict[str, int]:
+    """
+    id батьківських лінків (створює відсутні) і оновлює їх updated_at / last_processed_at —
+    як get_or_create_link, але одним оператором на всі urls.
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+    now = datetime.utcnow()
+    processed_at = datetime.now(timezone.utc)
+    stmt = pg_insert(Link).values(
+        [
+            {
+                "link": url,
+                "created_at": now,
+                "updated_at": now,
+                "last_processed_at": processed_at,
+                "parse_status": LinkParseStatus.PENDING,
+            }
+            for url in urls
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Link.link],
+        set_={
+            "updated_at": stmt.excluded.updated_at,
+            "last_processed_at": stmt.excluded.last_processed_at,
+        },
+    ).returning(Link.link, Link.id)
+    return {link: link_id for link, link_id in session.execute(stmt)}
+
+
+def upsert_cars(session: Session, rows: list[dict]) -> set[str]:
+    """
+    INSERT нових авто / UPDATE наявних (за link_path) не у фінальному статусі.
+    rows — повні рядки cars зі статусом для нового авто: CREATED при оновленні
+    стає UPDATED, інші статуси (FAILED) записуються як є.
+    Повертає link_path авто, які справді записано (фінальні пропущено).
+    """
+    # Один link_path двічі в одному INSERT ... ON CONFLICT DO UPDATE — помилка Postgres
+    rows = list({row["link_path"]: row for row in rows}.values())
+    if not rows:
+        return set()
+    stmt = pg_insert(Car).values(rows)
+    excluded = stmt.excluded
+    set_ = {column: excluded[column] for column in _UPDATE_COLUMNS}
+    set_["processed_status"] = case(
+        (
+            excluded.processed_status == literal(StatusProcessed.CREATED, StatusProcessedType()),
+            literal(StatusProcessed.UPDATED, StatusProcessedType()),
+        ),
+        else_=excluded.processed_status,
+    )
+    set_["updated_at"] = excluded.updated_at
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Car.link_path],
+        set_=set_,
+        where=or_(
+            Car.processed_status.is_(None),
+            Car.processed_status.notin_(FINAL_STATUSES),
+        ),
+    ).returning(Car.link_path)
+    return {link_path for (link_path,) in session.execute(stmt)}
+
+
+# Колонки рядка build_car_row, крім link_id (його дає upsert лінка в тому ж операторі)
+_SAVE_CAR_COLUMNS = tuple(
+    column.name
+    for column in Car.__table__.columns
+    if column.name not in ("id", "link_id", "truck_car_id", "duplicate_of")
+)
+
+
+def _save_car_sql():
+    """
+    Один оператор для одного авто: upsert батьківського лінка, upsert авто з його id і
+    (add_to_delete) рядок у links_to_delete — ті самі правила, що в upsert_link_ids,
+    upsert_cars і add_links_to_delete. Параметри приводяться до типів колонок, бо в
+    INSERT ... SELECT Postgres не виводить тип NULL і рядкових параметрів.
+    """
+    dialect = postgresql.dialect()
+    columns = Car.__table__.columns
+    values = ", ".join(
+        f"CAST(:{name} AS {columns[name].type.compile(dialect=dialect)})"
+        for name in _SAVE_CAR_COLUMNS
+    )
+    update_set = ", ".join(f"{name} = EXCLUDED.{name}" for name in _UPDATE_COLUMNS)
+    final_statuses = ", ".join(f"'{status.value}'" for status in FINAL_STATUSES)
+    return text(
+        f"""
+        WITH parent AS (
+            INSERT INTO links (link, created_at, updated_at, last_processed_at, parse_status)
+            VALUES (:parent_link, :now, :now, :processed_at, 'pending'::linkparsestatus)
+            ON CONFLICT (link) DO UPDATE
+            SET updated_at = EXCLUDED.updated_at, last_processed_at = EXCLUDED.last_processed_at
+            RETURNING id
+        ),
+        car AS (
+            INSERT INTO cars (link_id, {", ".join(_SAVE_CAR_COLUMNS)})
+            SELECT parent.id, {values} FROM parent
+            ON CONFLICT (link_path) DO UPDATE
+            SET {update_set},
+                processed_status = CASE
+                    WHEN EXCLUDED.processed_status = 'created' THEN 'updated'::statusprocessed
+                    ELSE EXCLUDED.processed_status
+                END,
+                updated_at = EXCLUDED.updated_at
+            WHERE cars.processed_status IS NULL
+               OR cars.processed_status NOT IN ({final_statuses})
+            RETURNING link_path
+        ),
+        to_delete AS (
+            INSERT INTO links_to_delete (parent_link_id, link, status)
+            SELECT parent.id, car.link_path, 'process'::statuslinkchange FROM parent, car
+            WHERE :add_to_delete
+            ON CONFLICT (link) DO NOTHING
+        )
+        SELECT count(*) FROM car
+        """
+    ).bindparams(
+        bindparam("car_values", type_=columns["car_values"].type),
+        bindparam("processed_status", type_=columns["processed_status"].type),
+    )
+
+
+_SAVE_CAR_SQL = _save_car_sql()
+
+
+def save_car(session: Session, parent_link: str, row: dict, add_to_delete: bool = False) -> bool:
+    """
+    Запис одного авто одним оператором (save_data_to_db). row — рядок build_car_row,
+    його link_id ігнорується. add_to_delete — додати посилання в links_to_delete, якщо
+    авто записано. Повертає False, якщо авто у фінальному статусі і не перезаписане.
+    """
+    params = {name: row[name] for name in _SAVE_CAR_COLUMNS}
+    params.update(
+        parent_link=parent_link,
+        now=datetime.utcnow(),
+        processed_at=datetime.now(timezone.utc),
+        add_to_delete=add_to_delete,
+    )
+    return bool(session.execute(_SAVE_CAR_SQL, params).scalar())
+
+
+def mark_cars_failed(session: Session, rows: list[dict]) -> None:
+    """
+    Авто, яке не вдалося спарсити: нове — рядок-заглушка з FAILED, наявне (у будь-якому
+    статусі) — лише processed_status=FAILED, решта полів не змінюється.
+    """
+    rows = list({row["link_path"]: row for row in rows}.values())
+    if not rows:
+        return
+    stmt = pg_insert(Car).values(rows)
+    session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[Car.link_path],
+            set_={
+                "processed_status": literal(StatusProcessed.FAILED, StatusProcessedType()),
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+    )
+
+
+def add_links_to_delete(session: Session, pairs: Iterable[tuple[int, str]]) -> None:
+    """(parent_link_id, link) у links_to_delete; вже наявні посилання пропускаються."""
+    values = {
+        link: {"parent_link_id": parent_link_id, "link": link, "status": StatusLinkChange.PROCESS}
+        for parent_link_id, link in pairs
+    }
+    if not values:
+        return
+    session.execute(
+        pg_insert(LinkToDelete)
+        .values(list(values.values()))
+        .on_conflict_do_nothing(index_elements=[LinkToDelete.link])
+    )
+
+
+def _benchmark(rows: int, batch: int = 50) -> dict:
+    """
+    rows/sec: старий ORM-шлях save_data_to_db проти save_data_to_db (save_car) і пачок по
+    batch (як CarBatchWriter) — вставка нових авто і повторний парсинг тих самих.
+    Пише у БД з .env під окремим батьківським лінком і прибирає за собою.
+    """
+    import time
+
+    from database.db import SessionLocal
+    from functions.function import build_car_row, get_or_create_link, save_data_to_db
+
+    parent = "benchmark://functions.car_upsert"
+
+    def _data(i: int) -> dict:
+        return {
+            "brand": "Benchmark",
+            "model": f"M{i % 7}",
+            "fuel_type": "Дизель",
+            "transmission": "Ручна",
+            "price": str(10000 + i),
+            "year": "2015",
+            "mileage": "200 тис. км",
+            "car_values": {"i": i},
+            "description": "benchmark",
+        }
+
+    def _orm_save(data: dict, car_link: str) -> None:
+        # Попередній шлях: SELECT+UPDATE лінка, SELECT авто, ORM update/insert, commit
+        session = SessionLocal()
+        try:
+            link_obj = get_or_create_link(session, parent)
+            car = session.query(Car).filter(Car.link_path == car_link).first()
+            if car:
+                if car.processed_status in FINAL_STATUSES:
+                    return
+                car.price = int(data["price"])
+                car.car_values = data["car_values"]
+                car.processed_status = StatusProcessed.UPDATED
+            else:
+                session.add(
+                    Car(
+                        link_id=link_obj.id,
+                        link_path=car_link,
+                        brand=data["brand"],
+                        model=data["model"],
+                        fuel_type=data["fuel_type"],
+                        transmission=data["transmission"],
+                        price=int(data["price"]),
+                        year=int(data["year"]),
+                        mileage=200000,
+                        source="auto_ria",
+                        car_values=data["car_values"],
+                        description=data["description"],
+                        is_published=False,
+                        processed_status=StatusProcessed.NOT_PROCESSED,
+                    )
+                )
+            session.commit()
+        finally:
+            session.close()
+
+    def _cleanup() -> None:
+        session = SessionLocal()
+        try:
+            link = session.query(Link).filter(Link.link == parent).first()
+            if link:
+                session.query(Car).filter(Car.link_id == link.id).delete()
+                session.delete(link)
+            session.commit()
+        finally:
+            session.close()
+
+    def _measure(save, prefix: str) -> float:
+        started = time.perf_counter()
+        for i in range(rows):
+            save(_data(i), f"{parent}/{prefix}/{i}")
+        return round(rows / (time.perf_counter() - started), 1)
+
+    # NOT_PROCESSED — не фінальний статус, тож другий прохід — справжнє оновлення
+    def _upsert_save(data: dict, car_link: str) -> None:
+        save_data_to_db(data, parent, car_link, StatusProcessed.NOT_PROCESSED)
+
+    def _measure_batches(prefix: str) -> float:
+        started = time.perf_counter()
+        for start in range(0, rows, batch):
+            session = SessionLocal()
+            try:
+                link_id = upsert_link_ids(session, [parent])[parent]
+                upsert_cars(
+                    session,
+                    [
+                        build_car_row(
+                            _data(i),
+                            link_id,
+                            f"{parent}/{prefix}/{i}",
+                            StatusProcessed.NOT_PROCESSED,
+                        )
+                        for i in range(start, min(start + batch, rows))
+                    ],
+                )
+                session.commit()
+            finally:
+                session.close()
+        return round(rows / (time.perf_counter() - started), 1)
+
+    _cleanup()
+    try:
+        report = {"rows": rows, "batch": batch}
+        for name, save in (("orm", _orm_save), ("upsert", _upsert_save)):
+            report[name] = {
+                "insert_rows_per_sec": _measure(save, name),
+                "update_rows_per_sec": _measure(save, name),
+            }
+        report["upsert_batch"] = {
+            "insert_rows_per_sec": _measure_batches("upsert_batch"),
+            "update_rows_per_sec": _measure_batches("upsert_batch"),
+        }
+        return report
+    finally:
+        _cleanup()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark ORM vs upsert car writes")
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=50)
+    cli_args = parser.parse_args()
+    print(_benchmark(cli_args.rows, cli_args.batch))
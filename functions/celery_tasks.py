@@ -8,11 +8,9 @@ import os
 import random
 import subprocess
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 from urllib.parse import urlparse, unquote
 
-from playwright.sync_api import sync_playwright
-
 from database.db import SessionLocal
 from database.models import (
     Car,
@@ -23,13 +21,35 @@ from database.models import (
     StatusProcessed,
     StatusLinkChange,
 )
-from app.scraper.scraper_service import get_all_car_links
+from app.scraper.scraper_service import collect_car_links
+from app.scraper.http_fetch import FETCH_STATS
+from app.scraper.image_download import IMAGE_STATS, ImageStage
+from app.scraper.image_profiles import profile_for_category
+from app.scraper.logo_matcher import flush_logo_stats
+from app.scraper.route_profiles import ROUTE_STATS
 from app.scraper.main import parse_car
+from app.scraper.page_pool import (
+    PARSE_CONCURRENCY,
+    PARSE_HOST_INTERVAL,
+    PARSE_HOST_JITTER,
+    HostRateLimiter,
+    run_page_pool,
+)
+from functions.car_batch_writer import CarBatchWriter
 from functions.function import (
     check_update_link_status,
+    get_known_car_links,
     TruckMarket,
     TruckMarketTokenProvider,
 )
+from functions.collect_checkpoint import CollectCheckpoint
+from functions.duplicate_detector import (
+    DuplicateDetector,
+    car_image_hashes,
+    mark_duplicate,
+    requeue_duplicates,
+)
+from functions.image_gc import collect_image_garbage
 from functions.process_monitor import (
     capture_task_logs,
     finish_process_run,
@@ -38,15 +58,28 @@ from functions.process_monitor import (
 
 logger = logging.getLogger(__name__)
 
+# Як часто recheck робить повний прохід сторінок замість інкрементального (0 — завжди повний)
+RECHECK_FULL_SWEEP_DAYS = int(os.getenv("RECHECK_FULL_SWEEP_DAYS", "28"))
+
 
-def run_process_link_car_urls(link_id: int) -> dict:
+def run_process_link_car_urls(link_id: int, final_attempt: bool = False) -> dict:
     """
     Після додавання лінка через web: збирає car URL зі сторінок,
     оновлює links_to_create/links_to_delete, ставить parse_status=PARSED.
+
+    Прогрес збору пишеться в чекпоінт після кожної сторінки. Якщо збір упав,
+    links_to_create/links_to_delete не чіпаються (список неповний), лінк лишається
+    PENDING, а результат має resumable=True — повторний запуск продовжить з чекпоінта.
+    final_attempt=True (повторів більше не буде): посилання з уже прочитаних сторінок
+    додаються в links_to_create (partial), лінк стає PARSED без last_full_sweep_at —
+    його підхопить recheck і зробить повний прохід, продовживши з чекпоінта.
     """
     run_id = start_process_run("process_link_car_urls", link_id=link_id)
+    FETCH_STATS.reset()
+    ROUTE_STATS.reset()
     with capture_task_logs(run_id):
         db = SessionLocal()
+        checkpoint = None
         try:
             link_obj = db.query(Link).filter(Link.id == link_id).first()
             if not link_obj:
@@ -54,37 +87,108 @@ def run_process_link_car_urls(link_id: int) -> dict:
                 finish_process_run(run_id, False, message="Link not found")
                 return {"status": "error", "message": "Link not found"}
             logger.info("[process_link_car_urls] link_id=%s url=%s", link_id, link_obj.link)
-            parsed_links = get_all_car_links(link_obj.link)
-            check_update_link_status(link_obj.link, parsed_links)
+            checkpoint = CollectCheckpoint(link_id, "full")
+            collection = collect_car_links(
+                link_obj.link,
+                resume_pages=checkpoint.pages,
+                on_progress=checkpoint.save,
+            )
+            parsed_links = collection.links
+            check_update_link_status(
+                link_obj.link, parsed_links, partial=not collection.complete
+            )
             link_obj.parse_status = LinkParseStatus.PARSED
             link_obj.last_processed_at = datetime.utcnow()
+            if collection.complete:
+                link_obj.last_full_sweep_at = link_obj.last_processed_at
             db.commit()
+            checkpoint.clear()
             msg = f"Зібрано {len(parsed_links)} car URL"
             logger.info("[process_link_car_urls] link_id=%s done, %s car URLs", link_id, len(parsed_links))
-            finish_process_run(run_id, True, message=msg, car_urls_count=len(parsed_links))
+            finish_process_run(
+                run_id,
+                True,
+                message=msg,
+                car_urls_count=len(parsed_links),
+                fetch_backends=FETCH_STATS.snapshot(),
+                route_profiles=ROUTE_STATS.snapshot(),
+            )
             return {"status": "ok", "link_id": link_id, "car_urls_count": len(parsed_links)}
         except Exception as e:
             logger.exception("[process_link_car_urls] link_id=%s error: %s", link_id, e)
             db.rollback()
-            finish_process_run(run_id, False, message=str(e))
+            # Є збережені сторінки — лінк лишається PENDING, повторний запуск продовжить збір
+            resumable = bool(checkpoint and checkpoint.pages) and not final_attempt
+            if final_attempt and checkpoint and checkpoint.pages:
+                _apply_partial_collection(link_id, checkpoint.pages)
+            finish_process_run(
+                run_id,
+                False,
+                message=str(e),
+                resumable=resumable,
+                checkpoint_pages=len(checkpoint.pages) if checkpoint else 0,
+            )
             try:
                 db2 = SessionLocal()
                 link_obj = db2.query(Link).filter(Link.id == link_id).first()
                 if link_obj:
-                    link_obj.parse_status = LinkParseStatus.PARSED
+                    if not resumable:
+                        link_obj.parse_status = LinkParseStatus.PARSED
                     link_obj.last_processed_at = datetime.utcnow()
                     db2.commit()
                 db2.close()
             except Exception:
                 pass
-            return {"status": "error", "link_id": link_id, "message": str(e)}
+            return {
+                "status": "error",
+                "link_id": link_id,
+                "message": str(e),
+                "resumable": resumable,
+            }
         finally:
             db.close()
 
 
+def _apply_partial_collection(link_id: int, pages: dict[int, list[str]]) -> None:
+    """Посилання з прочитаних сторінок чекпоінта — у links_to_create (без links_to_delete)."""
+    links = list(
+        dict.fromkeys(link for _, page_links in sorted(pages.items()) for link in page_links)
+    )
+    db = SessionLocal()
+    try:
+        link_obj = db.query(Link).filter(Link.id == link_id).first()
+        if link_obj:
+            check_update_link_status(link_obj.link, links, partial=True)
+            logger.info(
+                "[process_link_car_urls] link_id=%s: last attempt, queued %s links from %s pages",
+                link_id,
+                len(links),
+                len(pages),
+            )
+    except Exception as e:
+        logger.error("[process_link_car_urls] link_id=%s partial apply failed: %s", link_id, e)
+    finally:
+        db.close()
+
+
+def _needs_full_sweep(link_obj: Link) -> bool:
+    """Повний прохід (виявляє видалені авто) — якщо його не було RECHECK_FULL_SWEEP_DAYS днів."""
+    if RECHECK_FULL_SWEEP_DAYS <= 0 or link_obj.last_full_sweep_at is None:
+        return True
+    return datetime.utcnow() - link_obj.last_full_sweep_at >= timedelta(
+        days=RECHECK_FULL_SWEEP_DAYS
+    )
+
+
 def run_recheck_processed_links() -> str:
-    """Планова перевірка to_create/to_delete: для всіх PARSED links. Понеділок 00–03."""
+    """
+    Планова перевірка to_create/to_delete: для всіх PARSED links. Понеділок 00–03.
+    Зазвичай інкрементально (нові оголошення до першої серії відомих сторінок),
+    повний прохід — раз на RECHECK_FULL_SWEEP_DAYS днів, щоб знайти видалені авто.
+    """
     run_id = start_process_run("recheck_processed_links")
+    FETCH_STATS.reset()
+    ROUTE_STATS.reset()
     with capture_task_logs(run_id):
         db = SessionLocal()
         try:
@@ -95,21 +199,53 @@ def run_recheck_processed_links() -> str:
                 logger.info("[recheck_processed_links] No PARSED links to recheck")
                 finish_process_run(run_id, True, message="Немає PARSED links")
                 return "No PARSED links"
+            full_sweeps = incremental = pages_total = 0
             for link_obj in link_objs:
                 try:
                     logger.info("[recheck_processed_links] link_id=%s url=%s", link_obj.id, link_obj.link)
                     time.sleep(random.uniform(1, 10))
-                    parsed_links = get_all_car_links(link_obj.link)
-                    check_update_link_status(link_obj.link, parsed_links)
-                    link_obj.last_processed_at = datetime.utcnow()
-                    link_obj.last_recheck_at = datetime.utcnow()
+                    full_sweep = _needs_full_sweep(link_obj)
+                    known_links = None if full_sweep else get_known_car_links(link_obj.link)
+                    checkpoint = CollectCheckpoint(
+                        link_obj.id, "full" if full_sweep else "incremental"
+                    )
+                    collection = collect_car_links(
+                        link_obj.link,
+                        known_links=known_links,
+                        resume_pages=checkpoint.pages,
+                        on_progress=checkpoint.save,
+                    )
+                    check_update_link_status(
+                        link_obj.link, collection.links, partial=not collection.complete
+                    )
+                    pages_total += collection.pages
+                    now = datetime.utcnow()
+                    if collection.complete:
+                        full_sweeps += 1
+                        link_obj.last_full_sweep_at = now
+                    else:
+                        incremental += 1
+                    link_obj.last_processed_at = now
+                    link_obj.last_recheck_at = now
                     db.commit()
+                    checkpoint.clear()
                 except Exception as e:
+                    # Чекпоінт лишається — наступний запуск recheck продовжить з останньої сторінки
                     logger.error("[recheck_processed_links] link_id=%s error: %s", link_obj.id, e)
                     db.rollback()
                     continue
             msg = f"Перевірено {len(link_objs)} посилань"
-            finish_process_run(run_id, True, message=msg, links_count=len(link_objs))
+            finish_process_run(
+                run_id,
+                True,
+                message=msg,
+                links_count=len(link_objs),
+                full_sweeps=full_sweeps,
+                incremental=incremental,
+                search_pages=pages_total,
+                fetch_backends=FETCH_STATS.snapshot(),
+                route_profiles=ROUTE_STATS.snapshot(),
+            )
             return msg
         except Exception as e:
             logger.exception("[recheck_processed_links] error: %s", e)
@@ -263,6 +399,9 @@ def run_delete_link(link_id: int) -> dict:
 def run_parse_links_to_create() -> str:
     """Парсер по links_to_create: парсить сторінки авто, зберігає Car (CREATED). Вт–нд 03–06."""
     run_id = start_process_run("parse_links_to_create")
+    FETCH_STATS.reset()
+    ROUTE_STATS.reset()
+    IMAGE_STATS.reset()
     with capture_task_logs(run_id):
         db = SessionLocal()
         try:
@@ -278,44 +417,68 @@ def run_parse_links_to_create() -> str:
             # Отримуємо parent_link (URL) для кожного запису
             parent_link_ids = {ltc.parent_link_id for ltc in to_create}
             parents = {
-                row.id: row.link
+                row.id: (row.link, row.car_type)
                 for row in db.query(Link).filter(Link.id.in_(parent_link_ids)).all()
             }
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True, slow_mo=40)
-                context = browser.new_context(
-                    locale="uk-UA",
-                    viewport={"width": 1366, "height": 768},
-                    user_agent=(
-                        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-                    ),
+            jobs = []
+            for ltc in to_create:
+                parent_link, car_type = parents.get(ltc.parent_link_id, (None, None))
+                if not parent_link:
+                    logger.warning(
+                        "Parent link id=%s not found for link_to_create id=%s",
+                        ltc.parent_link_id,
+                        ltc.id,
+                    )
+                    continue
+                # Профіль кодування фото — за категорією батьківського лінка
+                jobs.append((ltc.id, ltc.link, parent_link, profile_for_category(car_type)))
+            # ORM-об'єкти прив'язані до сесії цього потоку — воркерам передаємо лише значення
+            db.close()
+
+            rate_limiter = HostRateLimiter(PARSE_HOST_INTERVAL, PARSE_HOST_JITTER)
+            # Фото і збереження авто — у фоні, поки сторінка відкриває наступне авто
+            image_stage = ImageStage()
+            # Авто пишуться пачками; links_to_create.status=COMPLETED — в тій самій транзакції
+            writer = CarBatchWriter(complete_links_to_create=True)
+
+            def _parse_one(page, job) -> bool:
+                ltc_id, car_link, parent_link, image_profile = job
+                rate_limiter.wait(car_link)
+                logger.info("[parse_links_to_create] ltc_id=%s link=%s", ltc_id, car_link)
+                # Future фонового етапу — теж успіх; його помилки рахує image_stage.drain()
+                return bool(
+                    parse_car(
+                        page,
+                        car_link,
+                        parent_link,
+                        image_stage=image_stage,
+                        image_profile=image_profile,
+                        writer=writer,
+                    )
                 )
-                page = context.new_page()
-                parsed = 0
-                for ltc in to_create:
-                    parent_link = parents.get(ltc.parent_link_id)
-                    if not parent_link:
-                        logger.warning(
-                            "Parent link id=%s not found for link_to_create id=%s",
-                            ltc.parent_link_id,
-                            ltc.id,
-                        )
-                        continue
-                    try:
-                        logger.info("[parse_links_to_create] ltc_id=%s link=%s", ltc.id, ltc.link)
-                        parse_car(page, ltc.link, parent_link)
-                        ltc.status = StatusLinkChange.COMPLETED
-                        db.commit()
-                        parsed += 1
-                    except Exception as e:
-                        logger.exception("[parse_links_to_create] ltc_id=%s error: %s", ltc.id, e)
-                        db.rollback()
-                        continue
-                    time.sleep(random.uniform(1, 5))
-                browser.close()
-            msg = f"Спарсено {parsed} авто"
-            finish_process_run(run_id, True, message=msg, parsed=parsed)
+
+            try:
+                stats = run_page_pool(jobs, _parse_one, concurrency=PARSE_CONCURRENCY)
+            finally:
+                image_failed = image_stage.drain()
+                # Після фото: фоновий етап теж додає авто у writer
+                writer_stats = writer.close()
+                logo_stats = flush_logo_stats()
+            # Без авто, які не вдалося записати (writer зберіг їх як FAILED)
+            parsed = stats.processed - image_failed - writer_stats["failed_records"]
+            msg = f"Спарсено {parsed} авто ({stats.per_minute:.2f} авто/хв)"
+            finish_process_run(
+                run_id,
+                True,
+                message=msg,
+                fetch_backends=FETCH_STATS.snapshot(),
+                route_profiles=ROUTE_STATS.snapshot(),
+                image_downloads=IMAGE_STATS.snapshot(),
+                image_stage_failed=image_failed,
+                car_writer=writer_stats,
+                logo_templates={k: {"attempts": a, "hits": h} for k, (a, h) in logo_stats.items()},
+                **stats.as_details(),
+            )
             return msg
         except Exception as e:
             logger.exception("[parse_links_to_create] error: %s", e)
@@ -325,6 +488,17 @@ def run_parse_links_to_create() -> str:
             db.close()
 
 
+def _upload_summary(stats: dict) -> dict:
+    """Байти фото на авто і час завантаження — для порівняння профілів кодування фото."""
+    cars = stats["cars"]
+    return {
+        **stats,
+        "seconds": round(stats["seconds"], 1),
+        "bytes_per_car": round(stats["bytes"] / cars) if cars else 0,
+        "seconds_per_car": round(stats["seconds"] / cars, 2) if cars else 0.0,
+    }
+
+
 def run_process_car_add_truck_market() -> None:
     """Авто CREATED -> TruckMarket (create + images), ACTIVE/FAILED. Щогодини."""
     run_id = start_process_run("process_car_add_truck_market")
@@ -332,6 +506,8 @@ def run_process_car_add_truck_market() -> None:
         db = SessionLocal()
         truck_api = TruckMarket(TruckMarketTokenProvider())
         try:
+            # Дублікати знятих з публікації авто — знову в черзі
+            requeued = requeue_duplicates()
             cars = (
                 db.query(Car).filter(Car.processed_status == StatusProcessed.CREATED).all()
             )
@@ -343,12 +519,23 @@ def run_process_car_add_truck_market() -> None:
                 car.processed_status = StatusProcessed.PROCESS
             db.commit()
             processed_ok = 0
+            # Дублікати вже опублікованих авто (ті самі фото) не витрачають запити до API
+            detector = DuplicateDetector()
+            duplicates = {}
             for car in cars:
                 try:
                     logger.info("[process_car_add_truck_market] car_id=%s %s %s", car.id, car.brand, car.model)
+                    # Хеші беремо до відправки: після неї маніфест фото видаляється
+                    hashes = car_image_hashes(car.path_to_images)
+                    duplicate_of = detector.find(car.id, hashes)
+                    if duplicate_of is not None:
+                        duplicates[car.id] = duplicate_of
+                        mark_duplicate(car.id, duplicate_of)
+                        continue
                     ok = truck_api.process_add_car(car)
                     if ok:
                         processed_ok += 1
+                        detector.remember(car.id, hashes)
                     else:
                         logger.error("[process_car_add_truck_market] add_car failed car_id=%s", car.id)
                         truck_api._set_car_status(car.id, StatusProcessed.FAILED)
@@ -357,7 +544,18 @@ def run_process_car_add_truck_market() -> None:
                     truck_api._set_car_status(car.id, StatusProcessed.FAILED)
                     continue
             msg = f"Оброблено {processed_ok}/{len(cars)} авто"
-            finish_process_run(run_id, True, message=msg, processed=processed_ok, total=len(cars))
+            if duplicates:
+                msg += f", дублікатів: {len(duplicates)}"
+            finish_process_run(
+                run_id,
+                True,
+                message=msg,
+                processed=processed_ok,
+                total=len(cars),
+                duplicates={str(k): v for k, v in duplicates.items()},
+                requeued_duplicates=requeued,
+                uploads=_upload_summary(truck_api.upload_stats),
+            )
         except Exception as e:
             logger.exception("[process_car_add_truck_market] error: %s", e)
             finish_process_run(run_id, False, message=str(e))
@@ -366,6 +564,26 @@ def run_process_car_add_truck_market() -> None:
             db.close()
 
 
+def run_image_gc() -> dict:
+    """Щодня: прибирання фото авто-сиріт і LRU-витіснення blob-ів понад квоту сховища."""
+    run_id = start_process_run("image_gc")
+    with capture_task_logs(run_id):
+        try:
+            stats = collect_image_garbage()
+            msg = (
+                f"Звільнено {stats['reclaimed_bytes'] / (1024 * 1024):.1f} MB: "
+                f"маніфестів {stats['manifests_removed']}, папок {stats['folders_removed']}, "
+                f"blob-ів {stats['blobs_evicted']}"
+            )
+            logger.info("[image_gc] %s", msg)
+            finish_process_run(run_id, True, message=msg, **stats)
+            return stats
+        except Exception as e:
+            logger.exception("[image_gc] error: %s", e)
+            finish_process_run(run_id, False, message=str(e))
+            raise
+
+
 def run_db_dump() -> str:
     """Щодня о 09:00 (Київ): дамп PostgreSQL через pg_dump у файл у BACKUP_DIR (за замовчуванням /app/backups)."""
     run_id = start_process_run("db_dump")
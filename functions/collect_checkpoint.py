@@ -0,0 +1,116 @@
+"""
+Чекпоінти збору посилань: прогрес collect_car_links (прочитані сторінки пошуку)
+зберігається в БД після кожної сторінки, щоб повторний запуск після збою
+(таймаут, падіння браузера) продовжив з останньої вдалої сторінки, а не з нуля.
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+
+from database.db import SessionLocal
+from database.models import LinkCollectCheckpoint
+
+logger = logging.getLogger(__name__)
+
+# Скільки годин чекпоінт вважається актуальним (старіший — збір починається спочатку)
+COLLECT_CHECKPOINT_TTL_HOURS = float(os.getenv("COLLECT_CHECKPOINT_TTL_HOURS", "24"))
+
+
+def _first_missing_page(pages: dict[int, list[str]]) -> int:
+    page_number = 0
+    while page_number in pages:
+        page_number += 1
+    return page_number
+
+
+class CollectCheckpoint:
+    """
+    Чекпоінт збору посилань одного батьківського лінка в одному режимі (full/incremental).
+    pages — вже прочитані сторінки {номер: посилання}; save() передається в
+    collect_car_links як on_progress, clear() — після того, як результат використано.
+    """
+
+    def __init__(self, link_id: int, mode: str):
+        self.link_id = link_id
+        self.mode = mode
+        self.pages: dict[int, list[str]] = self._load()
+
+    def _load(self) -> dict[int, list[str]]:
+        db = SessionLocal()
+        try:
+            row = (
+                db.query(LinkCollectCheckpoint)
+                .filter(LinkCollectCheckpoint.parent_link_id == self.link_id)
+                .first()
+            )
+            if not row:
+                return {}
+            expired = datetime.utcnow() - row.updated_at > timedelta(
+                hours=COLLECT_CHECKPOINT_TTL_HOURS
+            )
+            if row.mode != self.mode or expired:
+                logger.info(
+                    "[collect_checkpoint] link_id=%s: dropping %s checkpoint (mode=%s, updated_at=%s)",
+                    self.link_id,
+                    "expired" if expired else "mismatched",
+                    row.mode,
+                    row.updated_at,
+                )
+                db.delete(row)
+                db.commit()
+                return {}
+            pages = {int(n): list(links) for n, links in (row.pages or {}).items()}
+            logger.info(
+                "[collect_checkpoint] link_id=%s: resuming %s collection from page %s (%s pages saved)",
+                self.link_id,
+                self.mode,
+                row.next_page,
+                len(pages),
+            )
+            return pages
+        except Exception as e:
+            logger.error("[collect_checkpoint] link_id=%s load failed: %s", self.link_id, e)
+            db.rollback()
+            return {}
+        finally:
+            db.close()
+
+    def save(self, pages: dict[int, list[str]]) -> None:
+        """Записує прочитані сторінки. Помилка запису не зупиняє збір."""
+        self.pages = dict(pages)
+        db = SessionLocal()
+        try:
+            row = (
+                db.query(LinkCollectCheckpoint)
+                .filter(LinkCollectCheckpoint.parent_link_id == self.link_id)
+                .first()
+            )
+            if row is None:
+                row = LinkCollectCheckpoint(parent_link_id=self.link_id, mode=self.mode)
+                db.add(row)
+            row.mode = self.mode
+            row.next_page = _first_missing_page(self.pages)
+            row.pages = {str(n): links for n, links in sorted(self.pages.items())}
+            row.updated_at = datetime.utcnow()
+            db.commit()
+        except Exception as e:
+            logger.error("[collect_checkpoint] link_id=%s save failed: %s", self.link_id, e)
+            db.rollback()
+        finally:
+            db.close()
+
+    def clear(self) -> None:
+        """Видаляє чекпоінт: збір завершено і результат застосовано."""
+        self.pages = {}
+        db = SessionLocal()
+        try:
+            db.query(LinkCollectCheckpoint).filter(
+                LinkCollectCheckpoint.parent_link_id == self.link_id
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            logger.error("[collect_checkpoint] link_id=%s clear failed: %s", self.link_id, e)
+            db.rollback()
+        finally:
+            db.close()
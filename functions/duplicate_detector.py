@@ -0,0 +1,168 @@
+"""
+Пошук дублікатів оголошень перед відправкою на TruckMarket: те саме авто часто
+виставлене з кількох батьківських лінків або перевиставлене з новим auto_XXXX,
+тож Car.link_path різний, а фото ті самі.
+
+Перцептивні хеші фото (app.scraper.phash) опублікованих авто зберігаються в
+car_image_hashes; на початку запуску з них будується BK-дерево, і авто вважається
+дублікатом, якщо достатньо його фото близькі (за Геммінгом) до фото одного ACTIVE авто.
+Авто-оригінал записується в Car.duplicate_of; коли він перестає бути ACTIVE (знятий,
+видалений), requeue_duplicates() повертає його дублікати в чергу CREATED.
+"""
+
+import logging
+import os
+from collections import Counter
+from typing import Optional
+
+from app.scraper.image_store import ImageStore
+from app.scraper.phash import BKTree, from_db, to_db
+from sqlalchemy import exists, or_, update
+from sqlalchemy.orm import aliased
+
+from database.db import SessionLocal
+from database.models import Car, CarImageHash, StatusProcessed
+
+logger = logging.getLogger(__name__)
+
+# Максимальна відстань Геммінга між dHash, щоб фото вважались однаковими (з 64 біт)
+DUPLICATE_MAX_DISTANCE = int(os.getenv("DUPLICATE_MAX_DISTANCE", "6"))
+# Скільки фото авто мають збігтися з фото одного опублікованого авто (і яка частка)
+DUPLICATE_MIN_MATCHES = int(os.getenv("DUPLICATE_MIN_MATCHES", "3"))
+DUPLICATE_MIN_RATIO = float(os.getenv("DUPLICATE_MIN_RATIO", "0.5"))
+
+
+def car_image_hashes(path_to_images: str, store: ImageStore = None) -> list[tuple[str, int]]:
+    """(key, dHash) фото авто з маніфесту сховища; фото без хешу (старі папки) пропускаються."""
+    store = store or ImageStore()
+    if not store.is_manifest(path_to_images):
+        return []
+    hashes = []
+    for key in store.manifest_keys(path_to_images):
+        value = store.read_phash(key)
+        if value is not None:
+            hashes.append((key, value))
+    return hashes
+
+
+class DuplicateDetector:
+    """
+    BK-дерево хешів фото ACTIVE авто. find() — id опублікованого авто, дублікатом
+    якого є нове; remember() — записати хеші щойно опублікованого авто (в БД і в дерево),
+    щоб дублікати в межах одного запуску теж відсіювались.
+    """
+
+    def __init__(self):
+        self._tree = BKTree()
+        self._load()
+
+    def _load(self) -> None:
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(CarImageHash.phash, CarImageHash.car_id)
+                .join(Car, Car.id == CarImageHash.car_id)
+                .filter(Car.processed_status == StatusProcessed.ACTIVE)
+                .all()
+            )
+            for phash, car_id in rows:
+                self._tree.add(from_db(phash), car_id)
+            logger.info("[duplicate_detector] loaded %s image hashes", self._tree.size)
+        except Exception as e:
+            logger.error("[duplicate_detector] load failed: %s", e)
+        finally:
+            db.close()
+
+    def find(self, car_id: int, hashes: list[tuple[str, int]]) -> Optional[int]:
+        if len(hashes) < DUPLICATE_MIN_MATCHES:
+            return None
+        matches: Counter = Counter()
+        for _, value in hashes:
+            # Кожне фото рахується для іншого авто не більше одного разу
+            matched = {
+                other_id
+                for _, other_id in self._tree.search(value, DUPLICATE_MAX_DISTANCE)
+                if other_id != car_id
+            }
+            matches.update(matched)
+        if not matches:
+            return None
+        other_id, count = matches.most_common(1)[0]
+        if count >= DUPLICATE_MIN_MATCHES and count >= DUPLICATE_MIN_RATIO * len(hashes):
+            logger.info(
+                "[duplicate_detector] car_id=%s duplicates car_id=%s (%s/%s photos)",
+                car_id,
+                other_id,
+                count,
+                len(hashes),
+            )
+            return other_id
+        return None
+
+    def remember(self, car_id: int, hashes: list[tuple[str, int]]) -> None:
+        if not hashes:
+            return
+        for _, value in hashes:
+            self._tree.add(value, car_id)
+        db = SessionLocal()
+        try:
+            db.query(CarImageHash).filter(CarImageHash.car_id == car_id).delete(
+                synchronize_session=False
+            )
+            db.add_all(
+                [
+                    CarImageHash(car_id=car_id, image_key=key, phash=to_db(value))
+                    for key, value in hashes
+                ]
+            )
+            db.commit()
+        except Exception as e:
+            logger.error("[duplicate_detector] car_id=%s save failed: %s", car_id, e)
+            db.rollback()
+        finally:
+            db.close()
+
+
+def mark_duplicate(car_id: int, duplicate_of: int) -> None:
+    """Статус DUPLICATE з посиланням на опубліковане авто-оригінал."""
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(Car)
+            .where(Car.id == car_id)
+            .values(processed_status=StatusProcessed.DUPLICATE, duplicate_of=duplicate_of)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def requeue_duplicates() -> int:
+    """
+    Дублікати, чий оригінал більше не ACTIVE (або невідомий), — знову в CREATED:
+    при наступній відправці вони перевіряються заново. Повертає кількість авто.
+    """
+    original = aliased(Car)
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            update(Car)
+            .where(Car.processed_status == StatusProcessed.DUPLICATE)
+            .where(
+                or_(
+                    Car.duplicate_of.is_(None),
+                    ~exists().where(
+                        original.id == Car.duplicate_of,
+                        original.processed_status == StatusProcessed.ACTIVE,
+                    ),
+                )
+            )
+            .values(processed_status=StatusProcessed.CREATED, duplicate_of=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        if result.rowcount:
+            logger.info("[duplicate_detector] requeued %s duplicates", result.rowcount)
+        return result.rowcount
+    finally:
+        db.close()
@@ -4,8 +4,15 @@ from datetime import datetime, timedelta, timezone
 
 from sqlalchemy.orm import Session
 
-from database.db import SessionLocal
+from database.db import get_session
 from database.models import Link, Car, StatusProcessed
+from functions.car_upsert import (
+    add_links_to_delete,
+    mark_cars_failed,
+    save_car,
+    upsert_link_ids,
+)
+from functions.link_diff import apply_link_diff
 
 logger = logging.getLogger(__name__)
 
@@ -84,7 +91,7 @@ def parse_float(value: str | float | None) -> float:
 
 
 def check_period_link_to_process():
-    db = SessionLocal()
+    db = get_session()
     try:
         now = datetime.now(timezone.utc)
         threshold = now - timedelta(days=1)
@@ -125,64 +132,19 @@ def save_data_to_db(
         car_link: Персональний лінк авто
         processed_status: Якщо FAILED — зберігаємо з цим статусом і додаємо в links_to_delete
     """
-    session = SessionLocal()
-    status_for_new = processed_status or StatusProcessed.CREATED
-    status_for_update = processed_status or StatusProcessed.UPDATED
-
-    # Статуси, після яких авто не перезаписуємо при повторному парсингу
-    FINAL_STATUSES = (StatusProcessed.CREATED, StatusProcessed.ACTIVE, StatusProcessed.DELETED)
-
+    session = get_session()
     try:
-        parent_link_obj = get_or_create_link(session, parent_link)
-        existing_car = session.query(Car).filter(Car.link_path == car_link).first()
-        if existing_car:
-            if existing_car.processed_status in FINAL_STATUSES:
-                return
-            existing_car.brand = data.get("brand", "Unknown")
-            existing_car.model = data.get("model")
-            existing_car.fuel_type = data.get("fuel_type", "Unknown")
-            existing_car.transmission = data.get("transmission", "Unknown")
-            existing_car.price = parse_int(data.get("price"))
-            existing_car.year = parse_int(data.get("year"))
-            existing_car.mileage = parse_int(data.get("mileage"))
-            existing_car.color = data.get("color")
-            existing_car.location = data.get("location")
-            existing_car.path_to_images = data.get("path_to_images")
-            existing_car.car_values = data.get("car_values", {})
-            existing_car.description = data.get("description", "")
-            existing_car.full_description = data.get("full_description")
-            existing_car.processed_status = status_for_update
-            session.commit()
-            if processed_status == StatusProcessed.FAILED:
-                _add_link_to_delete_if_missing(session, parent_link_obj.id, car_link)
-            return
-
-        car = Car(
-            link_id=parent_link_obj.id,
-            link_path=car_link,
-            brand=data.get("brand", "Unknown"),
-            model=data.get("model"),
-            fuel_type=data.get("fuel_type", "Unknown"),
-            transmission=data.get("transmission", "Unknown"),
-            price=parse_int(data.get("price")),
-            year=parse_int(data.get("year")),
-            mileage=parse_int(data.get("mileage")),
-            color=data.get("color"),
-            location=data.get("location"),
-            source="auto_ria",
-            path_to_images=data.get("path_to_images"),
-            car_values=data.get("car_values", {}),
-            description=data.get("description", ""),
-            full_description=data.get("full_description"),
-            is_published=False,
-            processed_status=status_for_new,
+        # Лінк, авто і (для FAILED) links_to_delete — одним оператором
+        save_car(
+            session,
+            parent_link,
+            build_car_row(data, None, car_link, processed_status or StatusProcessed.CREATED),
+            add_to_delete=processed_status == StatusProcessed.FAILED,
         )
-        session.add(car)
         session.commit()
-        if processed_status == StatusProcessed.FAILED:
-            _add_link_to_delete_if_missing(session, parent_link_obj.id, car_link)
     except Exception as e:
         session.rollback()
+        logger.error("save_data_to_db failed for %s: %s", car_link, e)
         try:
             save_failed_car_and_add_to_delete(parent_link, car_link)
         except Exception as save_error:
@@ -191,22 +153,33 @@ def save_data_to_db(
         session.close()
 
 
-def _add_link_to_delete_if_missing(
-    session: Session, parent_link_id: int, car_link: str
-) -> None:
-    existing = (
-        session.query(LinkToDelete)
-        .filter(
-            LinkToDelete.parent_link_id == parent_link_id,
-            LinkToDelete.link == car_link,
-        )
-        .first()
-    )
-    if not existing:
-        session.add(
-            LinkToDelete(parent_link_id=parent_link_id, link=car_link)
-        )
-        session.commit()
+def build_car_row(
+    data: dict, parent_link_id: int | None, car_link: str, processed_status: StatusProcessed
+) -> dict:
+    """Рядок cars зі спарсених даних (для upsert_cars; для save_car parent_link_id — None)."""
+    now = datetime.utcnow()
+    return {
+        "link_id": parent_link_id,
+        "link_path": car_link,
+        "brand": data.get("brand", "Unknown"),
+        "model": data.get("model"),
+        "fuel_type": data.get("fuel_type", "Unknown"),
+        "transmission": data.get("transmission", "Unknown"),
+        "price": parse_int(data.get("price")),
+        "year": parse_int(data.get("year")),
+        "mileage": parse_int(data.get("mileage")),
+        "color": data.get("color"),
+        "location": data.get("location"),
+        "source": "auto_ria",
+        "path_to_images": data.get("path_to_images"),
+        "car_values": data.get("car_values", {}),
+        "description": data.get("description", ""),
+        "full_description": data.get("full_description"),
+        "is_published": False,
+        "processed_status": processed_status,
+        "created_at": now,
+        "updated_at": now,
+    }
 
 
 def period_check_link(link):
@@ -231,7 +204,7 @@ def period_check_link(link):
     return
 
 
-from database.models import Link, Car, StatusProcessed, LinkToCreate, LinkToDelete
+from database.models import Link, Car, StatusProcessed, LinkToCreate
 
 
 def save_failed_car_and_add_to_delete(parent_link: str, car_link: str) -> None:
@@ -239,46 +212,11 @@ def save_failed_car_and_add_to_delete(parent_link: str, car_link: str) -> None:
     Якщо не вдалося спарсити авто: створює/оновлює Car з processed_status=FAILED
     і додає посилання в links_to_delete (щоб пізніше видалити з TruckMarket або не обробляти).
     """
-    session = SessionLocal()
+    session = get_session()
     try:
-        parent_link_obj = get_or_create_link(session, parent_link)
-        existing_car = session.query(Car).filter(Car.link_path == car_link).first()
-        if existing_car:
-            existing_car.processed_status = StatusProcessed.FAILED
-        else:
-            car = Car(
-                link_id=parent_link_obj.id,
-                link_path=car_link,
-                brand="Unknown",
-                model=None,
-                fuel_type="Unknown",
-                transmission="Unknown",
-                price=0,
-                year=0,
-                mileage=0,
-                source="auto_ria",
-                car_values={},
-                description="Parse failed",
-                is_published=False,
-                processed_status=StatusProcessed.FAILED,
-            )
-            session.add(car)
-        # Додати в links_to_delete, якщо ще немає
-        existing_ltd = (
-            session.query(LinkToDelete)
-            .filter(
-                LinkToDelete.parent_link_id == parent_link_obj.id,
-                LinkToDelete.link == car_link,
-            )
-            .first()
-        )
-        if not existing_ltd:
-            session.add(
-                LinkToDelete(
-                    parent_link_id=parent_link_obj.id,
-                    link=car_link,
-                )
-            )
+        parent_link_id = upsert_link_ids(session, [parent_link])[parent_link]
+        mark_cars_failed(session, [failed_car_row(parent_link_id, car_link)])
+        add_links_to_delete(session, [(parent_link_id, car_link)])
         session.commit()
     except Exception as e:
         session.rollback()
@@ -287,86 +225,88 @@ def save_failed_car_and_add_to_delete(parent_link: str, car_link: str) -> None:
         session.close()
 
 
-def check_update_link_status(link: str, parsed_links: list[str]) -> bool:
+def failed_car_row(parent_link_id: int, car_link: str) -> dict:
+    """Рядок-заглушка cars для авто, яке не вдалося спарсити (для mark_cars_failed)."""
+    return build_car_row(
+        {"description": "Parse failed"}, parent_link_id, car_link, StatusProcessed.FAILED
+    )
+
+
+def get_known_car_links(link: str) -> set[str]:
     """
-    Для parent link:
-    - знаходить всі поточні car.link_path в БД
-    - порівнює з parsed_links
-    - записує різницю в таблиці links_to_create / links_to_delete
+    Посилання, які для parent link уже відомі: авто в cars + ще не спарсені links_to_create.
+    Використовується інкрементальним збором посилань як множина «бачених».
     """
-    session = SessionLocal()
+    session = get_session()
     try:
         link_obj = session.query(Link).filter(Link.link == link).first()
         if not link_obj:
-            return False
-
-        # Поточні лінки авто з БД
-        existing_cars = session.query(Car).filter(Car.link_id == link_obj.id).all()
-        existing_links = {car.link_path for car in existing_cars}
-        parsed_set = set(parsed_links)
-
-        # Хто зник → to delete
-        to_delete = existing_links - parsed_set
-        # Хто новий → to create
-        to_create = parsed_set - existing_links
-
-        # Почистимо старі записи для цього parent_link,
-        # щоб таблиці відображали тільки актуальну різницю
-        session.query(LinkToDelete).filter(
-            LinkToDelete.parent_link_id == link_obj.id
-        ).delete(synchronize_session=False)
-
-        session.query(LinkToCreate).filter(
-            LinkToCreate.parent_link_id == link_obj.id
-        ).delete(synchronize_session=False)
-
-        # Записуємо "to delete"
-        for link_path in to_delete:
-            session.add(
-                LinkToDelete(
-                    parent_link_id=link_obj.id,
-                    link=link_path,
-                )
+            return set()
+        known = {
+            row[0]
+            for row in session.query(Car.link_path).filter(Car.link_id == link_obj.id)
+        }
+        known.update(
+            row[0]
+            for row in session.query(LinkToCreate.link).filter(
+                LinkToCreate.parent_link_id == link_obj.id
             )
+        )
+        return known
+    finally:
+        session.close()
 
-        # Записуємо "to create" — лише якщо такого link ще немає в таблиці (унікальність)
-        existing_to_create_links = set()
-        if to_create:
-            existing_to_create_links = {
-                row[0]
-                for row in session.query(LinkToCreate.link)
-                .filter(LinkToCreate.link.in_(to_create))
-                .all()
-            }
-        for link_path in to_create:
-            if link_path in existing_to_create_links:
-                continue
-            session.add(
-                LinkToCreate(
-                    parent_link_id=link_obj.id,
-                    link=link_path,
-                )
-            )
-            existing_to_create_links.add(link_path)
 
+def check_update_link_status(
+    link: str, parsed_links: list[str], partial: bool = False
+) -> bool:
+    """
+    Для parent link:
+    - порівнює parsed_links з car.link_path його авто в БД (functions.link_diff, в SQL)
+    - записує різницю в таблиці links_to_create / links_to_delete: рядки, що лишаються
+      актуальними, зберігаються разом зі статусом (COMPLETED не повертається в PROCESS)
+
+    partial=True — parsed_links неповний (інкрементальний збір зупинився раніше):
+    додаються лише нові links_to_create, links_to_delete і наявна черга не чіпаються,
+    бо відсутність лінка в неповному списку не означає, що авто видалено.
+    """
+    session = get_session()
+    try:
+        link_obj = session.query(Link).filter(Link.link == link).first()
+        if not link_obj:
+            return False
+
+        # Різниця з авто в БД рахується в SQL; у черги пишеться лише дельта
+        counts = apply_link_diff(session, link_obj.id, parsed_links, partial=partial)
         session.commit()
+        logger.info(
+            "check_update_link_status %s: %s parsed, %s",
+            link,
+            len(parsed_links),
+            counts,
+        )
         return True
     finally:
         session.close()
 
 
+import time
+
 import requests
 from dotenv import load_dotenv
 import os
-import shutil
 
 load_dotenv()
 
+from app.scraper.image_store import ImageStore
+
 
 class TruckMarket:
     def __init__(self, token_provider: "TokenProvider"):
         self.token_provider = token_provider
         self.base_url = os.getenv("TRUCK_BASE_URL")
+        # Завантаження фото за час життя клієнта: авто, фото, байти, секунди
+        self.upload_stats = {"cars": 0, "images": 0, "bytes": 0, "seconds": 0.0}
 
     def _headers(self):
         return {
@@ -454,7 +394,7 @@ class TruckMarket:
 
     def _get_link_car_type(self, car: Car) -> str | None:
         """Повертає категорію батьківського лінка (Link.car_type) для вибору констант TruckMarket (3.5т / 5-15т тощо)."""
-        db = SessionLocal()
+        db = get_session()
         try:
             link = db.query(Link).filter(Link.id == car.link_id).first()
             return link.car_type if link else None
@@ -528,10 +468,8 @@ class TruckMarket:
 
         if car_photo_path:
             try:
-                dir_path = os.path.join("car_images", car_photo_path)
-                if os.path.isdir(dir_path):
-                    shutil.rmtree(dir_path)
-                    logger.info("Removed car images folder after upload: %s", dir_path)
+                # Маніфест авто видаляється, blob-и лишаються для повторних оголошень
+                ImageStore().release(car_photo_path)
             except Exception as e:
                 logger.warning(
                     "Could not remove car images folder %s: %s", car_photo_path, e
@@ -563,18 +501,39 @@ class TruckMarket:
         За твоїм спостереженням TruckMarket робить головним ПЕРШЕ завантажене
         зображення, тому відправляємо файли у природньому порядку:
         спочатку images[0] (car_1_no_logo.jpg), потім images[1], ...
+        Обсяг і час завантаження рахуються в upload_stats.
         """
+        started = time.monotonic()
+        total_bytes = 0
+        store = ImageStore()
         for image_path in images:
-            with open(image_path, "rb") as f:
-                files = {
-                    "file": (os.path.basename(image_path), f, "image/jpeg"),
-                }
-                # Використовуємо _request, який вже додає Authorization
-                self._request(
-                    method="POST",
-                    path=f"/intapi/v1/listings/images/{truck_car_id}",
-                    files=files,
-                )
+            # Байти (з пам'яті сховища або з диска), а не файл: повтор після 401 шле те саме
+            content = store.read_image(image_path)
+            total_bytes += len(content)
+            content_type = (
+                "image/webp" if image_path.lower().endswith(".webp") else "image/jpeg"
+            )
+            files = {
+                "file": (os.path.basename(image_path), content, content_type),
+            }
+            # Використовуємо _request, який вже додає Authorization
+            self._request(
+                method="POST",
+                path=f"/intapi/v1/listings/images/{truck_car_id}",
+                files=files,
+            )
+        elapsed = time.monotonic() - started
+        self.upload_stats["cars"] += 1
+        self.upload_stats["images"] += len(images)
+        self.upload_stats["bytes"] += total_bytes
+        self.upload_stats["seconds"] += elapsed
+        logger.info(
+            "Uploaded %s images (%.0f KB) for truck car %s in %.1fs",
+            len(images),
+            total_bytes / 1024,
+            truck_car_id,
+            elapsed,
+        )
 
     def delete_car_by_id(self, truck_car_id: int | None):
         """Видалення оголошення з TruckMarket. Якщо truck_car_id None — запит не викликається."""
@@ -588,7 +547,7 @@ class TruckMarket:
     @staticmethod
     def _set_car_status(car_id: int, status: StatusProcessed):
         """Допоміжний метод для оновлення processed_status у таблиці cars."""
-        session = SessionLocal()
+        session = get_session()
         try:
             car = session.query(Car).filter(Car.id == car_id).first()
             if car:
@@ -599,7 +558,7 @@ class TruckMarket:
 
 
 def save_truck_car_id_to_db(car_id: int, truck_car_id: int):
-    session = SessionLocal()
+    session = get_session()
     try:
         car = session.query(Car).filter(Car.id == car_id).first()
         if car:
@@ -614,37 +573,11 @@ def save_truck_car_id_to_db(car_id: int, truck_car_id: int):
 class ImagesProcessor:
     def get_images_by_path(self, path: str) -> list[str]:
         """
-        Повертає список повних шляхів до всіх зображень у папці `car_images/{path}`.
-        `path` очікується як `car_photo_path` з payload (тобто назва/шлях папки).
+        Повертає список повних шляхів до зображень авто в порядку завантаження.
+        `path` — `car_photo_path` з payload: id маніфесту в сховищі фото
+        або (для старих записів) назва папки `car_images/{path}`.
         """
-        base_dir = "car_images"
-        dir_path = os.path.join(base_dir, path)
-
-        if not os.path.isdir(dir_path):
-            return []
-
-        # os.listdir() + sorted() сортують лексикографічно:
-        # car_1..., car_10..., car_11..., car_2...
-        # Нам потрібне "людське" сортування за номером у назві файлу.
-        def _num_key(name: str) -> tuple[int, str]:
-            m = re.search(r"(\d+)", name)
-            if m:
-                return int(m.group(1)), name
-            return 0, name
-
-        filenames = [
-            name
-            for name in os.listdir(dir_path)
-            if name.lower().endswith((".jpg", ".jpeg", ".png", ".webp"))
-        ]
-
-        filenames.sort(key=_num_key)
-
-        image_paths: list[str] = [
-            os.path.join(dir_path, filename) for filename in filenames
-        ]
-
-        return image_paths
+        return ImageStore().image_paths(path)
 
 
 from dataclasses import dataclass
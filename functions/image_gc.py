@@ -0,0 +1,209 @@
+"""
+Збирач сміття сховища фото (app.scraper.image_store).
+
+Фото прибираються лише після успішного завантаження на TruckMarket, тож маніфести і
+старі uuid-папки авто, що стали FAILED / DELETED або так і не були опубліковані,
+лишаються назавжди. Фото DUPLICATE не прибираються: авто повертається в чергу, коли
+його оригінал знято з публікації. collect_image_garbage():
+
+1. звіряє маніфести й uuid-папки з Car.path_to_images і статусами: не потрібні
+   жодному авто в черзі на відправку й старші за IMAGE_GC_TTL_HOURS — видаляються
+   (або переносяться в IMAGE_GC_ARCHIVE_DIR);
+2. прибирає незавершені .tmp і записи url_index без blob-а;
+3. якщо сховище більше за IMAGE_STORE_QUOTA_MB — видаляє blob-и, на які не
+   посилається жоден маніфест, від найдавніше використаних (mtime, LRU).
+"""
+
+import logging
+import os
+import shutil
+import time
+
+from app.scraper.image_store import NO_LOGO, ImageStore
+from database.db import SessionLocal
+from database.models import Car, StatusProcessed
+
+logger = logging.getLogger(__name__)
+
+# Вік (год), після якого непотрібні маніфест / uuid-папка вважаються сиротами
+IMAGE_GC_TTL_HOURS = float(os.getenv("IMAGE_GC_TTL_HOURS", "48"))
+# Ліміт розміру сховища (MB), 0 — без ліміту
+IMAGE_STORE_QUOTA_MB = int(os.getenv("IMAGE_STORE_QUOTA_MB", "0"))
+# Куди переносити фото авто-сиріт замість видалення (порожньо — видаляти)
+IMAGE_GC_ARCHIVE_DIR = os.getenv("IMAGE_GC_ARCHIVE_DIR", "")
+
+# Фото цих авто більше не будуть відправлені на TruckMarket
+ORPHAN_STATUSES = (
+    StatusProcessed.ACTIVE,
+    StatusProcessed.FAILED,
+    StatusProcessed.DELETED,
+)
+# Незавершений запис старший за годину — процес, що його писав, уже не допише
+_TMP_MAX_AGE_SEC = 3600
+
+
+def _live_image_paths() -> set[str]:
+    """Car.path_to_images авто, які ще чекають відправки (або з невідомим статусом)."""
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Car.path_to_images)
+            .filter(Car.path_to_images.isnot(None), Car.path_to_images != "")
+            .filter(
+                (Car.processed_status.is_(None))
+                | (Car.processed_status.notin_(ORPHAN_STATUSES))
+            )
+            .all()
+        )
+        return {path for (path,) in rows}
+    finally:
+        db.close()
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _remove_file(path: str) -> int:
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except FileNotFoundError:
+        return 0
+
+
+class ImageGarbageCollector:
+    def __init__(
+        self,
+        store: ImageStore = None,
+        ttl_hours: float = IMAGE_GC_TTL_HOURS,
+        quota_mb: int = IMAGE_STORE_QUOTA_MB,
+        archive_dir: str = IMAGE_GC_ARCHIVE_DIR,
+    ):
+        self.store = store or ImageStore()
+        self.ttl_sec = ttl_hours * 3600
+        self.quota_bytes = quota_mb * 1024 * 1024
+        self.archive_dir = archive_dir
+        self.stats = {
+            "manifests_removed": 0,
+            "folders_removed": 0,
+            "archived": 0,
+            "tmp_removed": 0,
+            "url_entries_removed": 0,
+            "blobs_evicted": 0,
+            "reclaimed_bytes": 0,
+        }
+
+    def _archive(self, name: str, files: list[str]) -> None:
+        target = os.path.join(self.archive_dir, name)
+        os.makedirs(target, exist_ok=True)
+        for i, path in enumerate(files, 1):
+            if os.path.isfile(path):
+                shutil.copy2(path, os.path.join(target, f"car_{i}{os.path.splitext(path)[1]}"))
+        self.stats["archived"] += 1
+
+    def _collect_orphans(self, live: set[str], now: float) -> set[str]:
+        """Видаляє маніфести й uuid-папки сиріт. Повертає blob-и, потрібні живим маніфестам."""
+        referenced: set[str] = set()
+        for entry in list(self.store.iter_manifests()):
+            manifest_id = entry.name[: -len(".json")]
+            keys = self.store.manifest_keys(manifest_id)
+            if manifest_id in live or now - entry.stat().st_mtime < self.ttl_sec:
+                referenced.update(self.store.blob_path(key) for key in keys)
+                continue
+            if self.archive_dir:
+                self._archive(manifest_id, [self.store.blob_path(key) for key in keys])
+            self.stats["reclaimed_bytes"] += _remove_file(entry.path)
+            self.stats["manifests_removed"] += 1
+            logger.info("[image_gc] removed orphan manifest %s", manifest_id)
+
+        for entry in list(self.store.iter_legacy_dirs()):
+            if entry.name in live or now - entry.stat().st_mtime < self.ttl_sec:
+                continue
+            size = _dir_size(entry.path)
+            if self.archive_dir:
+                shutil.move(entry.path, os.path.join(self.archive_dir, entry.name))
+                self.stats["archived"] += 1
+            else:
+                shutil.rmtree(entry.path, ignore_errors=True)
+            self.stats["reclaimed_bytes"] += size
+            self.stats["folders_removed"] += 1
+            logger.info("[image_gc] removed orphan folder %s (%s B)", entry.name, size)
+        return referenced
+
+    def _collect_tmp_and_index(self, now: float) -> None:
+        for entry in list(self.store.iter_blob_files()):
+            if ".tmp" in entry.name and now - entry.stat().st_mtime > _TMP_MAX_AGE_SEC:
+                self.stats["reclaimed_bytes"] += _remove_file(entry.path)
+                self.stats["tmp_removed"] += 1
+        for entry in list(self.store.iter_url_entries()):
+            try:
+                with open(entry.path, "r", encoding="utf-8") as f:
+                    key = f.read().strip()
+            except OSError:
+                continue
+            if key == NO_LOGO:
+                # Фото без логотипа перевіряються знову після TTL (могли додати шаблон)
+                stale = now - entry.stat().st_mtime > self.ttl_sec
+            else:
+                stale = not key or not os.path.isfile(self.store.blob_path(key))
+            if stale:
+                self.stats["reclaimed_bytes"] += _remove_file(entry.path)
+                self.stats["url_entries_removed"] += 1
+
+    def _enforce_quota(self, referenced: set[str]) -> int:
+        """LRU-витіснення blob-ів без посилань, поки сховище більше за квоту."""
+        total = _dir_size(self.store.base_dir)
+        if not self.quota_bytes or total <= self.quota_bytes:
+            return total
+        candidates = []
+        for entry in self.store.iter_blob_files():
+            if entry.name.endswith(".phash") or ".tmp" in entry.name:
+                continue
+            if entry.path in referenced:
+                continue
+            stat = entry.stat()
+            candidates.append((stat.st_mtime, entry.path))
+        candidates.sort()
+        for _, path in candidates:
+            if total <= self.quota_bytes:
+                break
+            freed = _remove_file(path)
+            for phash_path in self.store.phash_paths_for(path):
+                freed += _remove_file(phash_path)
+            total -= freed
+            self.stats["reclaimed_bytes"] += freed
+            self.stats["blobs_evicted"] += 1
+        if total > self.quota_bytes:
+            logger.warning(
+                "[image_gc] store is %s B after eviction, quota %s B: "
+                "the rest belongs to cars waiting for upload",
+                total,
+                self.quota_bytes,
+            )
+        return total
+
+    def run(self) -> dict:
+        now = time.time()
+        live = _live_image_paths()
+        referenced = self._collect_orphans(live, now)
+        self._collect_tmp_and_index(now)
+        total = self._enforce_quota(referenced)
+        return {
+            **self.stats,
+            "live_cars": len(live),
+            "store_bytes": total,
+            "quota_bytes": self.quota_bytes,
+        }
+
+
+def collect_image_garbage() -> dict:
+    return ImageGarbageCollector().run()
@@ -0,0 +1,86 @@
+"""
+Різниця між зібраними посиланнями батьківського лінка і його авто в БД — на боці SQL.
+
+Зібрані URL кладуться в тимчасову таблицю (executemany пачками), далі один оператор
+з CTE: анти-джойни з cars дають to_delete / to_create, а в links_to_delete /
+links_to_create застосовується лише дельта — зайві рядки цього лінка видаляються,
+нові вставляються з ON CONFLICT (link) DO NOTHING. Рядки, що лишаються актуальними,
+не чіпаються, тож їхній статус (зокрема COMPLETED) зберігається.
+"""
+
+from sqlalchemy import Column, MetaData, String, Table, insert, text
+from sqlalchemy.orm import Session
+
+_scraped_links = Table(
+    "scraped_links",
+    MetaData(),
+    Column("link", String(255), primary_key=True),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+
+_APPLY_DIFF_SQL = text(
+    """
+    WITH car_links AS (
+        SELECT link_path AS link FROM cars WHERE link_id = :parent_link_id
+    ),
+    to_delete AS (
+        SELECT c.link FROM car_links c
+        WHERE NOT :partial
+          AND NOT EXISTS (SELECT 1 FROM scraped_links s WHERE s.link = c.link)
+    ),
+    to_create AS (
+        SELECT s.link FROM scraped_links s
+        WHERE NOT EXISTS (SELECT 1 FROM car_links c WHERE c.link = s.link)
+    ),
+    stale_delete AS (
+        DELETE FROM links_to_delete d
+        WHERE NOT :partial
+          AND d.parent_link_id = :parent_link_id
+          AND NOT EXISTS (SELECT 1 FROM to_delete t WHERE t.link = d.link)
+        RETURNING 1
+    ),
+    stale_create AS (
+        DELETE FROM links_to_create lc
+        WHERE NOT :partial
+          AND lc.parent_link_id = :parent_link_id
+          AND NOT EXISTS (SELECT 1 FROM to_create t WHERE t.link = lc.link)
+        RETURNING 1
+    ),
+    new_delete AS (
+        INSERT INTO links_to_delete (parent_link_id, link, status)
+        SELECT :parent_link_id, link, 'process'::statuslinkchange FROM to_delete
+        ON CONFLICT (link) DO NOTHING
+        RETURNING 1
+    ),
+    new_create AS (
+        INSERT INTO links_to_create (parent_link_id, link, status)
+        SELECT :parent_link_id, link, 'process'::statuslinkchange FROM to_create
+        ON CONFLICT (link) DO NOTHING
+        RETURNING 1
+    )
+    SELECT
+        (SELECT count(*) FROM new_create) AS to_create_added,
+        (SELECT count(*) FROM stale_create) AS to_create_removed,
+        (SELECT count(*) FROM new_delete) AS to_delete_added,
+        (SELECT count(*) FROM stale_delete) AS to_delete_removed
+    """
+)
+
+
+def apply_link_diff(
+    session: Session, parent_link_id: int, urls: list[str], partial: bool = False
+) -> dict:
+    """
+    Оновлює links_to_create / links_to_delete лінка за зібраними urls у транзакції session
+    (commit — на викликачі). partial=True — лише нові links_to_create, без видалень.
+    Повертає кількість доданих / видалених рядків черг.
+    """
+    _scraped_links.create(session.connection())
+    urls = list(dict.fromkeys(urls))
+    if urls:
+        session.execute(insert(_scraped_links), [{"link": url} for url in urls])
+    row = session.execute(
+        _APPLY_DIFF_SQL, {"parent_link_id": parent_link_id, "partial": partial}
+    ).one()
+    return dict(row._mapping)
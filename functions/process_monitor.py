@@ -5,11 +5,12 @@
 
 import contextvars
 import logging
+import threading
 from contextlib import contextmanager
 from datetime import datetime
 from typing import Any, Generator, List, Optional
 
-from database.db import SessionLocal
+from database.db import DB_POOL_STATS, SessionLocal
 from database.models import ProcessRun
 
 logger = logging.getLogger(__name__)
@@ -21,6 +22,9 @@ _current_run_id: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar(
 
 MAX_LOG_ENTRIES_PER_RUN = 2000
 
+# logs оновлюються як read-modify-write — серіалізуємо записи з кількох потоків (пул сторінок)
+_append_log_lock = threading.Lock()
+
 TASK_NAMES = {
     "process_link_car_urls": "Парсинг після додавання посилання",
     "recheck_processed_links": "Планова перевірка to_create/to_delete",
@@ -29,9 +33,14 @@ TASK_NAMES = {
     "parse_links_to_create": "Парсер по links_to_create",
     "delete_link": "Видалення посилання з сайту та БД",
     "db_dump": "Щоденний дамп БД (09:00 Київ)",
+    "image_gc": "Прибирання сховища фото (07:30 Київ)",
 }
 
 
+# Записи моніторингу (старт, фініш, логи) — у власних сесіях, не через get_session():
+# вони мають комітитись одразу й незалежно від транзакції таски, з якої їх викликано.
+
+
 def start_process_run(
     task_name: str,
     celery_task_id: Optional[str] = None,
@@ -79,8 +88,9 @@ def finish_process_run(
         run.status = "success" if success else "failed"
         run.finished_at = datetime.utcnow()
         run.message = message
-        if details:
-            run.details = (run.details or {}) | details
+        # Пул з'єднань за час таски (лічильники скидаються на task_prerun)
+        details.setdefault("db_pool", DB_POOL_STATS.snapshot())
+        run.details = (run.details or {}) | details
         db.commit()
         logger.info(
             "[%s] Finished run_id=%s status=%s message=%s",
@@ -100,6 +110,11 @@ def append_process_log(run_id: Optional[int], level: str, message: str) -> None:
     """Додає один запис до історії логів ProcessRun. Не використовує logger, щоб уникнути рекурсії."""
     if run_id is None:
         return
+    with _append_log_lock:
+        _append_process_log(run_id, level, message)
+
+
+def _append_process_log(run_id: int, level: str, message: str) -> None:
     db = SessionLocal()
     try:
         run = db.query(ProcessRun).filter(ProcessRun.id == run_id).first()
@@ -18,6 +18,7 @@ if spec is None and project_root not in sys.path:
 
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import task_postrun, task_prerun, worker_shutdown
 
 from functions.celery_tasks import (
     run_process_link_car_urls,
@@ -27,7 +28,12 @@ from functions.celery_tasks import (
     run_parse_links_to_create,
     run_delete_link,
     run_db_dump,
+    run_image_gc,
 )
+from app.scraper.browser_service import close_thread_browser
+from app.scraper.image_store import flush_image_store
+from app.scraper.image_transform import shutdown_transform_pool
+from database.db import DB_POOL_STATS, begin_session_scope, end_session_scope
 
 def _is_full_redis_url(url: str) -> bool:
     """URL має бути redis://host або rediss://host (не просто redis://)."""
@@ -73,9 +79,10 @@ celery_app.conf.task_routes = {
     "tasks.config.parse_links_to_create": {"queue": "parent_links"},
     "tasks.config.delete_link": {"queue": "truck_market"},
     "tasks.config.db_dump": {"queue": "parent_links"},
+    "tasks.config.image_gc": {"queue": "parent_links"},
 }
 
-# Europe/Kiev: понеділок 00–03 recheck; вт–нд 03–06 парсинг; щогодини TruckMarket; щодня 09:00 дамп БД.
+# Europe/Kiev: понеділок 00–03 recheck; вт–нд 03–06 парсинг; щогодини TruckMarket; щодня 07:30 прибирання фото, 09:00 дамп БД.
 celery_app.conf.beat_schedule = {
     "recheck_processed_links_monday": {
         "task": "tasks.config.recheck_processed_links",
@@ -97,13 +104,31 @@ celery_app.conf.beat_schedule = {
         "task": "tasks.config.db_dump",
         "schedule": crontab(minute=0, hour=9),
     },
+    "image_gc_daily": {
+        "task": "tasks.config.image_gc",
+        "schedule": crontab(minute=30, hour=7),
+    },
 }
 
 
-@celery_app.task(name="tasks.config.process_link_car_urls")
-def process_link_car_urls(link_id: int):
+# Повтор збору посилань після збою (продовжує з чекпоінта): затримка (сек) і ліміт спроб
+COLLECT_RETRY_DELAY = int(os.getenv("COLLECT_RETRY_DELAY", "300"))
+COLLECT_MAX_RETRIES = int(os.getenv("COLLECT_MAX_RETRIES", "3"))
+
+
+@celery_app.task(
+    bind=True,
+    name="tasks.config.process_link_car_urls",
+    max_retries=COLLECT_MAX_RETRIES,
+)
+def process_link_car_urls(self, link_id: int):
     """Парсинг після додавання лінка через web (однопоточний, по черзі parent_links)."""
-    return run_process_link_car_urls(link_id)
+    result = run_process_link_car_urls(
+        link_id, final_attempt=self.request.retries >= self.max_retries
+    )
+    if result.get("resumable") and self.request.retries < self.max_retries:
+        raise self.retry(countdown=COLLECT_RETRY_DELAY)
+    return result
 
 
 @celery_app.task(name="tasks.config.recheck_processed_links")
@@ -141,3 +166,40 @@ def db_dump():
     """Щодня о 09:00 (Київ): дамп PostgreSQL у файл."""
     return run_db_dump()
 
+
+@celery_app.task(name="tasks.config.image_gc")
+def image_gc():
+    """Щодня о 07:30 (після парсингу 03–06): прибирання фото авто-сиріт, квота сховища."""
+    return run_image_gc()
+
+
+# Скоуп з'єднання БД кожної таски: task_id -> токен begin_session_scope
+_session_scopes: dict = {}
+
+
+@task_prerun.connect
+def open_session_scope(task_id=None, **kwargs):
+    """
+    Хелпери таски (save_data_to_db, _set_car_status, ...), що викликаються по черзі, ділять
+    одне з'єднання з пулу (береться при першому get_session()); сесія тіла таски — окреме.
+    """
+    DB_POOL_STATS.reset()
+    _session_scopes[task_id] = begin_session_scope()
+
+
+@task_postrun.connect
+def close_session_scope(task_id=None, **kwargs):
+    token = _session_scopes.pop(task_id, None)
+    if token is not None:
+        end_session_scope(token)
+
+
+@worker_shutdown.connect
+def close_browser_on_shutdown(**kwargs):
+    """
+    Теплий браузер воркера (browser_service) і процеси обробки фото закриваємо разом з воркером;
+    фото, що ще лише в пам'яті сховища, дописуємо на диск.
+    """
+    close_thread_browser()
+    shutdown_transform_pool()
+    flush_image_store()
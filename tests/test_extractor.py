@@ -0,0 +1,131 @@
+"""
+Чисті хелпери extractor.py без браузера: на вхід — словники атрибутів, як їх повертає
+harvest_attributes, і сирі поля page.evaluate. Очікування — поведінка попередніх
+get_images_by_width / get_links.
+"""
+
+import pytest
+
+pytest.importorskip("playwright.sync_api")
+
+from app.scraper.extractor import (  # noqa: E402
+    CAR_FIELD_SPECS,
+    filter_car_links,
+    parse_result_count,
+    resolve_fields,
+    select_image_urls,
+    to_hd_image_url,
+)
+
+PHOTO = "https://cdn.riastatic.com/photosnew/auto/photo/volvo_fh__{}f.webp"
+PHOTO_HD = "https://cdn.riastatic.com/photosnew/auto/photo/volvo_fh__{}hd.jpg"
+
+
+def _node(src=None, data_src=None, srcset=None, title=None, alt=None) -> dict:
+    return {"src": src, "data-src": data_src, "srcset": srcset, "title": title, "alt": alt}
+
+
+def test_to_hd_image_url_rewrites_riastatic_photos():
+    assert to_hd_image_url(PHOTO.format(1)) == PHOTO_HD.format(1)
+    assert to_hd_image_url(PHOTO.format(2).replace(".webp", ".jpg")) == PHOTO_HD.format(2)
+
+
+def test_to_hd_image_url_ignores_other_urls():
+    assert to_hd_image_url("https://cdn.riastatic.com/images/logo.svg") is None
+    assert to_hd_image_url("https://example.com/photosnew/auto/photo/x_1f.webp") is None
+
+
+def test_select_image_urls_prefers_src_then_data_src_then_srcset():
+    nodes = [
+        _node(src=PHOTO.format(1), data_src=PHOTO.format(91), srcset=PHOTO.format(92)),
+        _node(data_src=PHOTO.format(2), srcset=PHOTO.format(93)),
+        _node(srcset=PHOTO.format(3)),
+        _node(),
+    ]
+    assert select_image_urls(nodes) == [PHOTO_HD.format(i) for i in (1, 2, 3)]
+
+
+def test_select_image_urls_takes_first_srcset_candidate():
+    srcset = f"{PHOTO.format(1)} 1x, {PHOTO.format(2)} 2x"
+    assert select_image_urls([_node(srcset=srcset)]) == [PHOTO_HD.format(1)]
+
+
+def test_select_image_urls_dedupes_and_keeps_document_order():
+    nodes = [
+        _node(src=PHOTO.format(3)),
+        _node(src=PHOTO.format(1)),
+        # source (webp) і img (jpg) одного фото дають той самий HD-URL
+        _node(srcset=PHOTO.format(3).replace(".webp", ".jpg")),
+        _node(src="https://cdn.riastatic.com/images/logo.svg"),
+        _node(src=PHOTO.format(2)),
+    ]
+    assert select_image_urls(nodes) == [PHOTO_HD.format(i) for i in (3, 1, 2)]
+
+
+def test_select_image_urls_applies_limit():
+    nodes = [_node(src=PHOTO.format(i)) for i in range(30)]
+    assert select_image_urls(nodes, limit=5) == [PHOTO_HD.format(i) for i in range(5)]
+    assert len(select_image_urls(nodes)) == 20
+
+
+def test_select_image_urls_filters_by_phrase_in_title_or_alt():
+    nodes = [
+        _node(src=PHOTO.format(1), title="Volvo FH 2015 — фото 1"),
+        _node(src=PHOTO.format(2), alt="VOLVO FH 2015 фото 2"),
+        _node(src=PHOTO.format(3), title="Схожі оголошення"),
+        _node(src=PHOTO.format(4)),
+    ]
+    assert select_image_urls(nodes, required_phrase="Volvo FH 2015") == [
+        PHOTO_HD.format(1),
+        PHOTO_HD.format(2),
+    ]
+
+
+def test_filter_car_links_makes_absolute_and_keeps_auto_links():
+    hrefs = [
+        "/uk/auto_volvo_fh_1.html",
+        None,
+        "",
+        "https://auto.ria.com/uk/auto_man_tgx_2.html",
+        "/uk/newauto/volvo/",
+        "/uk/auto_volvo_fh_1.html",
+    ]
+    assert filter_car_links(hrefs) == [
+        "https://auto.ria.com/uk/auto_volvo_fh_1.html",
+        "https://auto.ria.com/uk/auto_man_tgx_2.html",
+    ]
+
+
+def test_parse_result_count_prefers_counter_text():
+    assert parse_result_count("1 234", "Знайдено 99 оголошень") == 1234
+
+
+def test_parse_result_count_falls_back_to_page_phrase():
+    assert parse_result_count(None, "Фільтри\nЗнайдено 2 345 оголошень за запитом") == 2345
+    assert parse_result_count("", "нічого не знайдено") is None
+
+
+def test_resolve_fields_cleans_values_and_uses_defaults():
+    raw = {
+        "price": " 25 000 $ ",
+        "title": "Volvo FH",
+        "mileage": "500 тис. км",
+        "location": "Київ",
+        "description": "Тягач",
+        "full_description": ["  перший ", "", " другий"],
+    }
+    fields = resolve_fields(raw)
+    assert fields["price"] == "25 000 $"
+    assert fields["full_title"] == ""
+    assert fields["full_description"] == "перший\nдругий"
+
+
+def test_resolve_fields_uses_fallback_and_requires_fields():
+    raw = {"title": "Volvo FH", "mileage": "1", "location": "Київ", "description": "x"}
+    fields = resolve_fields(
+        raw, fallback=lambda spec: "9 000 $" if spec.name == "price" else None
+    )
+    assert fields["price"] == "9 000 $"
+    with pytest.raises(ValueError, match="price"):
+        resolve_fields(raw)
+    assert {spec.name for spec in CAR_FIELD_SPECS} == set(fields)
@@ -0,0 +1,214 @@
+"""
+Регресія планів гарячих запитів: на синтетичних даних (у транзакції, яка відкочується)
+кожен запит проганяється через EXPLAIN і має читати свою таблицю індексом, а не Seq Scan.
+Потрібна БД з застосованими міграціями (DATABASE_DEVELOPMENT_URI); без неї тести пропускаються.
+"""
+
+import os
+
+import pytest
+from dotenv import load_dotenv
+
+load_dotenv()
+
+if not os.getenv("DATABASE_DEVELOPMENT_URI"):
+    pytest.skip("DATABASE_DEVELOPMENT_URI is not set", allow_module_level=True)
+
+from sqlalchemy import select, text  # noqa: E402
+from sqlalchemy.dialects import postgresql  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from database.db import SessionLocal  # noqa: E402
+from database.models import (  # noqa: E402
+    Car,
+    LinkToCreate,
+    LinkToDelete,
+    StatusLinkChange,
+    StatusProcessed,
+)
+
+SYNTHETIC_CARS = 20000
+SYNTHETIC_LINKS = 50
+_PARENT_PREFIX = "query-plans://"
+_INDEX_NODES = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+
+
+@pytest.fixture(scope="module")
+def synthetic_db():
+    """
+    Сесія з синтетичними даними: SYNTHETIC_LINKS батьківських лінків, SYNTHETIC_CARS авто
+    (переважно ACTIVE з truck_car_id, ~1% CREATED), links_to_create / links_to_delete —
+    переважно COMPLETED. Повертає (session, link_id, link_path, truck_car_id).
+    """
+    session = SessionLocal()
+    try:
+        session.execute(text("SELECT 1"))
+    except OperationalError as e:
+        session.close()
+        pytest.skip(f"PostgreSQL is not available: {e}")
+    try:
+        session.execute(
+            text(
+                """
+                INSERT INTO links (link, created_at, updated_at, parse_status)
+                SELECT :prefix || g, now(), now(), 'parsed'::linkparsestatus
+                FROM generate_series(1, :links) g
+                """
+            ),
+            {"prefix": _PARENT_PREFIX, "links": SYNTHETIC_LINKS},
+        )
+        link_ids = [
+            row[0]
+            for row in session.execute(
+                text("SELECT id FROM links WHERE link LIKE :prefix || '%' ORDER BY id"),
+                {"prefix": _PARENT_PREFIX},
+            )
+        ]
+        session.execute(
+            text(
+                """
+                INSERT INTO cars (
+                    link_id, link_path, brand, fuel_type, transmission, price, year, mileage,
+                    source, truck_car_id, car_values, description, is_published,
+                    processed_status, created_at, updated_at
+                )
+                SELECT
+                    (:link_ids)[1 + g % :links],
+                    :prefix || 'car/' || g,
+                    'Brand', 'Дизель', 'Ручна', 10000 + g, 2015, 200000, 'auto_ria',
+                    CASE WHEN g % 100 < 90 THEN 1000000 + g END,
+                    '{}'::json, 'synthetic', false,
+                    (CASE
+                        WHEN g % 100 < 90 THEN 'active'
+                        WHEN g % 100 < 95 THEN 'deleted'
+                        WHEN g % 100 < 99 THEN 'updated'
+                        ELSE 'created'
+                    END)::statusprocessed,
+                    now() - g * interval '1 minute',
+                    now()
+                FROM generate_series(1, :cars) g
+                """
+            ),
+            {
+                "link_ids": link_ids,
+                "links": SYNTHETIC_LINKS,
+                "cars": SYNTHETIC_CARS,
+                "prefix": _PARENT_PREFIX,
+            },
+        )
+        for table in ("links_to_create", "links_to_delete"):
+            session.execute(
+                text(
+                    f"""
+                    INSERT INTO {table} (parent_link_id, link, status)
+                    SELECT
+                        (:link_ids)[1 + g % :links],
+                        :prefix || '{table}/' || g,
+                        (CASE WHEN g % 100 = 0 THEN 'process' ELSE 'completed' END)::statuslinkchange
+                    FROM generate_series(1, :rows) g
+                    """
+                ),
+                {
+                    "link_ids": link_ids,
+                    "links": SYNTHETIC_LINKS,
+                    "rows": SYNTHETIC_CARS,
+                    "prefix": _PARENT_PREFIX,
+                },
+            )
+        for table in ("links", "cars", "links_to_create", "links_to_delete"):
+            session.execute(text(f"ANALYZE {table}"))
+        # Авто з g кратним 100 — ACTIVE з truck_car_id
+        middle = SYNTHETIC_CARS // 2 - (SYNTHETIC_CARS // 2) % 100
+        yield session, link_ids[0], f"{_PARENT_PREFIX}car/{middle}", 1000000 + middle
+    finally:
+        # Синтетичні дані і статистика ANALYZE не потрапляють у БД
+        session.rollback()
+        session.close()
+
+
+def _scans(plan: dict) -> list[tuple[str, str]]:
+    """
+    (тип вузла, таблиця) усіх вузлів плану, що читають таблицю. Bitmap Heap Scan
+    записується як Bitmap Index Scan, якщо під ним є індексний вузол.
+    """
+    found = []
+    if "Relation Name" in plan:
+        node = plan["Node Type"]
+        if node == "Bitmap Heap Scan" and _has_bitmap_index(plan):
+            node = "Bitmap Index Scan"
+        found.append((node, plan["Relation Name"]))
+    for child in plan.get("Plans", []):
+        found.extend(_scans(child))
+    return found
+
+
+def _has_bitmap_index(plan: dict) -> bool:
+    return any(
+        child["Node Type"] == "Bitmap Index Scan" or _has_bitmap_index(child)
+        for child in plan.get("Plans", [])
+    )
+
+
+def _hot_queries(link_id: int, link_path: str, truck_car_id: int) -> dict:
+    """Запити, як їх будує код (SELECT-частина; таблиця, яка має читатись індексом)."""
+    return {
+        # save_data_to_db / upsert_cars: конфлікт за link_path
+        "cars.link_path": ("cars", select(Car.id).where(Car.link_path == link_path)),
+        # get_known_car_links, check_update_link_status, delete_link
+        "cars.link_id": ("cars", select(Car.link_path).where(Car.link_id == link_id)),
+        # run_process_car_add_truck_market
+        "cars.created_queue": (
+            "cars",
+            select(Car).where(Car.processed_status == StatusProcessed.CREATED),
+        ),
+        # Адмінка: список авто без фільтрів / з фільтром статусу / лінка
+        "cars.admin_page": (
+            "cars",
+            select(Car).order_by(Car.created_at.desc()).offset(40).limit(20),
+        ),
+        "cars.admin_status_page": (
+            "cars",
+            select(Car)
+            .where(Car.processed_status == StatusProcessed.UPDATED)
+            .order_by(Car.created_at.desc())
+            .limit(20),
+        ),
+        "cars.admin_link_page": (
+            "cars",
+            select(Car).where(Car.link_id == link_id).order_by(Car.created_at.desc()).limit(20),
+        ),
+        # search_cars за truck_car_id
+        "cars.truck_car_id": ("cars", select(Car).where(Car.truck_car_id == truck_car_id)),
+        # run_parse_links_to_create / run_process_links_to_delete
+        "links_to_create.process_queue": (
+            "links_to_create",
+            select(LinkToCreate).where(LinkToCreate.status == StatusLinkChange.PROCESS),
+        ),
+        "links_to_delete.process_queue": (
+            "links_to_delete",
+            select(LinkToDelete).where(LinkToDelete.status == StatusLinkChange.PROCESS),
+        ),
+        # get_known_car_links, check_update_link_status
+        "links_to_create.parent_link_id": (
+            "links_to_create",
+            select(LinkToCreate.link).where(LinkToCreate.parent_link_id == link_id),
+        ),
+        "links_to_delete.parent_link_id": (
+            "links_to_delete",
+            select(LinkToDelete.link).where(LinkToDelete.parent_link_id == link_id),
+        ),
+    }
+
+
+HOT_QUERY_NAMES = list(_hot_queries(0, "", 0))
+
+
+@pytest.mark.parametrize("name", HOT_QUERY_NAMES)
+def test_hot_query_uses_index(synthetic_db, name):
+    session, link_id, link_path, truck_car_id = synthetic_db
+    table, stmt = _hot_queries(link_id, link_path, truck_car_id)[name]
+    sql = stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    (plan,) = session.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    nodes = [node for node, relation in _scans(plan["Plan"]) if relation == table]
+    assert nodes, f"{name}: {table} is not read by the plan"
+    assert all(node in _INDEX_NODES for node in nodes), f"{name}: {table} read by {nodes}"
@@ -5,7 +5,7 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, g, request, jsonify, render_template
 from werkzeug.middleware.proxy_fix import ProxyFix
 
 from web.config.settings import DevelopmentConfig
@@ -32,6 +32,7 @@ from web.crud.crud_process_run.crud import (
     get_process_runs,
     get_process_run_stats,
 )
+from database.db import DB_POOL_STATS, begin_session_scope, end_session_scope
 from functions.process_monitor import TASK_NAMES
 from tasks.config import (
     process_link_car_urls,
@@ -49,6 +50,19 @@ app.config.from_object(config)
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1)
 
 
+@app.before_request
+def open_session_scope():
+    # CRUD-функції одного запиту ділять одне з'єднання з пулу
+    g.db_scope = begin_session_scope()
+
+
+@app.teardown_request
+def close_session_scope(exc):
+    token = g.pop("db_scope", None)
+    if token is not None:
+        end_session_scope(token)
+
+
 @app.route("/")
 def index():
     return render_template("upload.html")
@@ -148,10 +162,10 @@ def link_detail(link_id):
 @app.route("/links/<int:link_id>/send-to-delete", methods=["POST"])
 def send_link_to_delete(link_id):
     """Поставити лінк в чергу на видалення: Celery видалить авто з TruckMarket і лінк з БД."""
-    from database.db import SessionLocal
+    from database.db import get_session
     from database.models import Link
 
-    db = SessionLocal()
+    db = get_session()
     try:
         link = db.query(Link).filter(Link.id == link_id).first()
         if not link:
@@ -218,6 +232,12 @@ def processes_monitor():
     )
 
 
+@app.route("/api/db-pool", methods=["GET"])
+def db_pool_stats():
+    """Стан пулу з'єднань БД цього процесу gunicorn і лічильники з його старту."""
+    return jsonify(DB_POOL_STATS.snapshot())
+
+
 @app.route("/admin/processes/<int:run_id>")
 def process_run_detail(run_id: int):
     """Сторінка деталей запуску: інфо + історія логів по тасці."""
@@ -313,10 +333,10 @@ def get_car(car_id):
 @app.route("/admin/car/<int:car_id>/send-to-delete", methods=["POST"])
 def send_car_to_delete(car_id):
     """Додає авто в чергу на видалення з сайту (links_to_delete). Celery потім викличе API TruckMarket."""
-    from database.db import SessionLocal
+    from database.db import get_session
     from database.models import Car, LinkToDelete, StatusLinkChange
 
-    db = SessionLocal()
+    db = get_session()
     try:
         car = db.query(Car).filter(Car.id == car_id).first()
         if not car:
@@ -359,7 +379,7 @@ def send_car_to_delete(car_id):
 @app.route("/admin/cars/bulk-send-to-delete", methods=["POST"])
 def bulk_send_to_delete():
     """Множинне додавання обраних авто в чергу на видалення з сайту (links_to_delete)."""
-    from database.db import SessionLocal
+    from database.db import get_session
     from database.models import Car, LinkToDelete, StatusLinkChange
 
     data = request.get_json(silent=True) or {}
@@ -367,7 +387,7 @@ def bulk_send_to_delete():
     if not car_ids:
         return jsonify({"error": "car_ids обовʼязковий"}), 400
 
-    db = SessionLocal()
+    db = get_session()
     try:
         added = 0
         skipped_no_truck = 0
@@ -499,7 +519,7 @@ def admin_stats():
 
 @app.route("/admin/delete-cars", methods=["POST"])
 def delete_cars_route():
-    from database.db import SessionLocal
+    from database.db import get_session
     from database.models import Car
 
     data = request.get_json(silent=True) or {}
@@ -509,7 +529,7 @@ def delete_cars_route():
     if not car_ids and not link_id:
         return jsonify({"error": "car_ids or link_id required"}), 400
 
-    db = SessionLocal()
+    db = get_session()
     try:
         if car_ids:
             db.query(Car).filter(Car.id.in_(car_ids)).delete(synchronize_session=False)
@@ -1,5 +1,5 @@
 import re
-from database.db import SessionLocal
+from database.db import get_session
 from database.models import Car, Link, StatusProcessed
 from sqlalchemy import func, and_, or_
 from datetime import datetime, timedelta
@@ -92,7 +92,7 @@ def get_cars(
     Returns:
         Dict з cars та pagination info
     """
-    db = SessionLocal()
+    db = get_session()
     try:
         query = db.query(Car)
 
@@ -151,7 +151,7 @@ def get_cars(
 
 def get_car_by_id(car_id: int) -> Optional[Car]:
     """Отримує авто по ID"""
-    db = SessionLocal()
+    db = get_session()
     try:
         return db.query(Car).filter(Car.id == car_id).first()
     finally:
@@ -189,7 +189,7 @@ def _car_to_detail_dict(car: Car, owner: Optional[str] = None) -> Dict:
 
 def get_car_with_owner(car_id: int) -> Optional[Dict]:
     """Повна інфа по авто з власником (Link.owner) для сторінки пошуку."""
-    db = SessionLocal()
+    db = get_session()
     try:
         row = (
             db.query(Car, Link.owner)
@@ -217,7 +217,7 @@ def search_cars(
     Повертає список словників з owner і auto_ria_url для кожного авто.
     for_suggest=True — обмежений набір полів для підказок (limit 15).
     """
-    db = SessionLocal()
+    db = get_session()
     try:
         query = (
             db.query(Car, Link.owner)
@@ -280,7 +280,7 @@ def search_cars(
 
 def update_car(car_id: int, data: Dict) -> Optional[Car]:
     """Оновлює дані авто"""
-    db = SessionLocal()
+    db = get_session()
     try:
         car = db.query(Car).filter(Car.id == car_id).first()
         if not car:
@@ -334,7 +334,7 @@ def bulk_update_processed_status(
         status_enum = StatusProcessed[processed_status.strip().upper()]
     except KeyError:
         return 0
-    db = SessionLocal()
+    db = get_session()
     try:
         updated = (
             db.query(Car)
@@ -358,7 +358,7 @@ def bulk_update_processed_status(
 
 def get_statistics() -> Dict:
     """Отримує статистику по авто"""
-    db = SessionLocal()
+    db = get_session()
     try:
         # Загальна кількість
         total = db.query(func.count(Car.id)).scalar()
@@ -435,7 +435,7 @@ def get_statistics_filtered(
     owner: фільтр по Link.owner (усі авто по посиланнях цього власника)
     link_id: фільтр по одному посиланню
     """
-    db = SessionLocal()
+    db = get_session()
     try:
         now = datetime.utcnow()
         if period == "day":
@@ -1,4 +1,4 @@
-from database.db import SessionLocal
+from database.db import get_session
 from database.models import Link, LinkParseStatus, LinkToCreate, LinkToDelete
 from sqlalchemy.orm import joinedload
 from datetime import datetime, timezone
@@ -9,7 +9,7 @@ def get_links_grouped_by_owner(
     parse_status: Optional[str] = None,
 ) -> List[Dict[str, Any]]:
     """Список лінків згрупованих по власнику (owner). Для кожного owner — список лінків."""
-    db = SessionLocal()
+    db = get_session()
     try:
         query = db.query(Link).order_by(
             Link.owner.asc().nullsfirst(), Link.created_at.desc()
@@ -41,7 +41,7 @@ def get_links(
     per_page: int = 50,
 ) -> Dict:
     """Список лінків з фільтром по parse_status та пагінацією."""
-    db = SessionLocal()
+    db = get_session()
     try:
         query = db.query(Link).order_by(Link.created_at.desc())
         if parse_status:
@@ -66,7 +66,7 @@ def get_links(
 
 def get_owners_list() -> List[str]:
     """Список унікальних власників (owner) для фільтрів."""
-    db = SessionLocal()
+    db = get_session()
     try:
         rows = (
             db.query(Link.owner)
@@ -81,7 +81,7 @@ def get_owners_list() -> List[str]:
 
 def get_links_for_filter() -> List[Dict[str, Any]]:
     """Список посилань (id, link, owner) для вибору в фільтрі статистики."""
-    db = SessionLocal()
+    db = get_session()
     try:
         links = db.query(Link).order_by(Link.owner.asc().nullsfirst(), Link.id.asc()).all()
         return [
@@ -94,7 +94,7 @@ def get_links_for_filter() -> List[Dict[str, Any]]:
 
 def get_link_by_id(link_id: int) -> Optional[Link]:
     """Лінк по id з авто, links_to_create, links_to_delete."""
-    db = SessionLocal()
+    db = get_session()
     try:
         return (
             db.query(Link)
@@ -117,7 +117,7 @@ def create_new_link(
     Створює новий Link або повертає існуючий, якщо такий URL вже є.
     Якщо передані car_type / owner, оновлює їх у існуючому записі.
     """
-    db = SessionLocal()
+    db = get_session()
     try:
         # Перевіряємо, чи такий лінк вже існує
         link_obj = db.query(Link).filter(Link.link == url).first()